@@ -1,11 +1,21 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Dict, List
-from app.core_modules.anomaly.model import AnomalyDetector
+from typing import Any, Dict, List
+from app.core_modules.anomaly.model import get_session_detector, get_session_samples
+from app.core.batching import MicroBatcher
+from app.core.settings import get_settings
 from datetime import datetime, timedelta
+from app.core.instrumentation import InstrumentedRoute
 
-router = APIRouter()
-anomaly_detector = AnomalyDetector()
+router = APIRouter(route_class=InstrumentedRoute)
+settings = get_settings()
+anomaly_detector = get_session_detector()
+session_batcher = MicroBatcher(
+    "session_anomaly",
+    "analyze_batch",
+    max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS
+)
 
 class SessionData(BaseModel):
     user_id: str
@@ -19,7 +29,7 @@ class AnomalyResponse(BaseModel):
     timestamp: str
     anomaly_score: float
     is_anomaly: bool
-    features: Dict[str, any]
+    features: Dict[str, Any]
 
 @router.post("/analyze", response_model=Dict)
 async def analyze_session(session_data: SessionData):
@@ -27,12 +37,15 @@ async def analyze_session(session_data: SessionData):
         # Extract hour from timestamp for login time analysis
         login_hour = session_data.timestamp.hour
         
-        analysis_result = anomaly_detector.analyze({
+        features = {
             'login_hour': login_hour,
             'typing_speed': session_data.typing_speed,
             'click_rate': session_data.click_rate,
             'session_duration': session_data.session_duration
-        })
+        }
+        # Kept for retraining the session model on recent traffic
+        get_session_samples().add(list(features.values()))
+        analysis_result = await session_batcher.submit(anomaly_detector, features)
         
         return {
             **analysis_result,
@@ -1,9 +1,9 @@
-from fastapi import APIRouter
-
-api_router = APIRouter()
-
-# Import and include other routers here
-# Example:
-# from .endpoints import users, items
-# api_router.include_router(users.router, prefix="/users", tags=["users"])
-# api_router.include_router(items.router, prefix="/items", tags=["items"]) 
\ No newline at end of file
+from fastapi import APIRouter
+from .endpoints import anomaly_detection, fatigue_detection, osint, threat_detection
+
+api_router = APIRouter()
+
+api_router.include_router(threat_detection.router, prefix="/threat-detection", tags=["threat-detection"])
+api_router.include_router(anomaly_detection.router, prefix="/anomaly-detection", tags=["anomaly-detection"])
+api_router.include_router(fatigue_detection.router, prefix="/fatigue-detection", tags=["fatigue-detection"])
+api_router.include_router(osint.router, prefix="/osint", tags=["osint"])
@@ -1,25 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import Dict, List
-from ....modules.threat_detection.anomaly_detector import AnomalyDetector
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Dict, List, Optional
+from ....modules.threat_detection.model_registry import get_user_detector
+from ....modules.threat_detection import anomaly_queries
+from ....modules.threat_detection.feature_store import featurize
+from ....modules.threat_detection.feed_cache import feed_response, get_feed_cache
 from sqlalchemy.orm import Session
 from ....database import get_db
+from ....core.executor import get_inference_executor
+from ....core.batching import MicroBatcher
+from ....core.settings import get_settings
 from datetime import datetime
 from pydantic import BaseModel
 from ....middleware.rate_limiter import limiter
+from ....core.instrumentation import InstrumentedRoute
 
-router = APIRouter()
-anomaly_detector = AnomalyDetector()
+router = APIRouter(route_class=InstrumentedRoute)
+settings = get_settings()
+anomaly_batcher = MicroBatcher(
+    "threat",
+    "detect_anomalies",
+    max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS
+)
 
 @router.post("/analyze")
 @limiter.limit("5/minute")
-async def analyze_behavior(request: Request, data: Dict):
+async def analyze_behavior(request: Request, data: Dict, db: Session = Depends(get_db)):
     """
     Analyze user behavior for anomalies.
     Rate limited to 5 requests per minute per IP address.
     """
     try:
-        result = anomaly_detector.detect_anomalies([data])
-        return result[0] if result else {"error": "No analysis results"}
+        user_id = data.get("user_id")
+        anomaly_detector = await get_inference_executor().run(
+            "threat", get_user_detector, db, user_id, local=True
+        )
+        await featurize(db, user_id, [data])
+        # Single events are coalesced with concurrent ones for the same model
+        # and scored independently of each other
+        return await anomaly_batcher.submit(anomaly_detector, data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -28,15 +47,23 @@ async def analyze_behavior(request: Request, data: Dict):
 async def get_recent_anomalies(
     request: Request,
     user_id: int,
+    limit: int = Query(10, ge=1, le=anomaly_queries.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Get recent anomalies for a user.
+    Get recent anomalies for a user, newest first (10 per page by default).
+    If there are more, the X-Next-Cursor header holds the cursor for the next page.
+    Supports If-None-Match (304 when unchanged) via the shared feed cache.
     Rate limited to 30 requests per minute per IP address.
     """
     try:
-        # Get last 10 anomalies for the user
-        anomalies = anomaly_detector.get_recent_anomalies(user_id, limit=10)
-        return anomalies
+        feed = await get_feed_cache().get_or_load(
+            (user_id, limit, cursor),
+            lambda: anomaly_queries.get_recent_anomalies(db, user_id, limit=limit, cursor=cursor)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    return feed_response(request, feed)
@@ -1,13 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, List
-from ....modules.fatigue_detection.fatigue_monitor import FatigueMonitor
+from typing import Dict, List, Optional
+from ....modules.fatigue_detection.fatigue_monitor import get_fatigue_model, get_fatigue_samples
+from ....modules.fatigue_detection.baseline import BaselineStore
 from sqlalchemy.orm import Session
 from ....database import get_db
+from ....core.settings import get_settings
+from ....core.executor import get_inference_executor
+from ....core.batching import MicroBatcher
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from ....core.instrumentation import InstrumentedRoute
+from ....core.responses import FastJSONResponse
 
-router = APIRouter()
-fatigue_monitor = FatigueMonitor()
+router = APIRouter(route_class=InstrumentedRoute)
+settings = get_settings()
+baseline_store = BaselineStore(max_users=settings.FATIGUE_BASELINE_MAX_USERS)
+fatigue_batcher = MicroBatcher(
+    "fatigue",
+    "score_features",
+    max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS
+)
 
 class UserInteractionData(BaseModel):
     user_id: int
@@ -24,6 +37,41 @@ class FatigueAnalysisResponse(BaseModel):
     indicators: Dict[str, bool]
     recommendations: List[str]
 
+class InteractionSample(BaseModel):
+    typing_speed: float
+    click_rate: float
+    error_rate: float
+    session_duration: float  # in minutes
+    inactivity_periods: int
+    timestamp: Optional[datetime] = None
+
+class InteractionSeries(BaseModel):
+    user_id: int
+    samples: List[InteractionSample] = Field(..., min_length=1, max_length=settings.FATIGUE_SERIES_MAX_SAMPLES)
+
+class FatigueSamplePoint(BaseModel):
+    timestamp: Optional[str] = None
+    fatigue_score: float
+    needs_break: bool
+    indicators: Dict[str, bool]
+
+class FatigueTrend(BaseModel):
+    slope: float  # change in fatigue score per `unit`
+    unit: str  # "hour" if every sample has a timestamp, else "sample"
+    start_score: float
+    end_score: float
+    mean_score: float
+    max_score: float
+    samples_needing_break: int
+    first_break_index: Optional[int] = None
+
+class FatigueSeriesResponse(BaseModel):
+    timestamp: str
+    samples: List[FatigueSamplePoint]
+    trend: FatigueTrend
+    needs_break: bool
+    recommendations: List[str]
+
 @router.post("/analyze", response_model=FatigueAnalysisResponse)
 async def analyze_fatigue(
     data: UserInteractionData,
@@ -36,8 +84,17 @@ async def analyze_fatigue(
         # Convert Pydantic model to dict
         interaction_data = data.dict()
         
-        # Analyze fatigue
-        result = fatigue_monitor.detect_fatigue(interaction_data)
+        # The same monitor throughout, even if retraining swaps in a new one
+        fatigue_monitor = get_fatigue_model().model
+
+        # Analyze fatigue against the user's own baseline, then fold this
+        # sample into it so the baseline keeps up without re-uploads
+        baseline = baseline_store.get(data.user_id)
+        features = fatigue_monitor.feature_vector(interaction_data, baseline)
+        get_fatigue_samples().add(features)
+        fatigue_score = await fatigue_batcher.submit(fatigue_monitor, features)
+        result = fatigue_monitor.build_result(interaction_data, fatigue_score, baseline)
+        baseline_store.update(data.user_id, interaction_data)
         
         # Store the analysis result if needed
         # TODO: Add database storage logic here
@@ -46,6 +103,34 @@ async def analyze_fatigue(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze/series", response_model=FatigueSeriesResponse)
+async def analyze_fatigue_series(data: InteractionSeries):
+    """
+    Analyze a time series of interaction samples (e.g. a work session) in one
+    request: per-sample fatigue scores and the session's fatigue trend.
+    The response is shaped like FatigueSeriesResponse but not validated
+    against it.
+    """
+    try:
+        samples = [sample.dict() for sample in data.samples]
+        fatigue_monitor = get_fatigue_model().model
+
+        # Every sample is scored against the baseline as it was before the series
+        baseline = baseline_store.get(data.user_id)
+        result, features = await get_inference_executor().run(
+            "fatigue", fatigue_monitor.analyze_series, samples, baseline
+        )
+        reservoir = get_fatigue_samples()
+        for row in features:
+            reservoir.add(row)
+        for sample in samples:
+            baseline_store.update(data.user_id, sample)
+
+        # Built by the monitor itself, so it's rendered without revalidation
+        return FastJSONResponse(result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/train-baseline/{user_id}")
 async def train_user_baseline(
     user_id: int,
@@ -53,15 +138,35 @@ async def train_user_baseline(
     db: Session = Depends(get_db)
 ):
     """
-    Train the fatigue detection model with user's historical data.
+    Seed the user's baseline with historical data. Optional: baselines also
+    build up from /analyze.
+
+    Only this user's baseline changes. The fatigue model is shared by all
+    users (its features are ratios to each user's own baseline); the
+    history is added to the sample it is next retrained on.
     """
     try:
         # Convert Pydantic models to dicts
         data = [item.dict() for item in historical_data]
-        
-        # Train the model
-        fatigue_monitor.train_baseline(data)
-        
-        return {"message": "Baseline training completed successfully"}
+
+        for item in data:
+            baseline_store.update(user_id, item)
+
+        reservoir = get_fatigue_samples()
+        for row in get_fatigue_model().model.feature_matrix(data, baseline_store.get(user_id)):
+            reservoir.add(row)
+
+        return {"message": "Baseline training completed successfully", "samples": len(data)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/baseline/{user_id}")
+async def get_user_baseline(user_id: int):
+    """
+    Current streaming baseline statistics for a user.
+    """
+    baseline = baseline_store.get(user_id)
+    if baseline is None:
+        raise HTTPException(status_code=404, detail="No baseline for this user yet")
+    return {"user_id": user_id, **baseline.to_dict()}
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Dict, Optional
+import json
 from pydantic import BaseModel, EmailStr
-from ....modules.osint.scanner import OSINTScanner
+from ....modules.osint.jobs import get_osint_jobs, job_timestamp
+from ....core.settings import get_settings
 from datetime import datetime
-import asyncio
+from ....core.instrumentation import InstrumentedRoute
 
-router = APIRouter()
-scanner = OSINTScanner()
+router = APIRouter(route_class=InstrumentedRoute)
 
 class ScanRequest(BaseModel):
     email: Optional[EmailStr] = None
@@ -18,41 +20,28 @@ class ScanResponse(BaseModel):
     status: str
     message: str
     timestamp: str
+    queue_position: Optional[int] = None
 
 class ScanResult(BaseModel):
     scan_id: str
     status: str
     results: Dict
     timestamp: str
+    queue_position: Optional[int] = None
 
-# Store scan results in memory (in production, use a proper database)
-scan_results = {}
-
-async def run_scan(scan_id: str, data: Dict):
-    """Background task to run the OSINT scan."""
-    try:
-        results = await scanner.scan_user_data(data)
-        scan_results[scan_id] = {
-            "scan_id": scan_id,
-            "status": "completed",
-            "results": results,
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        scan_results[scan_id] = {
-            "scan_id": scan_id,
-            "status": "error",
-            "results": {"error": str(e)},
-            "timestamp": datetime.now().isoformat()
-        }
+def _scan_result(job: Dict) -> Dict:
+    return {
+        "scan_id": job["scan_id"],
+        "status": job["status"],
+        "results": job["results"],
+        "timestamp": job_timestamp(job),
+        "queue_position": job["queue_position"]
+    }
 
 @router.post("/scan-user-data", response_model=ScanResponse)
-async def scan_user_data(
-    data: ScanRequest,
-    background_tasks: BackgroundTasks
-):
+async def scan_user_data(data: ScanRequest):
     """
-    Initiate an OSINT scan for the provided user data.
+    Queue an OSINT scan for the provided user data.
     At least one of email, username, or domain must be provided.
     """
     if not any([data.email, data.username, data.domain]):
@@ -61,54 +50,98 @@ async def scan_user_data(
             detail="At least one of email, username, or domain must be provided"
         )
 
-    # Generate a unique scan ID
-    scan_id = f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{id(data)}"
-    
-    # Initialize scan status
-    scan_results[scan_id] = {
-        "scan_id": scan_id,
-        "status": "pending",
-        "results": {},
-        "timestamp": datetime.now().isoformat()
-    }
-    
-    # Start the scan in the background
-    background_tasks.add_task(
-        run_scan,
-        scan_id,
-        data.dict(exclude_none=True)
-    )
+    # Persisted before returning; runs when a job slot is free
+    job = await get_osint_jobs().submit(data.dict(exclude_none=True))
     
     return {
-        "scan_id": scan_id,
-        "status": "pending",
-        "message": "Scan initiated successfully",
-        "timestamp": datetime.now().isoformat()
+        "scan_id": job["scan_id"],
+        "status": job["status"],
+        "message": "Scan queued successfully",
+        "timestamp": datetime.now().isoformat(),
+        "queue_position": job["queue_position"]
     }
 
 @router.get("/scan-results/{scan_id}", response_model=ScanResult)
 async def get_scan_results(scan_id: str):
     """
-    Retrieve the results of a previously initiated scan.
+    Retrieve the status (and queue position while pending) or results of a scan.
+    """
+    job = await get_osint_jobs().get(scan_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Scan ID not found"
+        )
+    
+    return _scan_result(job)
+
+@router.get("/scan-results/{scan_id}/stream")
+async def stream_scan_results(scan_id: str):
+    """
+    Follow a scan as server-sent events: "status" changes, an "item" for each
+    subdomain or profile found, a "tool" event with each tool's result, and a
+    final "result" event shaped like GET /scan-results/{scan_id}. An
+    "overflow" event means the client fell behind and should fetch the
+    results instead.
     """
-    if scan_id not in scan_results:
+    jobs = get_osint_jobs()
+    if await jobs.get(scan_id) is None:
         raise HTTPException(
             status_code=404,
             detail="Scan ID not found"
         )
+
+    async def events():
+        async for event in jobs.stream(scan_id, get_settings().OSINT_STREAM_KEEPALIVE_SECONDS):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            name, data = event
+            if name == "result":
+                data = _scan_result(data)
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/scan-results/{scan_id}/cancel", response_model=ScanResult)
+async def cancel_scan(scan_id: str):
+    """
+    Cancel a pending or running scan, killing its tool processes.
+    """
+    jobs = get_osint_jobs()
+    if await jobs.get(scan_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Scan ID not found"
+        )
+    if not await jobs.cancel(scan_id):
+        raise HTTPException(
+            status_code=409,
+            detail="Scan has already finished"
+        )
     
-    return scan_results[scan_id]
+    return _scan_result(await jobs.get(scan_id))
 
 @router.delete("/scan-results/{scan_id}")
 async def delete_scan_results(scan_id: str):
     """
-    Delete the results of a completed scan.
+    Delete a scan, cancelling it first if it hasn't finished.
     """
-    if scan_id not in scan_results:
+    if not await get_osint_jobs().delete(scan_id):
         raise HTTPException(
             status_code=404,
             detail="Scan ID not found"
         )
     
-    del scan_results[scan_id]
-    return {"message": "Scan results deleted successfully"} 
\ No newline at end of file
+    return {"message": "Scan results deleted successfully"}
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    """
+    Job counts by status, the configured job/tool limits and result cache stats.
+    """
+    return await get_osint_jobs().stats()
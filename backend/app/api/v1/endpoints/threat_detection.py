@@ -1,69 +1,253 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict, Any
-from ....modules.threat_detection.anomaly_detector import AnomalyDetector, generate_mock_data
-from ....models.user_activity import UserActivity
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Dict, Any, Optional
+from ....modules.threat_detection.model_registry import get_model_registry, get_user_detector
+from ....modules.threat_detection.activity_storage import get_activity_maintenance
+from ....modules.threat_detection.activity_writer import activity_column_rows, activity_rows, get_activity_writer
+from ....modules.threat_detection.anomaly_detector import result_dicts
+from ....modules.threat_detection.feature_store import featurize, featurize_columns, get_feature_store
+from ....modules.threat_detection import anomaly_queries
+from ....modules.threat_detection.feed_cache import feed_response, get_feed_cache
 from sqlalchemy.orm import Session
-from ....database import get_db
-from datetime import datetime, timedelta
+from ....database import SessionLocal, get_db
+from ....core import columnar
+from ....core.executor import get_inference_executor
+from ....core.instrumentation import InstrumentedRoute
+from ....core.ndjson_stream import NDJSONPipeline, NDJSONStreamingResponse
+from ....core.responses import FastJSONResponse
+from ....core.retraining import get_retraining_service
+from ....core.settings import get_settings
 
-router = APIRouter()
-anomaly_detector = AnomalyDetector()
+router = APIRouter(route_class=InstrumentedRoute)
 
-# Initialize with mock data
-mock_data = generate_mock_data(100)
-anomaly_detector.train(mock_data)
 
+# Request bodies /analyze accepts besides JSON, for the OpenAPI schema
+_COLUMNAR_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            **{fmt: {"schema": {"type": "string", "format": "binary"}} for fmt in columnar.FORMATS},
+        },
+    }
+}
 
-@router.post("/analyze", response_model=List[Dict[str, Any]])
-async def analyze_user_activity(
-    activities: List[Dict[str, Any]],
-    db: Session = Depends(get_db)
-):
+
+@router.post("/analyze", response_model=List[Dict[str, Any]], openapi_extra=_COLUMNAR_BODY)
+async def analyze_user_activity(request: Request, db: Session = Depends(get_db)):
     """
     Analyze user activities for potential threats.
+
+    Takes a JSON array of activities, or the same fields as columns in a
+    columnar binary body (.npz, Arrow IPC or MessagePack, by Content-Type;
+    see app.core.columnar). Columnar requests are answered with result
+    columns in the same format, unless Accept asks for another one.
+
+    login_count, location_changed and browser_changed are derived on the
+    server from each activity's ip_address, location, browser_fingerprint
+    and user_agent and the user's earlier activities (see
+    UserFeatureStore); client values only stand in for flags whose raw
+    fields are missing.
+
+    Results come straight from the detector, so they are rendered with
+    orjson without being revalidated against the response model.
     """
+    content_type = request.headers.get("content-type")
+    if columnar.is_columnar(content_type):
+        return await _analyze_columns(request, db, columnar.media_type(content_type))
+    try:
+        activities = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be a JSON array of activities")
+    if not isinstance(activities, list) or not all(isinstance(activity, dict) for activity in activities):
+        raise HTTPException(status_code=422, detail="Body must be a JSON array of activities")
+
     try:
+        executor = get_inference_executor()
+        user_id = activities[0].get("user_id") if activities else None
+        anomaly_detector = await executor.run("threat", get_user_detector, db, user_id, local=True)
+        await featurize(db, user_id, activities)
+
         # Detect anomalies
-        results = anomaly_detector.detect_anomalies(activities)
-        
-        # Store results in database
-        for result in results:
-            if result["is_anomaly"]:
-                activity = UserActivity(
-                    user_id=activities[0].get("user_id"),  # Assuming all activities are from same user
-                    timestamp=datetime.fromisoformat(result["timestamp"]),
-                    anomaly_score=result["anomaly_score"],
-                    additional_data=result
-                )
-                db.add(activity)
+        results = await executor.run("threat", anomaly_detector.detect_anomalies, activities)
         
-        db.commit()
-        return results
+        # Results are written in bulk in the background; the response
+        # doesn't wait for the database
+        await get_activity_writer().put(activity_rows(user_id, results))
+        return FastJSONResponse(results)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _analyze_columns(request: Request, db: Session, request_format: str) -> Response:
+    try:
+        response_format = columnar.response_format(request.headers.get("accept"), request_format)
+        if response_format is not None:
+            columnar.require(response_format)
+        columns = columnar.decode_columns(request_format, await request.body())
+    except columnar.UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except columnar.ColumnarPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "timestamp" not in columns:
+        raise HTTPException(status_code=422, detail="Missing required column: timestamp")
+
+    try:
+        executor = get_inference_executor()
+        user_ids = columns.get("user_id")
+        user_id = user_ids[0].item() if user_ids is not None and len(user_ids) else None
+        anomaly_detector = await executor.run("threat", get_user_detector, db, user_id, local=True)
+        columns = await featurize_columns(db, user_id, columns)
+        results = await executor.run("threat", anomaly_detector.detect_anomaly_columns, columns)
+        await get_activity_writer().put(activity_column_rows(user_id, columns["timestamp"], results))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if response_format is None:
+        return FastJSONResponse(result_dicts(columns["timestamp"], results))
+    return Response(columnar.encode_columns(response_format, results), media_type=response_format)
+
+
+async def _score_chunk(db: Session, activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """detect_anomalies over a chunk of a stream, per user, results in input order."""
+    executor = get_inference_executor()
+    rows_by_user: Dict[Any, List[int]] = {}
+    for i, activity in enumerate(activities):
+        rows_by_user.setdefault(activity.get("user_id"), []).append(i)
+
+    results: List[Dict[str, Any]] = [None] * len(activities)
+    for user_id, rows in rows_by_user.items():
+        detector = await executor.run("threat", get_user_detector, db, user_id, local=True)
+        user_activities = [activities[i] for i in rows]
+        await featurize(db, user_id, user_activities)
+        scored = await executor.run("threat", detector.detect_anomalies, user_activities)
+        # Waits while the write-behind buffer is full, which slows the stream down too
+        await get_activity_writer().put(activity_rows(user_id, scored))
+        for i, result in zip(rows, scored):
+            results[i] = {"user_id": user_id, **result}
+    return results
+
+
+@router.post("/analyze/stream")
+async def analyze_activity_stream(request: Request):
+    """
+    Score a stream of activities sent as NDJSON (one JSON object per line,
+    e.g. over chunked transfer encoding), returning one NDJSON result line
+    per input line as soon as its chunk is scored.
+
+    Scores are per event and on the same scale as /analyze (see
+    anomaly_detector.calibrated_scores), however lines are chunked. Each
+    result carries the input ``line`` number; bad lines get an ``error``.
+    Reading of the body pauses while scoring falls behind.
+    """
+    settings = get_settings()
+
+    async def results():
+        with SessionLocal() as db:
+            pipeline = NDJSONPipeline(
+                "threat_activities",
+                lambda activities: _score_chunk(db, activities),
+                chunk_size=settings.STREAM_INGEST_CHUNK_SIZE,
+                max_wait_ms=settings.STREAM_INGEST_MAX_WAIT_MS,
+                max_pending_chunks=settings.STREAM_INGEST_MAX_PENDING_CHUNKS,
+                max_line_bytes=settings.STREAM_INGEST_MAX_LINE_BYTES,
+            )
+            async for lines in pipeline.run(request.stream()):
+                yield lines
+
+    return NDJSONStreamingResponse(results())
+
+
 @router.get("/recent-anomalies/{user_id}")
 async def get_recent_anomalies(
     user_id: int,
+    request: Request,
+    limit: int = Query(anomaly_queries.DEFAULT_PAGE_SIZE, ge=1, le=anomaly_queries.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Get recent anomalies for a specific user.
+    Get recent anomalies for a specific user, newest first.
+    If there are more, the X-Next-Cursor header holds the cursor for the next page.
+    Served from the feed cache when possible; send If-None-Match to get 304
+    when the feed hasn't changed.
     """
-    cutoff_date = datetime.utcnow() - timedelta(days=7)
-    anomalies = db.query(UserActivity).filter(
-        UserActivity.user_id == user_id,
-        UserActivity.timestamp >= cutoff_date,
-        UserActivity.anomaly_score > 0.8
-    ).all()
-    
-    return [
-        {
-            "timestamp": anomaly.timestamp,
-            "anomaly_score": anomaly.anomaly_score,
-            "details": anomaly.additional_data
-        }
-        for anomaly in anomalies
-    ] 
\ No newline at end of file
+    try:
+        feed = await get_feed_cache().get_or_load(
+            (user_id, limit, cursor),
+            lambda: anomaly_queries.get_recent_anomalies(db, user_id, limit=limit, cursor=cursor)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return feed_response(request, feed)
+
+
+@router.get("/activity-trend/{user_id}")
+async def get_activity_trend(
+    user_id: int,
+    hours: int = Query(24 * 7, ge=1, le=24 * 366),
+    db: Session = Depends(get_db)
+):
+    """
+    Hourly activity and anomaly counts and max/mean anomaly score of a user
+    over the last ``hours`` hours, oldest first. Read from the hourly
+    rollups, which trail raw activity by up to the storage maintenance
+    interval; hours without activity are left out.
+    """
+    return {"user_id": user_id, "hours": anomaly_queries.get_activity_trend(db, user_id, hours)}
+
+
+@router.get("/model-registry/stats")
+async def get_model_registry_stats():
+    """
+    Hit/miss/eviction counters and memory use of the per-user model registry.
+    """
+    return get_model_registry().stats()
+
+
+@router.get("/feature-store/stats")
+async def get_feature_store_stats():
+    """
+    Size and counters of the per-user behavioral feature store.
+    """
+    feature_store = get_feature_store()
+    if feature_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **feature_store.stats()}
+
+
+@router.get("/feature-store/{user_id}")
+async def get_user_features(user_id: int):
+    """
+    Behavioral feature state the feature store holds for a user.
+    """
+    feature_store = get_feature_store()
+    state = feature_store.get(user_id) if feature_store is not None else None
+    if state is None:
+        raise HTTPException(status_code=404, detail="No feature state for this user yet")
+    return {"user_id": user_id, **state.to_dict()}
+
+
+@router.get("/feed-cache/stats")
+async def get_feed_cache_stats():
+    """
+    Size, eviction and invalidation counters of the recent-anomaly feed cache.
+    """
+    return get_feed_cache().stats()
+
+
+@router.get("/retraining/stats")
+async def get_retraining_stats():
+    """
+    Version, sample counts and duration of the last retraining run of each model.
+    """
+    return get_retraining_service().stats()
+
+
+@router.get("/activity-storage/stats")
+async def get_activity_storage_stats():
+    """
+    Settings and outcome of the last user_activities maintenance run in
+    this process: partitions created and dropped, expired rows, rollup.
+    """
+    return get_activity_maintenance().stats()
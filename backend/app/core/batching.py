@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from .executor import InferenceExecutor, get_inference_executor
+from .metrics import MICRO_BATCH_ADDED_LATENCY, MICRO_BATCH_SIZE
+
+
+class _Batch:
+    __slots__ = ("target", "items", "futures", "enqueued_at", "timer")
+
+    def __init__(self, target: Any):
+        self.target = target
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.enqueued_at: List[float] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row scoring calls into one batch call.
+
+    ``submit(target, item)`` parks the caller until its batch is dispatched,
+    which happens when ``max_batch_size`` items are waiting or ``max_wait_ms``
+    after the first one arrived, whichever comes first. The batch is scored
+    with a single ``target.<method>(items)`` call on the inference executor and
+    each caller gets back its own element of the returned list.
+
+    Items are only batched with others for the same ``target`` (e.g. the same
+    per-user model). Batch sizes and the latency added by waiting are exported
+    as histograms so the window can be tuned.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        executor: Optional[InferenceExecutor] = None,
+    ):
+        self.name = name
+        self.method = method
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._executor = executor
+        self._pending: Dict[int, _Batch] = {}
+        # The event loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+
+    @property
+    def executor(self) -> InferenceExecutor:
+        return self._executor or get_inference_executor()
+
+    async def submit(self, target: Any, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        key = id(target)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch(target)
+            batch.timer = loop.call_later(self.max_wait, self._dispatch, key, batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        batch.enqueued_at.append(time.perf_counter())
+        if len(batch.items) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._dispatch(key, batch)
+        return await future
+
+    def _dispatch(self, key: int, batch: _Batch):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: _Batch):
+        now = time.perf_counter()
+        MICRO_BATCH_SIZE.labels(self.name).observe(len(batch.items))
+        for enqueued_at in batch.enqueued_at:
+            MICRO_BATCH_ADDED_LATENCY.labels(self.name).observe(now - enqueued_at)
+
+        try:
+            results = await self.executor.run(self.name, getattr(batch.target, self.method), batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+        if len(results) < len(batch.futures):
+            error = RuntimeError(
+                f"{self.name}: {self.method} returned {len(results)} results for {len(batch.futures)} items"
+            )
+            for future in batch.futures[len(results):]:
+                if not future.done():
+                    future.set_exception(error)
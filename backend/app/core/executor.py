@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import INFERENCE_CALLS, INFERENCE_IN_FLIGHT, INFERENCE_QUEUE_DEPTH, INFERENCE_WAIT_SECONDS
+from .settings import get_settings
+
+
+class InferenceExecutor:
+    """Runs CPU-bound model work (scoring, fitting) off the event loop.
+
+    Calls are grouped by model name. Each model has its own concurrency limit,
+    so one slow model (or a training run) can't take every pool worker.
+    Queue depth and in-flight counts are tracked per model.
+
+    ``kind="process"`` uses a process pool, which sidesteps the GIL but pickles
+    the callable and its arguments on every call. Work that must run against
+    this process's own state (the model registry, a DB session, fitting a live
+    model) has to pass ``local=True``, which always uses the thread pool.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 4,
+        model_limits: Optional[Dict[str, int]] = None,
+        default_limit: Optional[int] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.model_limits = dict(model_limits or {})
+        self.default_limit = default_limit or max_workers
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._pool: Executor = (
+            ProcessPoolExecutor(max_workers=max_workers) if kind == "process" else self._threads
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._queued: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            limit = self.model_limits.get(model, self.default_limit)
+            semaphore = self._semaphores[model] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def run(self, model: str, fn: Callable[..., Any], *args: Any, local: bool = False, **kwargs: Any) -> Any:
+        """Run ``fn(*args, **kwargs)`` in the pool under ``model``'s concurrency limit."""
+        loop = asyncio.get_running_loop()
+        pool = self._threads if local else self._pool
+        call = functools.partial(fn, *args, **kwargs)
+
+        queued_at = time.perf_counter()
+        self._enqueue(model, 1)
+        started = False
+        try:
+            async with self._semaphore(model):
+                started = True
+                self._enqueue(model, -1)
+                INFERENCE_WAIT_SECONDS.labels(model).observe(time.perf_counter() - queued_at)
+                self._running[model] = self._running.get(model, 0) + 1
+                INFERENCE_IN_FLIGHT.labels(model).inc()
+                try:
+                    result = await loop.run_in_executor(pool, call)
+                finally:
+                    self._running[model] -= 1
+                    INFERENCE_IN_FLIGHT.labels(model).dec()
+        except Exception:
+            INFERENCE_CALLS.labels(model, "error").inc()
+            raise
+        finally:
+            if not started:
+                # cancelled while still waiting for a slot
+                self._enqueue(model, -1)
+        INFERENCE_CALLS.labels(model, "ok").inc()
+        return result
+
+    def _enqueue(self, model: str, delta: int):
+        self._queued[model] = self._queued.get(model, 0) + delta
+        INFERENCE_QUEUE_DEPTH.labels(model).inc(delta)
+
+    def stats(self) -> Dict[str, Any]:
+        models = set(self._queued) | set(self._running) | set(self.model_limits)
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "models": {
+                model: {
+                    "queued": self._queued.get(model, 0),
+                    "running": self._running.get(model, 0),
+                    "limit": self.model_limits.get(model, self.default_limit),
+                }
+                for model in sorted(models)
+            },
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._threads.shutdown(wait=wait)
+        if self._pool is not self._threads:
+            self._pool.shutdown(wait=wait)
+
+
+@lru_cache()
+def get_inference_executor() -> InferenceExecutor:
+    settings = get_settings()
+    return InferenceExecutor(
+        kind=settings.INFERENCE_EXECUTOR,
+        max_workers=settings.INFERENCE_MAX_WORKERS,
+        model_limits=settings.INFERENCE_MODEL_CONCURRENCY,
+    )
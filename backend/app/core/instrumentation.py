@@ -0,0 +1,114 @@
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .metrics import PIPELINE_BATCH_ROWS, PIPELINE_STAGE_SECONDS, REQUEST_STAGE_SECONDS
+
+SCORING_STAGES = ("features", "score", "results")
+
+# [endpoint started, endpoint returned] for the request being handled
+_endpoint_marks: contextvars.ContextVar = contextvars.ContextVar("endpoint_marks", default=None)
+
+
+class StageTimer:
+    """Stage histograms of one pipeline, bound to their labels up front.
+
+    ``observe`` is a dict lookup plus ``Histogram.observe``, cheap enough
+    to call on every scoring call. Pipelines and stages are fixed names,
+    so label cardinality stays bounded.
+    """
+
+    __slots__ = ("pipeline", "_stages", "_rows")
+
+    def __init__(self, pipeline: str, stages: Sequence[str] = SCORING_STAGES):
+        self.pipeline = pipeline
+        self._stages = {stage: PIPELINE_STAGE_SECONDS.labels(pipeline, stage) for stage in stages}
+        self._rows = None
+
+    def observe(self, stage: str, seconds: float):
+        self._stages[stage].observe(seconds)
+
+    def rows(self, count: int):
+        if self._rows is None:
+            self._rows = PIPELINE_BATCH_ROWS.labels(self.pipeline)
+        self._rows.observe(count)
+
+
+def _mark_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint to record when it starts and returns."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def marked(*args, **kwargs):
+            marks = _endpoint_marks.get()
+            if marks is not None:
+                marks[0] = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if marks is not None:
+                    marks[1] = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def marked(*args, **kwargs):
+            marks = _endpoint_marks.get()
+            if marks is not None:
+                marks[0] = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if marks is not None:
+                    marks[1] = time.perf_counter()
+    return marked
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that times each request in three stages, per route template:
+
+    * ``parse``: reading and validating the body, and resolving dependencies;
+    * ``handler``: the endpoint function itself;
+    * ``serialize``: response model validation and rendering the response.
+
+    Use as ``APIRouter(route_class=InstrumentedRoute)``. The route label is
+    the path template (``/recent-anomalies/{user_id}``), never the raw path.
+    Streaming responses are timed until the response object is created.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, _mark_endpoint(endpoint), **kwargs)
+        self._stage_histograms: Optional[Dict[str, Any]] = None
+
+    def _histograms(self) -> Dict[str, Any]:
+        # Bound lazily: the router prefix is only known once the route is included
+        if self._stage_histograms is None:
+            self._stage_histograms = {
+                stage: REQUEST_STAGE_SECONDS.labels(self.path_format, stage)
+                for stage in ("parse", "handler", "serialize")
+            }
+        return self._stage_histograms
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            marks = [0.0, 0.0]
+            token = _endpoint_marks.set(marks)
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+            finally:
+                _endpoint_marks.reset(token)
+            end = time.perf_counter()
+            if marks[1]:
+                histograms = self._histograms()
+                histograms["parse"].observe(marks[0] - start)
+                histograms["handler"].observe(marks[1] - marks[0])
+                histograms["serialize"].observe(end - marks[1])
+            return response
+
+        return timed_handler
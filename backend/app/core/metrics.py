@@ -0,0 +1,223 @@
+"""
+Prometheus metrics defined by the application, served from /metrics.
+
+Label values must come from small fixed sets (model names, tool names),
+never from request data.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request and pipeline stages
+REQUEST_STAGE_SECONDS = Histogram(
+    "request_stage_seconds",
+    "Time per request stage (parse, handler, serialize), by route template",
+    ["route", "stage"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Time per ML pipeline stage (features, score, results, serialize)",
+    ["pipeline", "stage"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+PIPELINE_BATCH_ROWS = Histogram(
+    "pipeline_batch_rows",
+    "Rows per scoring call",
+    ["pipeline"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096),
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "model_load_seconds",
+    "Time to make a model ready, by how (artifact, fallback, spill, trained)",
+    ["model", "source"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# Startup warmup
+WARMUP_STEP_SECONDS = Gauge(
+    "warmup_step_seconds",
+    "Time the last run of each startup warmup step took",
+    ["step"],
+)
+WARMUP_READY = Gauge(
+    "warmup_ready",
+    "1 once every warmup step has succeeded (what /ready reports)",
+)
+
+# Inference executor
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_queue_depth",
+    "Calls waiting for a concurrency slot or a pool worker",
+    ["model"],
+)
+INFERENCE_IN_FLIGHT = Gauge(
+    "inference_in_flight",
+    "Calls currently executing in the inference pool",
+    ["model"],
+)
+INFERENCE_WAIT_SECONDS = Histogram(
+    "inference_wait_seconds",
+    "Time a call spent queued before it started executing",
+    ["model"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+INFERENCE_CALLS = Counter(
+    "inference_calls_total",
+    "Calls completed by the inference executor",
+    ["model", "outcome"],
+)
+
+# Micro-batching
+MICRO_BATCH_SIZE = Histogram(
+    "micro_batch_size",
+    "Rows per coalesced scoring call",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MICRO_BATCH_ADDED_LATENCY = Histogram(
+    "micro_batch_added_latency_seconds",
+    "Time a row waited for its batch to be dispatched",
+    ["batcher"],
+    buckets=(0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05),
+)
+
+# Write-behind persistence
+WRITE_BEHIND_PENDING = Gauge(
+    "write_behind_pending_rows",
+    "Rows queued in memory and not yet written",
+    ["queue"],
+)
+WRITE_BEHIND_ROWS = Counter(
+    "write_behind_rows_total",
+    "Rows leaving the write-behind queue",
+    ["queue", "outcome"],
+)
+WRITE_BEHIND_FLUSH_ROWS = Histogram(
+    "write_behind_flush_rows",
+    "Rows per bulk write",
+    ["queue"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500),
+)
+WRITE_BEHIND_FLUSH_SECONDS = Histogram(
+    "write_behind_flush_seconds",
+    "Duration of one bulk write",
+    ["queue"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# Background retraining
+RETRAIN_RUNS = Counter(
+    "retrain_runs_total",
+    "Background retraining runs by outcome (swapped, skipped, error)",
+    ["model", "outcome"],
+)
+RETRAIN_SECONDS = Histogram(
+    "retrain_seconds",
+    "Time to sample data for and fit a replacement model",
+    ["model"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+RETRAIN_SAMPLES = Gauge(
+    "retrain_samples",
+    "Samples the live model was last fitted on",
+    ["model"],
+)
+MODEL_VERSION = Gauge(
+    "model_version",
+    "Retrained versions swapped in since the process started",
+    ["model"],
+)
+
+# user_activities storage maintenance
+ACTIVITY_PARTITIONS = Gauge(
+    "activity_partitions",
+    "Daily partitions of user_activities",
+)
+ACTIVITY_MAINTENANCE_SECONDS = Histogram(
+    "activity_maintenance_seconds",
+    "Time per user_activities maintenance step (partitions, retention, rollup)",
+    ["step"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300),
+)
+
+# Behavioral feature store
+FEATURE_STORE_USERS = Gauge(
+    "feature_store_users",
+    "Users with behavioral feature state held in memory",
+)
+
+# Recent-anomaly feed cache
+FEED_CACHE_REQUESTS = Counter(
+    "feed_cache_requests_total",
+    "Recent-anomaly feed lookups by result (hit, miss, not_modified)",
+    ["result"],
+)
+
+# Session store
+SESSION_STORE_LIVE = Gauge(
+    "session_store_live_sessions",
+    "Sessions currently held by the session store",
+    ["store"],
+)
+SESSION_STORE_EVICTIONS = Counter(
+    "session_store_evictions_total",
+    "Sessions removed by the session store because they expired",
+    ["store"],
+)
+
+# Rate limiting
+RATE_LIMIT_STORAGE_BUSY = Counter(
+    "rate_limit_storage_busy_total",
+    "Rate-limit hits let through because the shared counter store stayed locked",
+)
+
+# Response compression
+RESPONSE_COMPRESSION_BYTES = Counter(
+    "response_compression_bytes_total",
+    "Bytes of compressed response bodies before (raw) and after (compressed) compression",
+    ["encoding", "stage"],
+)
+
+# Streaming NDJSON ingestion
+NDJSON_STREAM_LINES = Counter(
+    "ndjson_stream_lines_total",
+    "Lines of streamed NDJSON request bodies by result (ok, error)",
+    ["stream", "result"],
+)
+NDJSON_STREAM_BLOCKED_SECONDS = Counter(
+    "ndjson_stream_blocked_seconds_total",
+    "Time spent not reading streamed bodies because processing fell behind",
+    ["stream"],
+)
+
+# OSINT scans
+OSINT_TOOL_RUNS = Counter(
+    "osint_tool_runs_total",
+    "OSINT tool subprocess runs by outcome (success, error, timeout, cancelled)",
+    ["tool", "outcome"],
+)
+OSINT_TOOL_SECONDS = Histogram(
+    "osint_tool_seconds",
+    "Wall time of one OSINT tool subprocess",
+    ["tool"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 900, 1800),
+)
+OSINT_CACHE_REQUESTS = Counter(
+    "osint_cache_requests_total",
+    "OSINT tool result lookups by result (hit, miss, joined an in-flight run)",
+    ["tool", "result"],
+)
+OSINT_CACHE_SAVED_SECONDS = Counter(
+    "osint_cache_saved_seconds_total",
+    "Tool run time avoided by cache hits and joined runs",
+    ["tool"],
+)
+OSINT_STREAM_EVENTS = Counter(
+    "osint_stream_events_total",
+    "OSINT scan events for streaming subscribers (sent, or overflow when one was dropped)",
+    ["result"],
+)
+OSINT_JOBS = Counter(
+    "osint_jobs_total",
+    "OSINT scan jobs by final status",
+    ["status"],
+)
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from starlette.responses import StreamingResponse
+from starlette.types import Receive
+
+from .instrumentation import StageTimer
+from .metrics import NDJSON_STREAM_BLOCKED_SECONDS, NDJSON_STREAM_LINES
+
+# (line number, parsed object or None, error message or None)
+Line = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+ChunkHandler = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+_END = object()
+
+# As FastJSONResponse renders, one object per line
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+
+
+class NDJSONPipeline:
+    """Processes a newline-delimited JSON request body in bounded chunks.
+
+    A reader task parses lines off the body into a queue holding at most
+    ``max_pending_chunks`` chunks' worth of objects. The response side takes
+    up to ``chunk_size`` objects at a time (or whatever arrived within
+    ``max_wait_ms`` of the first, so a trickling stream still gets timely
+    answers), hands them to ``handle(objects) -> results`` and yields the
+    results as NDJSON, one line per input line and in input order.
+
+    When handling falls behind the queue fills up and the reader stops
+    reading the body, which pushes back on the sender through the transport
+    instead of buffering, so memory stays bounded however long the stream.
+
+    Every output line carries the input ``line`` number. Lines that aren't a
+    JSON object, are longer than ``max_line_bytes``, or belong to a chunk
+    whose handler raised come back as ``{"line": n, "error": ...}``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handle: ChunkHandler,
+        chunk_size: int = 256,
+        max_wait_ms: float = 50.0,
+        max_pending_chunks: int = 4,
+        max_line_bytes: int = 64 * 1024,
+    ):
+        self.name = name
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending_chunks = max_pending_chunks
+        self.max_line_bytes = max_line_bytes
+        self._timer = StageTimer(name, stages=("serialize",))
+
+    async def run(self, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.chunk_size * self.max_pending_chunks)
+        reader = asyncio.create_task(self._read(body, queue))
+        try:
+            done = False
+            while not done:
+                chunk, done = await self._collect(queue)
+                if chunk:
+                    yield await self._process(chunk)
+            # Surface a failure to read the body (e.g. client went away)
+            await reader
+        finally:
+            reader.cancel()
+
+    async def _put(self, queue: asyncio.Queue, item: Any):
+        if queue.full():
+            blocked_at = time.perf_counter()
+            await queue.put(item)
+            NDJSON_STREAM_BLOCKED_SECONDS.labels(self.name).inc(time.perf_counter() - blocked_at)
+        else:
+            queue.put_nowait(item)
+
+    async def _read(self, body: AsyncIterator[bytes], queue: asyncio.Queue):
+        buffer = b""
+        line_number = 0
+        skipping = False  # inside a line that was too long
+        try:
+            async for data in body:
+                if skipping:
+                    if b"\n" not in data:
+                        continue
+                    data = data.split(b"\n", 1)[1]
+                    skipping = False
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for raw in lines:
+                    line_number += 1
+                    if raw.strip():
+                        await self._put(queue, self._parse(line_number, raw))
+                if len(buffer) > self.max_line_bytes:
+                    line_number += 1
+                    await self._put(queue, (line_number, None, "line too long"))
+                    buffer = b""
+                    skipping = True
+            if buffer.strip() and not skipping:
+                await self._put(queue, self._parse(line_number + 1, buffer))
+        except asyncio.CancelledError:
+            # run() is done and cancelled us: nobody is left to take _END, and
+            # waiting for room in a full queue would never return
+            raise
+        except BaseException:
+            await queue.put(_END)
+            raise
+        await queue.put(_END)
+
+    def _parse(self, line_number: int, raw: bytes) -> Line:
+        if len(raw) > self.max_line_bytes:
+            return line_number, None, "line too long"
+        try:
+            value = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            return line_number, None, f"invalid JSON: {e}"
+        if not isinstance(value, dict):
+            return line_number, None, "expected a JSON object"
+        return line_number, value, None
+
+    async def _collect(self, queue: asyncio.Queue) -> Tuple[List[Line], bool]:
+        loop = asyncio.get_running_loop()
+        first = await queue.get()
+        if first is _END:
+            return [], True
+
+        chunk = [first]
+        deadline = loop.time() + self.max_wait
+        while len(chunk) < self.chunk_size:
+            try:
+                line = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if line is _END:
+                return chunk, True
+            chunk.append(line)
+        return chunk, False
+
+    async def _process(self, chunk: List[Line]) -> bytes:
+        valid = [value for _, value, error in chunk if error is None]
+        results: List[Any] = []
+        failure = None
+        if valid:
+            try:
+                results = await self.handle(valid)
+            except Exception as e:
+                failure = str(e)
+
+        out = []
+        scored = iter(results)
+        for line_number, _, error in chunk:
+            if error is None and failure is None:
+                out.append({"line": line_number, **next(scored)})
+            else:
+                out.append({"line": line_number, "error": error or failure})
+        ok = len(valid) if failure is None else 0
+        NDJSON_STREAM_LINES.labels(self.name, "ok").inc(ok)
+        NDJSON_STREAM_LINES.labels(self.name, "error").inc(len(chunk) - ok)
+        start = time.perf_counter()
+        body = b"".join(orjson.dumps(result, option=_OPTIONS) for result in out)
+        self._timer.observe("serialize", time.perf_counter() - start)
+        return body
+
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse for results of a request body that is still being read.
+
+    StreamingResponse watches ``receive`` for the client disconnecting,
+    which would swallow the body messages the pipeline is reading. Here the
+    request stream notices a disconnect itself (ClientDisconnect) instead.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def listen_for_disconnect(self, receive: Receive) -> None:
+        # Cancelled once the response is complete
+        await asyncio.Event().wait()
@@ -0,0 +1,28 @@
+"""
+orjson response class, the app's default (see ``default_response_class``
+in app.main).
+
+FastAPI still runs ``jsonable_encoder`` over whatever an endpoint returns
+(and validates it against ``response_model``) before the response class
+renders it. Endpoints whose output is built by our own detectors can skip
+both by returning ``FastJSONResponse(result)`` themselves; their
+``response_model`` then only documents the response in OpenAPI.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+# NumPy arrays and scalars serialize natively; int keys become strings as json.dumps does
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONResponse(ORJSONResponse):
+    """JSON rendered by orjson, NumPy values included.
+
+    Unlike Starlette's JSONResponse, NaN and infinity render as null
+    instead of raising.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=_OPTIONS)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .executor import get_inference_executor
+from .metrics import MODEL_VERSION, RETRAIN_RUNS, RETRAIN_SAMPLES, RETRAIN_SECONDS
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def reservoir_sample(items: Iterable[Any], k: int, rng: Optional[random.Random] = None) -> Tuple[List[Any], int]:
+    """A uniform sample of at most ``k`` items in one pass (Algorithm R); also returns how many were seen."""
+    rng = rng or random.Random()
+    sample: List[Any] = []
+    seen = 0
+    for item in items:
+        seen += 1
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            j = rng.randrange(seen)
+            if j < k:
+                sample[j] = item
+    return sample, seen
+
+
+class Reservoir:
+    """Uniform sample of at most ``capacity`` items from a stream that's fed live.
+
+    ``add`` is O(1) and safe to call from request handlers. ``drain`` hands
+    the sample over and starts a new window, so each retraining run sees the
+    traffic since the previous one.
+    """
+
+    def __init__(self, capacity: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        self._rng = random.Random(seed)
+        self._items: List[Any] = []
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def add(self, item: Any):
+        with self._lock:
+            self._seen += 1
+            if len(self._items) < self.capacity:
+                self._items.append(item)
+            else:
+                j = self._rng.randrange(self._seen)
+                if j < self.capacity:
+                    self._items[j] = item
+
+    def drain(self, min_items: int = 0) -> Tuple[List[Any], int]:
+        """The sample and the number of items it was drawn from; kept for later if under ``min_items``."""
+        with self._lock:
+            if len(self._items) < min_items:
+                return [], self._seen
+            items, seen = self._items, self._seen
+            self._items, self._seen = [], 0
+        return items, seen
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ModelSlot:
+    """Holds a live model that is replaced as a whole, never refitted in place.
+
+    Readers take ``slot.model`` once per request and use that object
+    throughout, so a request that started before a swap finishes on the
+    model it started with.
+    """
+
+    def __init__(self, model: Any):
+        self.model = model
+
+
+# load() -> (samples, number of rows they were drawn from)
+SampleLoader = Callable[[], Tuple[List[Any], int]]
+
+
+class _Job:
+    __slots__ = ("name", "load", "fit", "install", "min_samples", "version", "last_run")
+
+    def __init__(self, name: str, load: SampleLoader, fit: Callable[[List[Any]], Any],
+                 install: Callable[[Any], None], min_samples: int):
+        self.name = name
+        self.load = load
+        self.fit = fit
+        self.install = install
+        self.min_samples = min_samples
+        self.version = 0  # 0 = the model the process started with
+        self.last_run: Dict[str, Any] = {}
+
+
+class RetrainingService:
+    """Periodically refits registered models on recent data and swaps them in.
+
+    Every ``interval_seconds`` each job loads a bounded sample of recent
+    data, fits a brand-new model on it in the inference executor's
+    "training" lane, and hands it to ``install``, which replaces the live
+    reference in one assignment. Requests already holding the old model
+    are unaffected. Runs with fewer than the job's ``min_samples`` keep
+    the current model.
+
+    Versions count swaps since the process started. Each process retrains
+    its own models.
+    """
+
+    def __init__(self, interval_seconds: float = 3600.0):
+        self.interval_seconds = interval_seconds
+        self._jobs: Dict[str, _Job] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        load: SampleLoader,
+        fit: Callable[[List[Any]], Any],
+        install: Callable[[Any], None],
+        min_samples: int = 200,
+    ):
+        self._jobs[name] = _Job(name, load, fit, install, min_samples)
+        MODEL_VERSION.labels(name).set(0)
+
+    async def start(self):
+        if self._task is None and self._jobs:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            for name in list(self._jobs):
+                await self.run(name)
+
+    async def run(self, name: str) -> Dict[str, Any]:
+        """Retrain one model now; returns what happened."""
+        job = self._jobs[name]
+        executor = get_inference_executor()
+        start = time.perf_counter()
+        try:
+            samples, seen = await executor.run("training", job.load, local=True)
+            if len(samples) < job.min_samples:
+                outcome = {"outcome": "skipped", "samples": len(samples), "seen": seen}
+            else:
+                model = await executor.run("training", job.fit, samples, local=True)
+                job.install(model)
+                job.version += 1
+                seconds = time.perf_counter() - start
+                RETRAIN_SECONDS.labels(name).observe(seconds)
+                RETRAIN_SAMPLES.labels(name).set(len(samples))
+                MODEL_VERSION.labels(name).set(job.version)
+                outcome = {
+                    "outcome": "swapped",
+                    "version": job.version,
+                    "samples": len(samples),
+                    "seen": seen,
+                    "training_seconds": round(seconds, 3),
+                }
+                logger.info("Retrained %s: v%d on %d of %d samples in %.2fs",
+                            name, job.version, len(samples), seen, seconds)
+        except Exception as e:
+            logger.exception("Retraining %s failed", name)
+            outcome = {"outcome": "error", "error": str(e)}
+        RETRAIN_RUNS.labels(name, outcome["outcome"]).inc()
+        job.last_run = {"finished_at": time.time(), **outcome}
+        return outcome
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "models": {
+                job.name: {"version": job.version, "min_samples": job.min_samples, "last_run": job.last_run}
+                for job in self._jobs.values()
+            },
+        }
+
+
+@lru_cache()
+def get_retraining_service() -> RetrainingService:
+    return RetrainingService(interval_seconds=get_settings().RETRAIN_INTERVAL_SECONDS)
@@ -1,6 +1,10 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
 from functools import lru_cache
+import os
+
+# backend/, so default data paths don't depend on the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 class Settings(BaseSettings):
     # API Settings
@@ -19,6 +23,117 @@ class Settings(BaseSettings):
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
+    # Off only for load tests and local benchmarking
+    RATE_LIMIT_ENABLED: bool = True
+    # Storage shared by all workers and algorithm. memory:// is per worker;
+    # use sqlite:////dev/shm/<name>.db (or redis://) with several workers
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_STRATEGY: str = "sliding-window-counter"
+    
+    # Per-user anomaly models
+    ANOMALY_REGISTRY_MAX_BYTES: int = 256 * 1024 * 1024
+    ANOMALY_REGISTRY_MAX_MODELS: int = 10000
+    ANOMALY_REGISTRY_SPILL_DIR: Optional[str] = None
+    ANOMALY_REGISTRY_MAX_SPILLED: int = 100000  # spilled models kept on disk
+    ANOMALY_USER_MIN_SAMPLES: int = 50
+    ANOMALY_USER_HISTORY_LIMIT: int = 5000
+    
+    # Server-side behavioral features of threat activities (rolling login
+    # counts, last location, known browsers), kept per user in memory
+    FEATURE_STORE_ENABLED: bool = True
+    FEATURE_STORE_LOGIN_WINDOW_SECONDS: float = 24 * 3600.0
+    FEATURE_STORE_LOGIN_BUCKETS: int = 24
+    FEATURE_STORE_MAX_BROWSERS: int = 8
+    FEATURE_STORE_MAX_USERS: int = 100000
+    
+    # Fatigue baselines
+    FATIGUE_BASELINE_MAX_USERS: int = 100000
+    # Samples accepted by one /fatigue-detection/analyze/series request
+    FATIGUE_SERIES_MAX_SAMPLES: int = 10000
+    
+    # Model artifacts (built offline with `python -m app.train_models`),
+    # under DATA_DIR unless absolute; the last MODEL_STORE_KEEP_VERSIONS
+    # versions of each model are kept
+    MODEL_STORE_DIR: str = "model_store"
+    MODEL_STORE_KEEP_VERSIONS: int = 5
+    # How often a running process looks for a newly published version
+    MODEL_STORE_CHECK_SECONDS: float = 30.0
+    
+    # Inference executor ("thread" or "process"); limits are per model name
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_MAX_WORKERS: int = 4
+    INFERENCE_MODEL_CONCURRENCY: dict[str, int] = {"training": 1}
+    
+    # Micro-batching of single-row scoring calls
+    MICRO_BATCH_MAX_SIZE: int = 64
+    MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+    
+    # Background retraining on a window of recent data (reservoir-sampled)
+    RETRAIN_ENABLED: bool = True
+    RETRAIN_INTERVAL_SECONDS: float = 3600.0
+    RETRAIN_WINDOW_HOURS: float = 7 * 24.0
+    RETRAIN_RESERVOIR_SIZE: int = 10000
+    RETRAIN_MIN_SAMPLES: int = 200
+    
+    # Write-behind persistence of analysis results
+    WRITE_BEHIND_MAX_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: float = 200.0
+    WRITE_BEHIND_MAX_PENDING: int = 10000
+    
+    # user_activities storage: daily partitions, retention and per-user
+    # hourly rollups, maintained every ACTIVITY_MAINTENANCE_INTERVAL_SECONDS
+    ACTIVITY_MAINTENANCE_ENABLED: bool = True
+    ACTIVITY_MAINTENANCE_INTERVAL_SECONDS: float = 900.0
+    ACTIVITY_RETENTION_DAYS: int = 90
+    ACTIVITY_PARTITIONS_AHEAD_DAYS: int = 7
+    # Rows stored later than this after their timestamp miss the rollup
+    ACTIVITY_ROLLUP_LOOKBACK_HOURS: int = 48
+    ACTIVITY_ROLLUP_RETENTION_DAYS: int = 730
+    
+    # Recent-anomaly feed cache
+    FEED_CACHE_TTL_SECONDS: float = 30.0
+    FEED_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Response compression (brotli when installed, else gzip); bodies
+    # smaller than COMPRESSION_MIN_SIZE bytes are sent as they are. Low
+    # levels: most of the size reduction for a fraction of the CPU time
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 1
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Streaming NDJSON ingestion; a stream buffers at most
+    # CHUNK_SIZE * MAX_PENDING_CHUNKS parsed events
+    STREAM_INGEST_CHUNK_SIZE: int = 256
+    STREAM_INGEST_MAX_WAIT_MS: float = 50.0
+    STREAM_INGEST_MAX_PENDING_CHUNKS: int = 4
+    STREAM_INGEST_MAX_LINE_BYTES: int = 64 * 1024
+    
+    # Local state files; relative *_PATH / *_DB settings are resolved
+    # against this directory (see data_path)
+    DATA_DIR: str = os.path.join(BACKEND_DIR, "data")
+    
+    # Session store for SessionTimeoutMiddleware ("memory", or "sqlite" to
+    # share sessions between workers on one host)
+    SESSION_STORE: str = "memory"
+    SESSION_STORE_PATH: str = "sessions.db"
+    
+    # OSINT scan jobs. Tool limits and timeouts (seconds) are per process.
+    OSINT_JOB_DB: str = "osint_jobs.db"
+    OSINT_MAX_CONCURRENT_JOBS: int = 4
+    OSINT_TOOL_CONCURRENCY: dict[str, int] = {"amass": 1, "sherlock": 2, "h8mail": 2}
+    OSINT_TOOL_TIMEOUTS: dict[str, float] = {"amass": 900.0, "sherlock": 300.0, "h8mail": 120.0}
+    OSINT_RESULT_TTL_SECONDS: int = 24 * 3600
+    OSINT_OUTPUT_DIR: Optional[str] = None
+    # Seconds a successful tool result is reused for the same target (0: never)
+    OSINT_RESULT_CACHE_TTLS: dict[str, float] = {"amass": 12 * 3600.0, "sherlock": 6 * 3600.0, "h8mail": 24 * 3600.0}
+    OSINT_RESULT_CACHE_MAX_ENTRIES: int = 5000
+    # Events buffered per streaming client before it is dropped
+    OSINT_STREAM_BUFFER: int = 1000
+    OSINT_STREAM_KEEPALIVE_SECONDS: float = 5.0
+    
+    def data_path(self, path: str) -> str:
+        """``path`` under DATA_DIR, or unchanged if it is absolute."""
+        return os.path.join(self.DATA_DIR, path)
     
     class Config:
         env_file = ".env"
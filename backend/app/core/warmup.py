@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import WARMUP_READY, WARMUP_STEP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class Warmup:
+    """Loads models (and the libraries they need) in the background after startup.
+
+    The process accepts connections as soon as it has imported, which no
+    longer pulls in sklearn, pandas or pyod. Registered steps then run one
+    after another in a worker thread, so the event loop keeps answering
+    /health and /ready meanwhile. ``ready`` turns True once every step has
+    succeeded.
+
+    A failed step leaves the process unready rather than broken: whatever
+    it was loading is still loaded on demand by the first request that
+    needs it.
+    """
+
+    def __init__(self):
+        self._steps: Dict[str, Callable[[], Any]] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, step: Callable[[], Any]):
+        self._steps[name] = step
+        self._status[name] = {"status": PENDING}
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # A step already running in its thread finishes on its own
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        started = time.perf_counter()
+        for name, step in self._steps.items():
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                logger.exception("Warmup step %s failed", name)
+                status = {"status": FAILED, "error": str(e)}
+            else:
+                status = {"status": READY}
+            seconds = time.perf_counter() - start
+            WARMUP_STEP_SECONDS.labels(name).set(seconds)
+            self._status[name] = {**status, "seconds": round(seconds, 3)}
+        WARMUP_READY.set(1 if self.ready else 0)
+        logger.info("Warmup finished in %.2fs (%s)", time.perf_counter() - started,
+                    "ready" if self.ready else "not ready")
+
+    @property
+    def ready(self) -> bool:
+        return all(step["status"] == READY for step in self._status.values())
+
+    def status(self) -> Dict[str, Any]:
+        states = [step["status"] for step in self._status.values()]
+        overall = FAILED if FAILED in states else PENDING if PENDING in states else READY
+        return {"status": overall, "steps": dict(self._status)}
+
+
+@lru_cache()
+def get_warmup() -> Warmup:
+    return Warmup()
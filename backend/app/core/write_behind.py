@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, List, Optional
+
+from .metrics import (
+    WRITE_BEHIND_FLUSH_ROWS,
+    WRITE_BEHIND_FLUSH_SECONDS,
+    WRITE_BEHIND_PENDING,
+    WRITE_BEHIND_ROWS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last row by close(); tells the flusher to finish up.
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers rows in memory and writes them in bulk off the request path.
+
+    ``put`` returns as soon as the rows are queued. A single background task
+    collects up to ``max_batch_size`` rows, or whatever arrived within
+    ``flush_interval_ms`` of the first one, and hands them to
+    ``flush(rows)`` in a worker thread (``flush`` is a blocking bulk insert).
+
+    At most ``max_pending`` rows are held; once full, ``put`` waits for the
+    flusher to catch up, so a slow database slows producers down instead of
+    growing memory. ``close`` flushes everything queued before it; rows
+    put after that, including those of producers still waiting for room,
+    are dropped and counted.
+    ``on_flush(rows)``, if given, runs on the event loop after each
+    successful write (e.g. to invalidate caches of what was just written).
+
+    A failed flush is retried ``retries`` times and then dropped (logged and
+    counted), since blocking ingestion on a persistently failing database
+    would take the whole API down with it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[Any]], Any],
+        max_batch_size: int = 500,
+        flush_interval_ms: float = 200.0,
+        max_pending: int = 10000,
+        retries: int = 2,
+        on_flush: Optional[Callable[[List[Any]], Any]] = None,
+    ):
+        self.name = name
+        self._flush_fn = flush
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self.retries = retries
+        self.on_flush = on_flush
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._closing: Optional[asyncio.Event] = None
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._closing = asyncio.Event()
+            self._task = asyncio.create_task(self._run(self._queue))
+
+    async def put(self, rows: List[Any]):
+        """Queue rows for the next bulk write, waiting while the buffer is full."""
+        if not rows:
+            return
+        if not self._closed:
+            self._ensure_started()
+        for i, row in enumerate(rows):
+            if self._closed or not await self._put(row):
+                # Requests still in flight during shutdown shouldn't fail over this
+                logger.warning("Write-behind queue '%s' is closed; dropping %d rows", self.name, len(rows) - i)
+                WRITE_BEHIND_ROWS.labels(self.name, "dropped").inc(len(rows) - i)
+                return
+
+    async def _put(self, row: Any) -> bool:
+        """Queue one row, waiting for room; False if the queue is closed first."""
+        pending = WRITE_BEHIND_PENDING.labels(self.name)
+        # Counted before it's queued, so the flusher never takes the gauge below zero
+        pending.inc()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(self._queue.put(row))
+        closing = asyncio.ensure_future(self._closing.wait())
+        try:
+            await asyncio.wait((put, closing), return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            put.cancel()
+            pending.dec()
+            raise
+        finally:
+            closing.cancel()
+        if put.done():
+            return True
+        # close() was called first: give up the place in line, so no row lands after _STOP
+        put.cancel()
+        pending.dec()
+        return False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def close(self):
+        """Stop accepting rows and wait until everything queued is written."""
+        self._closed = True
+        if self._task is None or self._task.done():
+            return
+        # Producers waiting for room drop their rows instead of queueing them after _STOP
+        self._closing.set()
+        await self._queue.put(_STOP)
+        await self._task
+
+    async def _run(self, queue: asyncio.Queue):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect(queue)
+            if batch:
+                WRITE_BEHIND_PENDING.labels(self.name).dec(len(batch))
+                await self._flush(batch)
+
+    async def _collect(self, queue: asyncio.Queue) -> tuple:
+        loop = asyncio.get_running_loop()
+        first = await queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            try:
+                row = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _flush(self, batch: List[Any]):
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._flush_fn, batch)
+            except Exception:
+                logger.exception(
+                    "Write-behind flush of %d rows to '%s' failed (attempt %d/%d)",
+                    len(batch), self.name, attempt + 1, self.retries + 1,
+                )
+                if attempt < self.retries:
+                    await asyncio.sleep(0.1 * (attempt + 1))
+                continue
+            WRITE_BEHIND_FLUSH_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+            WRITE_BEHIND_FLUSH_ROWS.labels(self.name).observe(len(batch))
+            WRITE_BEHIND_ROWS.labels(self.name, "written").inc(len(batch))
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(batch)
+                except Exception:
+                    logger.exception("on_flush callback of write-behind queue '%s' failed", self.name)
+            return
+        WRITE_BEHIND_ROWS.labels(self.name, "dropped").inc(len(batch))
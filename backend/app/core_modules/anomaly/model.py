@@ -1,83 +1,151 @@
-from pyod.models.iforest import IForest
 import numpy as np
-from typing import List, Dict
-import joblib
-from pathlib import Path
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Optional
+from app.core.instrumentation import StageTimer
+from app.core.retraining import Reservoir
+from app.core.settings import get_settings
+from app.modules.model_store.artifact_store import LazyArtifact, RetrainableArtifact, get_model_store
+from app.modules.threat_detection.compiled_forest import COMPILED_MAX_ROWS, CompiledForest
+
+if TYPE_CHECKING:
+    from pyod.models.iforest import IForest
+
+ARTIFACT_NAME = "session_anomaly_iforest"
+
+_timer = StageTimer("session_anomaly")
+
+
+def _generate_mock_data() -> np.ndarray:
+    """Generate mock training data for initial model training."""
+    n_samples = 1000
+    rng = np.random.RandomState(42)
+    
+    # Normal patterns
+    login_times = rng.randint(6, 23, n_samples)  # Login hours between 6AM and 11PM
+    typing_speeds = rng.normal(60, 15, n_samples)  # Average typing speed 60 WPM
+    click_rates = rng.normal(100, 20, n_samples)  # Clicks per minute
+    session_durations = rng.normal(45, 15, n_samples)  # Session duration in minutes
+    
+    return np.column_stack([login_times, typing_speeds, click_rates, session_durations])
+
+
+def train_default_model(features: Optional[np.ndarray] = None) -> "IForest":
+    """Train the session model, on mock data unless given feature rows.
+
+    Used by the offline training step, and by retraining on recent sessions.
+    """
+    # pyod (and numba, through it) only when a model is actually trained
+    from pyod.models.iforest import IForest
+
+    model = IForest(
+        n_estimators=100,
+        max_samples='auto',
+        contamination=0.1,
+        random_state=42
+    )
+    model.fit(features if features is not None else _generate_mock_data())
+    return model
+
 
 class AnomalyDetector:
     def __init__(self):
-        self.model = IForest(
-            n_estimators=100,
-            max_samples='auto',
-            contamination=0.1,
-            random_state=42
-        )
-        self._is_trained = False
-        self.model_path = Path(__file__).parent / "iforest_model.joblib"
-        self._load_or_train_model()
-
-    def _generate_mock_data(self) -> np.ndarray:
-        """Generate mock training data for initial model training."""
-        n_samples = 1000
-        rng = np.random.RandomState(42)
-        
-        # Normal patterns
-        login_times = rng.randint(6, 23, n_samples)  # Login hours between 6AM and 11PM
-        typing_speeds = rng.normal(60, 15, n_samples)  # Average typing speed 60 WPM
-        click_rates = rng.normal(100, 20, n_samples)  # Clicks per minute
-        session_durations = rng.normal(45, 15, n_samples)  # Session duration in minutes
-        
-        return np.column_stack([login_times, typing_speeds, click_rates, session_durations])
+        # Loaded from the model artifact store on first use, not at import;
+        # retraining takes over until a new artifact version is published
+        self._model = RetrainableArtifact(LazyArtifact(
+            get_model_store(), ARTIFACT_NAME, fallback=train_default_model,
+            check_seconds=get_settings().MODEL_STORE_CHECK_SECONDS,
+        ))
+        # (model, its compiled forest), replaced as a pair
+        self._compiled = None
 
-    def _load_or_train_model(self):
-        """Load existing model or train new one with mock data."""
-        try:
-            if self.model_path.exists():
-                self.model = joblib.load(self.model_path)
-                self._is_trained = True
-            else:
-                mock_data = self._generate_mock_data()
-                self.model.fit(mock_data)
-                joblib.dump(self.model, self.model_path)
-                self._is_trained = True
-        except Exception as e:
-            print(f"Error in model loading/training: {str(e)}")
-            # Initialize with default model if loading fails
-            self.model = IForest(contamination=0.1, random_state=42)
-            mock_data = self._generate_mock_data()
-            self.model.fit(mock_data)
-            self._is_trained = True
+    @property
+    def model(self) -> "IForest":
+        return self._model.get()
+
+    @property
+    def _is_trained(self) -> bool:
+        return self._model.loaded
+
+    def swap_model(self, model: "IForest"):
+        """Serve ``model`` from now on; calls already scoring keep the previous one."""
+        self._model.swap(model)
+
+    def _decision_function(self, model: "IForest", features: np.ndarray) -> np.ndarray:
+        """IForest.decision_function via the compiled forest (same values)."""
+        if len(features) > COMPILED_MAX_ROWS:
+            return model.decision_function(features)
+        compiled = self._compiled
+        if compiled is None or compiled[0] is not model:
+            compiled = self._compiled = (model, CompiledForest.from_pyod(model))
+        # pyod flips sklearn's sign so that higher means more anomalous
+        return -compiled[1].decision_function(features)
 
     def analyze(self, session_data: Dict) -> Dict:
         """Analyze a single session for anomalies."""
-        features = np.array([[
-            session_data['login_hour'],
-            session_data['typing_speed'],
-            session_data['click_rate'],
-            session_data['session_duration']
-        ]])
+        return self.analyze_batch([session_data])[0]
+
+    def analyze_batch(self, sessions: List[Dict]) -> List[Dict]:
+        """Analyze several sessions with one model call."""
+        start = time.perf_counter()
+        features = np.array([
+            [
+                session_data['login_hour'],
+                session_data['typing_speed'],
+                session_data['click_rate'],
+                session_data['session_duration']
+            ]
+            for session_data in sessions
+        ], dtype=np.float64)
+        featurized = time.perf_counter()
         
         try:
+            # One model for the whole batch, even if it's swapped meanwhile
+            model = self.model
             # Get anomaly scores (higher scores indicate more anomalous)
-            scores = self.model.decision_function(features)
-            predictions = self.model.predict(features)
+            scores = self._decision_function(model, features)
+            # Same rule as IForest.predict, without scoring the rows twice
+            predictions = scores > model.threshold_
             
             # Convert score to 0-1 range for better interpretation
             # pyod scores are already normalized, but we'll ensure they're in 0-1
-            normalized_score = 1 / (1 + np.exp(-scores[0]))
+            normalized_scores = 1 / (1 + np.exp(-scores))
+            scored = time.perf_counter()
             
-            return {
-                'is_anomaly': bool(predictions[0]),  # Convert numpy bool to Python bool
-                'label': 'suspicious' if predictions[0] == 1 else 'normal',
-                'anomaly_score': float(normalized_score),
-                'confidence': abs(float(normalized_score) - 0.5) * 2  # 0-1 range
-            }
+            results = [
+                {
+                    'is_anomaly': bool(prediction),  # Convert numpy bool to Python bool
+                    'label': 'suspicious' if prediction else 'normal',
+                    'anomaly_score': normalized_score,
+                    'confidence': abs(normalized_score - 0.5) * 2  # 0-1 range
+                }
+                for prediction, normalized_score in zip(predictions.tolist(), normalized_scores.tolist())
+            ]
+            _timer.rows(len(sessions))
+            _timer.observe("features", featurized - start)
+            _timer.observe("score", scored - featurized)
+            _timer.observe("results", time.perf_counter() - scored)
+            return results
         except Exception as e:
             print(f"Error in anomaly analysis: {str(e)}")
-            return {
-                'is_anomaly': False,
-                'label': 'error',
-                'anomaly_score': 0.5,
-                'confidence': 0.0,
-                'error': str(e)
-            } 
\ No newline at end of file
+            return [
+                {
+                    'is_anomaly': False,
+                    'label': 'error',
+                    'anomaly_score': 0.5,
+                    'confidence': 0.0,
+                    'error': str(e)
+                }
+                for _ in sessions
+            ]
+
+
+@lru_cache()
+def get_session_detector() -> AnomalyDetector:
+    return AnomalyDetector()
+
+
+@lru_cache()
+def get_session_samples() -> Reservoir:
+    """Feature rows of recently analyzed sessions, for background retraining."""
+    return Reservoir(get_settings().RETRAIN_RESERVOIR_SIZE)
@@ -1,20 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .api.v1.api import api_router
+from .api.endpoints import anomaly as session_anomaly
 from .middleware.rate_limiter import setup_rate_limiter
 from .middleware.session import setup_session_middleware
+from .middleware.compression import setup_compression
 from prometheus_client import make_asgi_app
-import sentry_sdk
-from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from .core.settings import get_settings
+from .core.executor import get_inference_executor
+from .core.responses import FastJSONResponse
+from .core.warmup import get_warmup
+from .modules.threat_detection.activity_storage import get_activity_maintenance
+from .modules.threat_detection.activity_writer import get_activity_writer
+from .modules.osint.jobs import get_osint_jobs
+from .modules.retraining import setup_retraining
+from .modules.warmup import setup_warmup
 
 # Initialize settings
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume OSINT scans left pending by the previous run
+    await get_osint_jobs().start()
+    # Models load in the background; /ready reports when they're done
+    warmup = setup_warmup()
+    await warmup.start()
+    retraining = setup_retraining()
+    if settings.RETRAIN_ENABLED:
+        await retraining.start()
+    # Partitions ahead, retention and hourly rollups of user_activities
+    activity_maintenance = get_activity_maintenance()
+    if settings.ACTIVITY_MAINTENANCE_ENABLED:
+        await activity_maintenance.start()
+    yield
+    await activity_maintenance.stop()
+    await retraining.stop()
+    await warmup.stop()
+    await get_osint_jobs().stop()
+    # Write out buffered results before the process exits
+    await get_activity_writer().close()
+    # Let in-flight model calls finish, but don't wait for queued ones
+    get_inference_executor().shutdown(wait=False)
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Cybersecurity monitoring and education platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Store settings in app state
@@ -26,6 +64,9 @@ app.mount("/metrics", metrics_app)
 
 # Initialize Sentry (if SENTRY_DSN is set)
 if settings.SENTRY_DSN:
+    import sentry_sdk
+    from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
+
     sentry_sdk.init(
         dsn=settings.SENTRY_DSN,
         traces_sample_rate=0.1,
@@ -42,6 +83,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Setup response compression. Added before the rate limiter so it sits
+# inside it: SlowAPIMiddleware re-streams response bodies in pieces, which
+# the compressor would pass through as it does any streaming response.
+setup_compression(app)
+
 # Setup rate limiting
 limiter = setup_rate_limiter(app)
 
@@ -50,6 +96,8 @@ setup_session_middleware(app, timeout_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUT
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# Session anomaly scoring, as called by the frontend's security tips
+app.include_router(session_anomaly.router, prefix="/api/anomaly", tags=["anomaly"])
 
 @app.get("/")
 async def root():
@@ -61,7 +109,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up. See /ready for whether it can serve models."""
     return {
         "status": "healthy",
         "version": "1.0.0"
-    } 
\ No newline at end of file
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once every model has been warmed up, 503 until then."""
+    warmup = get_warmup()
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503) 
\ No newline at end of file
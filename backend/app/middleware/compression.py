@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+from typing import Optional
+
+from fastapi import FastAPI
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.metrics import RESPONSE_COMPRESSION_BYTES
+from ..core.settings import get_settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Bodies at least this big are compressed off the event loop
+_OFFLOAD_BYTES = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br" or "gzip" per the Accept-Encoding header (brotli preferred), or None."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)
+    accepted = [coding for coding in offered if weights.get(coding, weights.get("*", 0.0)) > 0]
+    if not accepted:
+        return None
+    return max(accepted, key=lambda coding: weights.get(coding, weights.get("*", 0.0)))
+
+
+class CompressionMiddleware:
+    """Compresses complete response bodies of ``minimum_size`` bytes or more
+    with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Only responses sent in one piece are compressed. Streaming responses
+    (NDJSON, SSE) pass through untouched, since a compressor would hold
+    their lines back until its buffer fills. So do responses that already
+    carry a Content-Encoding, such as /metrics.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 1,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def compressing_send(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start = message
+            else:
+                passthrough = True
+                headers = MutableHeaders(raw=start["headers"])
+                body = message.get("body", b"")
+                if (
+                    message.get("more_body", False)
+                    or len(body) < self.minimum_size
+                    # Raw names, as not every ASGI app lower-cases them (prometheus_client doesn't)
+                    or any(name.lower() == b"content-encoding" for name, _ in start["headers"])
+                ):
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = await self._compress(encoding, body)
+                RESPONSE_COMPRESSION_BYTES.labels(encoding, "raw").inc(len(body))
+                RESPONSE_COMPRESSION_BYTES.labels(encoding, "compressed").inc(len(compressed))
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await send(start)
+                await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            compress = lambda data: brotli.compress(data, quality=self.brotli_quality)  # noqa: E731
+        else:
+            compress = lambda data: gzip.compress(data, compresslevel=self.gzip_level, mtime=0)  # noqa: E731
+        if len(body) >= _OFFLOAD_BYTES:
+            return await asyncio.to_thread(compress, body)
+        return compress(body)
+
+
+def setup_compression(app: FastAPI):
+    settings = get_settings()
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from math import floor
+from typing import Optional, Tuple
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+from ..core.metrics import RATE_LIMIT_STORAGE_BUSY
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    return getattr(error, "sqlite_errorcode", None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """``limits`` storage in a local SQLite file, shared by every worker on a host.
+
+    Registered for ``sqlite:///<path>`` storage URIs (four slashes for an
+    absolute path). A tmpfs path such as /dev/shm keeps it off disk.
+
+    Counters live in one table keyed by the limit key. Each sliding-window
+    acquire reads both windows and increments the current one inside a
+    single ``BEGIN IMMEDIATE`` transaction, so concurrent workers can never
+    both take the last slot. Counters are throwaway, hence
+    ``synchronous=OFF``: a crash can lose recent hits but not corrupt the
+    file.
+
+    slowapi calls the storage on the event loop, so a write waits at most
+    ``busy_timeout`` seconds for another worker's transaction. If the file is
+    still locked after that, the hit is let through (fails open) and
+    counted, rather than stalling every request on the worker.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    # Expired counters are deleted at most this often, per process
+    PRUNE_INTERVAL = 30.0
+
+    def __init__(
+        self, uri: Optional[str] = None, wrap_exceptions: bool = False, busy_timeout: float = 0.005, **options
+    ):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = (uri or "sqlite:///ratelimit.db")[len("sqlite:///"):] or "ratelimit.db"
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._next_prune = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Not a hot path, so it may wait out other workers starting up at the same time
+        with closing(sqlite3.connect(path, timeout=5.0, isolation_level=None)) as conn:
+            # Persistent: every later connection to the file is in WAL mode
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_counters ("
+                " key TEXT PRIMARY KEY,"
+                " value INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _incr(self, conn: sqlite3.Connection, key: str, expiry: float, amount: int, now: float) -> int:
+        # An expired counter restarts at `amount` with a fresh expiry
+        return conn.execute(
+            "INSERT INTO rate_limit_counters (key, value, expires_at) VALUES (?1, ?2, ?3 + ?4) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            " value = CASE WHEN expires_at <= ?3 THEN ?2 ELSE value + ?2 END,"
+            " expires_at = CASE WHEN expires_at <= ?3 THEN ?3 + ?4 ELSE expires_at END "
+            "RETURNING value",
+            (key, amount, now, expiry),
+        ).fetchone()[0]
+
+    def _get(self, conn: sqlite3.Connection, key: str, now: float) -> int:
+        row = conn.execute(
+            "SELECT value FROM rate_limit_counters WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        if now >= self._next_prune:
+            self._next_prune = now + self.PRUNE_INTERVAL
+            try:
+                conn.execute("DELETE FROM rate_limit_counters WHERE expires_at <= ?", (now,))
+            except sqlite3.OperationalError as e:
+                # Another worker is writing; expired counters keep until the next prune
+                if not _is_busy(e):
+                    raise
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._conn()
+        self._prune(conn, now)
+        try:
+            return self._incr(conn, key, expiry, amount, now)
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            RATE_LIMIT_STORAGE_BUSY.inc()
+            return 0
+
+    def get(self, key: str) -> int:
+        return self._get(self._conn(), key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        row = self._conn().execute(
+            "SELECT expires_at FROM rate_limit_counters WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self._conn().execute("DELETE FROM rate_limit_counters").rowcount
+
+    def clear(self, key: str) -> None:
+        self._conn().execute("DELETE FROM rate_limit_counters WHERE key = ?", (key,))
+
+    def _window(self, conn: sqlite3.Connection, key: str, expiry: int, now: float) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(conn, previous_key, now)
+        current_count = self._get(conn, current_key, now)
+        # Same weighting as limits' MemoryStorage
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        conn = self._conn()
+        self._prune(conn, now)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            RATE_LIMIT_STORAGE_BUSY.inc()
+            return True
+        try:
+            previous_count, previous_ttl, current_count, _ = self._window(conn, key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                conn.execute("COMMIT")
+                return False
+            _, current_key = self.sliding_window_keys(key, expiry, now)
+            # The current window's counter outlives it, to serve as the next one's "previous"
+            self._incr(conn, current_key, 2 * expiry, amount, now)
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        return self._window(self._conn(), key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
@@ -3,11 +3,24 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from ..core.settings import get_settings
+from . import rate_limit_storage  # noqa: F401  (registers the sqlite:// storage scheme)
+
+settings = get_settings()
+
+# One limiter for the whole app. Endpoint modules decorate routes with
+# @limiter.limit(...); counters live in RATE_LIMIT_STORAGE_URI, which must be
+# shared storage (e.g. sqlite:////dev/shm/...) when running several workers.
+limiter = Limiter(
+    key_func=get_remote_address,
+    strategy=settings.RATE_LIMIT_STRATEGY,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
 
 def setup_rate_limiter(app: FastAPI) -> Limiter:
-    limiter = Limiter(key_func=get_remote_address)
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
     app.add_middleware(SlowAPIMiddleware)
 
-    return limiter 
\ No newline at end of file
+    return limiter
@@ -1,22 +1,32 @@
 from fastapi import FastAPI, Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Optional
+import asyncio
 import time
 from starlette.middleware.sessions import SessionMiddleware
 import os
+from .session_store import SessionStore, create_session_store
 
 class SessionTimeoutMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app: FastAPI,
         timeout_minutes: int = 15,
-        excluded_paths: list = None
+        excluded_paths: list = None,
+        store: Optional[SessionStore] = None
     ):
         super().__init__(app)
         self.timeout_minutes = timeout_minutes
-        self.sessions: Dict[str, float] = {}
-        self.excluded_paths = excluded_paths or ['/health', '/metrics']
+        self.sessions = store if store is not None else create_session_store(timeout_minutes * 60)
+        self.excluded_paths = excluded_paths or ['/health', '/ready', '/metrics']
+
+    async def _store(self, method: str, *args):
+        """Call a session store method, in a worker thread if the store does I/O."""
+        fn = getattr(self.sessions, method)
+        if self.sessions.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
 
     async def dispatch(self, request: Request, call_next):
         # Skip middleware for excluded paths
@@ -30,19 +40,20 @@ class SessionTimeoutMiddleware(BaseHTTPMiddleware):
             raise HTTPException(status_code=401, detail="No session found")
 
         # Check if session exists and hasn't timed out
-        last_activity = self.sessions.get(session_id)
         current_time = time.time()
+        last_activity = await self._store("get", session_id)
+        await self._store("sweep", current_time)
 
         if not last_activity:
             raise HTTPException(status_code=401, detail="Session expired")
 
         if current_time - last_activity > self.timeout_minutes * 60:
             # Remove expired session
-            self.sessions.pop(session_id, None)
+            await self._store("delete", session_id)
             raise HTTPException(status_code=401, detail="Session timeout")
 
         # Update last activity time
-        self.sessions[session_id] = current_time
+        await self._store("set", session_id, current_time)
 
         # Add session info to request state
         request.state.session_id = session_id
@@ -52,6 +63,8 @@ class SessionTimeoutMiddleware(BaseHTTPMiddleware):
         return response
 
 def setup_session_middleware(app: FastAPI, timeout_minutes: int = 15):
+    # SessionTimeoutMiddleware isn't mounted: it rejects every request
+    # without a session, and nothing issues sessions into its store yet
     secret_key = os.getenv("SECRET_KEY", "your-secret-key-here")
     app.add_middleware(
         SessionMiddleware,
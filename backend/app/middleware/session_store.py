@@ -0,0 +1,193 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from ..core.metrics import SESSION_STORE_EVICTIONS, SESSION_STORE_LIVE
+from ..core.settings import get_settings
+
+
+class SessionStore(ABC):
+    """Last-activity times of live sessions, expiring ``ttl_seconds`` after last use.
+
+    ``get`` may still return a session that has expired but hasn't been swept
+    yet; callers compare against the timeout themselves. ``sweep`` removes
+    expired sessions and is cheap enough to call on every request.
+    ``blocking`` stores do I/O, and async callers run them in a thread.
+    """
+
+    kind = "base"
+    blocking = False
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, last_activity: float):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def sweep(self, now: Optional[float] = None) -> int:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store with expiry-ordered eviction.
+
+    A min-heap holds one (expires_at, session_id) entry per session. Touching
+    a session only updates the dict; when its stale heap entry surfaces,
+    ``sweep`` re-queues it at the new expiry instead of evicting it. Each
+    sweep pops at most ``sweep_batch`` entries, so the cost per request stays
+    bounded and amortized O(log n).
+    """
+
+    kind = "memory"
+
+    def __init__(self, ttl_seconds: float, sweep_batch: int = 64):
+        super().__init__(ttl_seconds)
+        self.sweep_batch = sweep_batch
+        self._last_activity: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[float]:
+        return self._last_activity.get(session_id)
+
+    def set(self, session_id: str, last_activity: float):
+        with self._lock:
+            if session_id not in self._last_activity:
+                heapq.heappush(self._expiry_heap, (last_activity + self.ttl_seconds, session_id))
+            self._last_activity[session_id] = last_activity
+        SESSION_STORE_LIVE.labels(self.kind).set(len(self._last_activity))
+
+    def delete(self, session_id: str):
+        # The heap entry is dropped lazily when it surfaces in sweep()
+        with self._lock:
+            self._last_activity.pop(session_id, None)
+        SESSION_STORE_LIVE.labels(self.kind).set(len(self._last_activity))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        evicted = 0
+        with self._lock:
+            for _ in range(self.sweep_batch):
+                if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                    break
+                _, session_id = heapq.heappop(self._expiry_heap)
+                last_activity = self._last_activity.get(session_id)
+                if last_activity is None:
+                    continue  # deleted explicitly
+                expires_at = last_activity + self.ttl_seconds
+                if expires_at > now:
+                    heapq.heappush(self._expiry_heap, (expires_at, session_id))
+                else:
+                    del self._last_activity[session_id]
+                    evicted += 1
+        if evicted:
+            SESSION_STORE_EVICTIONS.labels(self.kind).inc(evicted)
+            SESSION_STORE_LIVE.labels(self.kind).set(len(self._last_activity))
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._last_activity)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by every worker on a host, in a local SQLite file (WAL mode).
+
+    Each thread keeps its own connection. Expired rows are deleted in
+    batches through an index on expires_at, at most once per
+    ``sweep_interval`` seconds per process.
+    """
+
+    kind = "sqlite"
+    blocking = True
+
+    def __init__(self, ttl_seconds: float, path: str, sweep_interval: float = 5.0, sweep_batch: int = 1000):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " last_activity REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; every statement here is a single-row write or a batch delete
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[float]:
+        row = self._conn().execute(
+            "SELECT last_activity FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, session_id: str, last_activity: float):
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, last_activity, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET "
+            "last_activity = excluded.last_activity, expires_at = excluded.expires_at",
+            (session_id, last_activity, last_activity + self.ttl_seconds),
+        )
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        if now < self._next_sweep:
+            return 0
+        self._next_sweep = now + self.sweep_interval
+        conn = self._conn()
+        evicted = conn.execute(
+            "DELETE FROM sessions WHERE rowid IN ("
+            " SELECT rowid FROM sessions WHERE expires_at <= ? LIMIT ?)",
+            (now, self.sweep_batch),
+        ).rowcount
+        if evicted:
+            SESSION_STORE_EVICTIONS.labels(self.kind).inc(evicted)
+        SESSION_STORE_LIVE.labels(self.kind).set(len(self))
+        return evicted
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(ttl_seconds: float) -> SessionStore:
+    """The store selected by the SESSION_STORE setting ("memory" or "sqlite")."""
+    settings = get_settings()
+    if settings.SESSION_STORE == "memory":
+        return InMemorySessionStore(ttl_seconds)
+    if settings.SESSION_STORE == "sqlite":
+        return SQLiteSessionStore(ttl_seconds, settings.data_path(settings.SESSION_STORE_PATH))
+    raise ValueError(f"Unknown session store: {settings.SESSION_STORE}")
@@ -1,18 +1,50 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Index
 from sqlalchemy.sql import func
 from ..database import Base
+from . import user  # noqa: F401  (registers the "users" table the ForeignKey below points at)
+
+# Score above which an activity counts as an anomaly. Queries must use this
+# exact constant for the partial index below to apply.
+ANOMALY_SCORE_THRESHOLD = 0.8
 
 
 class UserActivity(Base):
+    # Partitioned by day on timestamp (see migration 0003 and
+    # modules/threat_detection/activity_storage.py). On Postgres the primary
+    # key is (id, timestamp), as partitioned tables require; ids still come
+    # from one sequence, so id alone identifies a row.
     __tablename__ = "user_activities"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     ip_address = Column(String)
     location = Column(JSON)  # Stores geo-location data
     browser_fingerprint = Column(String)
     user_agent = Column(String)
     activity_type = Column(String)  # login, logout, action, etc.
     anomaly_score = Column(Float, nullable=True)
-    additional_data = Column(JSON)  # For storing any additional behavioral data 
\ No newline at end of file
+    additional_data = Column(JSON)  # For storing any additional behavioral data
+
+
+# Serves "recent anomalies for a user" newest first (see migration 0002)
+Index(
+    "ix_user_activities_recent_anomalies",
+    UserActivity.user_id,
+    UserActivity.timestamp.desc(),
+    UserActivity.id.desc(),
+    postgresql_where=UserActivity.anomaly_score > ANOMALY_SCORE_THRESHOLD,
+    sqlite_where=UserActivity.anomaly_score > ANOMALY_SCORE_THRESHOLD,
+)
+
+
+class UserActivityHourly(Base):
+    """Per-user hourly rollup of user_activities, kept by ActivityMaintenance."""
+    __tablename__ = "user_activity_hourly"
+
+    user_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)  # start of the hour
+    activity_count = Column(Integer, nullable=False)
+    anomaly_count = Column(Integer, nullable=False)  # anomaly_score > ANOMALY_SCORE_THRESHOLD
+    max_anomaly_score = Column(Float, nullable=True)
+    mean_anomaly_score = Column(Float, nullable=True)
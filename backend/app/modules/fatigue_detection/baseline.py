@@ -0,0 +1,115 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Samples a baseline needs before its spread is trusted
+MIN_SAMPLES_FOR_STD = 10
+
+
+class StreamingStats:
+    """Running mean and variance (Welford) of one metric, updated in O(1)."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value: float):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+        }
+
+
+class UserBaseline:
+    """Streaming typing-speed and click-rate statistics for one user."""
+
+    __slots__ = ("typing_speed", "click_rate")
+
+    def __init__(self):
+        self.typing_speed = StreamingStats()
+        self.click_rate = StreamingStats()
+
+    @property
+    def wpm(self) -> Optional[float]:
+        return self.typing_speed.mean if self.typing_speed.count else None
+
+    @property
+    def wpm_std(self) -> Optional[float]:
+        """Spread of the user's typing speed, once there are enough samples to tell."""
+        return self.typing_speed.std if self.typing_speed.count >= MIN_SAMPLES_FOR_STD else None
+
+    @property
+    def click_rate_mean(self) -> Optional[float]:
+        return self.click_rate.mean if self.click_rate.count else None
+
+    def update(self, sample: Dict[str, Any]):
+        if sample.get('typing_speed') is not None:
+            self.typing_speed.update(sample['typing_speed'])
+        if sample.get('click_rate') is not None:
+            self.click_rate.update(sample['click_rate'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "typing_speed": self.typing_speed.to_dict(),
+            "click_rate": self.click_rate.to_dict(),
+        }
+
+
+class BaselineStore:
+    """Per-user fatigue baselines, kept as streaming statistics.
+
+    Every /analyze call folds the sample into its user's baseline, so clients
+    never need to re-upload their history. The store holds at most
+    ``max_users`` baselines and drops the least recently seen user beyond that.
+
+    Baselines are per process: with several workers, each builds its own
+    from the requests it serves, and /train-baseline seeds only one of them.
+    """
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._baselines: "OrderedDict[Any, UserBaseline]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Any) -> Optional[UserBaseline]:
+        with self._lock:
+            baseline = self._baselines.get(user_id)
+            if baseline is not None:
+                self._baselines.move_to_end(user_id)
+            return baseline
+
+    def update(self, user_id: Any, sample: Dict[str, Any]) -> UserBaseline:
+        with self._lock:
+            baseline = self._baselines.get(user_id)
+            if baseline is None:
+                baseline = self._baselines[user_id] = UserBaseline()
+                while len(self._baselines) > self.max_users:
+                    self._baselines.popitem(last=False)
+            else:
+                self._baselines.move_to_end(user_id)
+            baseline.update(sample)
+            return baseline
+
+    def __len__(self) -> int:
+        return len(self._baselines)
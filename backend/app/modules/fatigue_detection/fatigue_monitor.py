@@ -1,16 +1,46 @@
-from sklearn.ensemble import IsolationForest
 import numpy as np
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
 import json
+import time
+from functools import lru_cache
+from .baseline import UserBaseline
+from ..model_store.artifact_store import ArtifactSlot, LazyArtifact, RetrainableArtifact, get_model_store
+from ..threat_detection.compiled_forest import CompiledForest
+from ...core.instrumentation import StageTimer
+from ...core.retraining import Reservoir
+from ...core.settings import get_settings
+
+ARTIFACT_NAME = "fatigue"
+
+_timer = StageTimer("fatigue")
+
+# Raw metrics every interaction sample must carry, in feature order
+_METRIC_COLUMNS = ('typing_speed', 'click_rate', 'error_rate', 'session_duration', 'inactivity_periods')
+_REQUIRED_METRICS = frozenset(_METRIC_COLUMNS)
+
+
+def _raw_metrics(samples: List[Dict]) -> np.ndarray:
+    """The required metrics of each sample as one (n_samples, 5) array."""
+    return np.array([[sample[key] for key in _METRIC_COLUMNS] for sample in samples], dtype=np.float64).reshape(
+        len(samples), len(_METRIC_COLUMNS)
+    )
+
+
+def _timestamp(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
 
 class FatigueMonitor:
     def __init__(self, contamination: float = 0.1):
+        from sklearn.ensemble import IsolationForest
+
         self.model = IsolationForest(
             contamination=contamination,
             random_state=42,
             n_estimators=100
         )
+        self._compiled = None
         self.baseline_wpm = None
         self.baseline_click_rate = None
         self.features = [
@@ -22,79 +52,233 @@ class FatigueMonitor:
         ]
         
     def train_baseline(self, historical_data: List[Dict]):
-        """Establish baseline metrics from historical data."""
+        """Establish the global baseline metrics from historical data and fit the model on it.
+
+        Per-user baselines live in a BaselineStore; this global one is what
+        samples of users without a baseline are compared to.
+        """
         if not historical_data:
             return
-            
+
         typing_speeds = [d['typing_speed'] for d in historical_data if 'typing_speed' in d]
         click_rates = [d['click_rate'] for d in historical_data if 'click_rate' in d]
-        
+
         if typing_speeds:
             self.baseline_wpm = np.mean(typing_speeds)
         if click_rates:
             self.baseline_click_rate = np.mean(click_rates)
-            
+
         # Train the anomaly detection model
         features = self._extract_features(historical_data)
         if features.size > 0:
-            self.model.fit(features)
+            self.fit_features(features)
 
-    def _extract_features(self, data: List[Dict]) -> np.ndarray:
-        """Extract relevant features from interaction data."""
-        features_list = []
-        
-        for entry in data:
-            if not all(k in entry for k in ['typing_speed', 'click_rate', 'error_rate', 'session_duration', 'inactivity_periods']):
-                continue
-                
-            feature_vector = [
-                entry['typing_speed'] / self.baseline_wpm if self.baseline_wpm else 1.0,
-                entry['click_rate'] / self.baseline_click_rate if self.baseline_click_rate else 1.0,
-                entry['error_rate'],
-                min(entry['session_duration'] / 480, 1.0),  # Normalize to 8-hour max
-                entry['inactivity_periods']
-            ]
-            features_list.append(feature_vector)
-            
-        return np.array(features_list)
+    def fit_features(self, features: np.ndarray):
+        """Fit the model on feature rows as returned by ``feature_vector``."""
+        self.model.fit(features)
+        self._compiled = CompiledForest.from_sklearn(self.model)
+
+    def spawn(self) -> "FatigueMonitor":
+        """An unfitted monitor with the same settings and global baseline.
+
+        The live monitor is never refitted in place: fit the copy and swap it in.
+        """
+        monitor = FatigueMonitor(contamination=self.model.contamination)
+        monitor.baseline_wpm = self.baseline_wpm
+        monitor.baseline_click_rate = self.baseline_click_rate
+        return monitor
+
+    def _baseline_values(self, baseline: Optional[UserBaseline]):
+        if baseline is None:
+            return self.baseline_wpm, self.baseline_click_rate
+        return baseline.wpm, baseline.click_rate_mean
+
+    def _typing_decline_floor(self, baseline: Optional[UserBaseline]) -> Optional[float]:
+        """Typing speed below which a sample counts as a decline, or None without a baseline.
 
-    def detect_fatigue(self, current_data: Dict) -> Dict:
+        70% of the baseline speed, and for a user whose speed normally varies
+        more than that, also more than two standard deviations below their mean.
+        """
+        baseline_wpm, _ = self._baseline_values(baseline)
+        if not baseline_wpm:
+            return None
+        floor = 0.7 * baseline_wpm
+        std = baseline.wpm_std if baseline is not None else None
+        if std:
+            floor = min(floor, baseline_wpm - 2 * std)
+        return floor
+
+    def _extract_features(self, data: List[Dict], baseline: Optional[UserBaseline] = None) -> np.ndarray:
+        """Extract relevant features from interaction data, skipping incomplete samples."""
+        complete = [entry for entry in data if _REQUIRED_METRICS.issubset(entry.keys())]
+        return self.feature_matrix(complete, baseline)
+
+    def feature_matrix(self, samples: List[Dict], baseline: Optional[UserBaseline] = None) -> np.ndarray:
+        """(n_samples, n_features) rows for samples that carry every required metric.
+
+        The raw metrics are gathered into one array and every feature is
+        computed as a column operation over it.
+        """
+        return self._features(_raw_metrics(samples), baseline)
+
+    def _features(self, raw: np.ndarray, baseline: Optional[UserBaseline]) -> np.ndarray:
+        baseline_wpm, baseline_click_rate = self._baseline_values(baseline)
+        features = np.empty((len(raw), len(self.features)), dtype=np.float64)
+        features[:, 0] = raw[:, 0] / baseline_wpm if baseline_wpm else 1.0
+        features[:, 1] = raw[:, 1] / baseline_click_rate if baseline_click_rate else 1.0
+        features[:, 2] = raw[:, 2]
+        features[:, 3] = np.minimum(raw[:, 3] / 480, 1.0)  # Normalize to 8-hour max
+        features[:, 4] = raw[:, 4]
+        return features
+
+    def detect_fatigue(self, current_data: Dict, baseline: Optional[UserBaseline] = None) -> Dict:
         """Analyze current user interaction data for fatigue indicators."""
-        if not all(k in current_data for k in ['typing_speed', 'click_rate', 'error_rate', 'session_duration', 'inactivity_periods']):
+        features = self.feature_vector(current_data, baseline)
+
+        # Get anomaly score
+        fatigue_score = self.score_features([features])[0]
+        return self.build_result(current_data, fatigue_score, baseline)
+
+    def feature_vector(self, current_data: Dict, baseline: Optional[UserBaseline] = None) -> np.ndarray:
+        """Validate one interaction sample and return its feature row."""
+        if not _REQUIRED_METRICS.issubset(current_data.keys()):
             raise ValueError("Missing required metrics in current_data")
 
         # Extract features
-        features = self._extract_features([current_data])
-        if features.size == 0:
-            raise ValueError("Could not extract features from current_data")
+        start = time.perf_counter()
+        features = self.feature_matrix([current_data], baseline)
+        _timer.observe("features", time.perf_counter() - start)
+        return features[0]
 
-        # Get anomaly score
-        score = self.model.score_samples(features)[0]
-        normalized_score = 1 - (score - self.model.offset_) / np.abs(self.model.offset_)
-        
+    def detect_fatigue_series(self, samples: List[Dict], baseline: Optional[UserBaseline] = None) -> Dict:
+        """Score a time series of interaction samples (e.g. one work session) in one pass.
+
+        Returns per-sample scores, break flags and indicators, and a session
+        ``trend``: the least-squares slope of the fatigue score per hour when
+        every sample has a ``timestamp`` (per sample otherwise), plus summary
+        statistics. Recommendations are for the latest sample.
+        """
+        return self.analyze_series(samples, baseline)[0]
+
+    def analyze_series(self, samples: List[Dict], baseline: Optional[UserBaseline] = None) -> Tuple[Dict, np.ndarray]:
+        """detect_fatigue_series, and the feature matrix the samples were scored on."""
+        if not samples:
+            raise ValueError("No samples provided")
+        for i, sample in enumerate(samples):
+            if not _REQUIRED_METRICS.issubset(sample.keys()):
+                raise ValueError(f"Missing required metrics in sample {i}")
+
+        start = time.perf_counter()
+        raw = _raw_metrics(samples)
+        features = self._features(raw, baseline)
+        _timer.observe("features", time.perf_counter() - start)
+        scores = np.asarray(self.score_features(features))
+
+        start = time.perf_counter()
+        typing_speed, _, error_rate, session_duration, inactivity_periods = raw.T
+        decline_floor = self._typing_decline_floor(baseline)
+        flags = {
+            "typing_speed_decline": typing_speed < decline_floor if decline_floor else np.zeros(len(samples), dtype=bool),
+            "high_error_rate": error_rate > 0.1,
+            "increased_inactivity": inactivity_periods > 5,
+            "extended_session": session_duration > 240,  # 4 hours
+        }
+        # Same rule as build_result
+        needs_break = (scores > 0.7) | (np.sum(list(flags.values()), axis=0) >= 2) | (session_duration > 240)
+
+        flag_columns = [column.tolist() for column in flags.values()]
+        points = [
+            {
+                "timestamp": _timestamp(sample.get("timestamp")),
+                "fatigue_score": score,
+                "needs_break": flagged,
+                "indicators": dict(zip(flags, row_flags)),
+            }
+            for sample, score, flagged, row_flags in zip(
+                samples, scores.tolist(), needs_break.tolist(), zip(*flag_columns)
+            )
+        ]
+        latest = points[-1]
+        result = {
+            "timestamp": datetime.now().isoformat(),
+            "samples": points,
+            "trend": self._trend(samples, scores, needs_break),
+            "needs_break": latest["needs_break"],
+            "recommendations": self._generate_recommendations(latest["indicators"], samples[-1]),
+        }
+        _timer.observe("results", time.perf_counter() - start)
+        return result, features
+
+    @staticmethod
+    def _trend(samples: List[Dict], scores: np.ndarray, needs_break: np.ndarray) -> Dict:
+        stamps = [sample.get("timestamp") for sample in samples]
+        if all(isinstance(stamp, datetime) for stamp in stamps):
+            # Naive timestamps count as UTC, so they can be mixed with aware ones
+            stamps = [stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc) for stamp in stamps]
+            x = np.array([(stamp - stamps[0]).total_seconds() / 3600 for stamp in stamps])
+            unit = "hour"
+        else:
+            x = np.arange(len(samples), dtype=np.float64)
+            unit = "sample"
+        # A slope needs at least two distinct points in time
+        slope = float(np.polyfit(x, scores, 1)[0]) if np.ptp(x) > 0 else 0.0
+        breaks = np.flatnonzero(needs_break)
+        return {
+            "slope": slope,
+            "unit": unit,
+            "start_score": float(scores[0]),
+            "end_score": float(scores[-1]),
+            "mean_score": float(scores.mean()),
+            "max_score": float(scores.max()),
+            "samples_needing_break": int(len(breaks)),
+            "first_break_index": int(breaks[0]) if len(breaks) else None,
+        }
+
+    def score_features(self, rows: Union[List[np.ndarray], np.ndarray]) -> List[float]:
+        """Fatigue scores for a batch of feature rows (or a feature matrix), in one model call."""
+        start = time.perf_counter()
+        compiled = self._compiled
+        if compiled is None:
+            # Not fitted yet: let sklearn raise its usual NotFittedError
+            scores = self.model.score_samples(np.vstack(rows))
+            offset = self.model.offset_
+        else:
+            scores = compiled.score_samples(np.vstack(rows))
+            offset = compiled.offset
+        normalized_scores = 1 - (scores - offset) / np.abs(offset)
+        _timer.rows(len(rows))
+        _timer.observe("score", time.perf_counter() - start)
+        return normalized_scores.tolist()
+
+    def build_result(self, current_data: Dict, fatigue_score: float, baseline: Optional[UserBaseline] = None) -> Dict:
+        """Turn a sample's fatigue score into indicators and recommendations."""
+        start = time.perf_counter()
         # Analyze specific indicators
+        decline_floor = self._typing_decline_floor(baseline)
         indicators = {
-            "typing_speed_decline": current_data['typing_speed'] < 0.7 * self.baseline_wpm if self.baseline_wpm else False,
+            "typing_speed_decline": current_data['typing_speed'] < decline_floor if decline_floor else False,
             "high_error_rate": current_data['error_rate'] > 0.1,
             "increased_inactivity": current_data['inactivity_periods'] > 5,
             "extended_session": current_data['session_duration'] > 240  # 4 hours
         }
         
         # Calculate fatigue probability and determine if break is needed
-        fatigue_probability = normalized_score
+        fatigue_probability = fatigue_score
         needs_break = (
             fatigue_probability > 0.7 or
             sum(indicators.values()) >= 2 or
             current_data['session_duration'] > 240
         )
         
-        return {
+        result = {
             "timestamp": datetime.now().isoformat(),
             "fatigue_score": float(fatigue_probability),
             "needs_break": needs_break,
             "indicators": indicators,
             "recommendations": self._generate_recommendations(indicators, current_data)
         }
+        _timer.observe("results", time.perf_counter() - start)
+        return result
     
     def _generate_recommendations(self, indicators: Dict[str, bool], current_data: Dict) -> List[str]:
         """Generate specific recommendations based on fatigue indicators."""
@@ -115,4 +299,49 @@ class FatigueMonitor:
         if current_data['session_duration'] > 360:  # 6 hours
             recommendations.append("You've been working for over 6 hours. Consider ending your session soon.")
             
-        return recommendations 
\ No newline at end of file
+        return recommendations 
+
+
+def generate_mock_samples(n_samples: int = 500) -> List[Dict]:
+    """Generate mock interaction samples of rested users, for the default model."""
+    rng = np.random.default_rng(42)
+    return [
+        {
+            "typing_speed": float(rng.normal(60, 10)),
+            "click_rate": float(rng.normal(40, 8)),
+            "error_rate": float(rng.uniform(0.01, 0.08)),
+            "session_duration": float(rng.uniform(5, 240)),
+            "inactivity_periods": int(rng.poisson(2)),
+        }
+        for _ in range(n_samples)
+    ]
+
+
+def train_default_fatigue_model(samples: Optional[List[Dict]] = None) -> FatigueMonitor:
+    """Fatigue model with its global baseline, trained on mock data unless given samples.
+
+    Used by the offline training step, and as the fallback when no artifact
+    is stored, so the API never serves an unfitted model.
+    """
+    monitor = FatigueMonitor()
+    monitor.train_baseline(samples if samples is not None else generate_mock_samples())
+    return monitor
+
+
+@lru_cache()
+def get_fatigue_model() -> ArtifactSlot:
+    """The live FatigueMonitor; replaced, not refitted, when retrained.
+
+    Loaded from the "fatigue" artifact (trained in-process on first use if
+    there is none) until retraining swaps in a refitted one.
+    """
+    return ArtifactSlot(RetrainableArtifact(LazyArtifact(
+        get_model_store(), ARTIFACT_NAME, fallback=train_default_fatigue_model,
+        check_seconds=get_settings().MODEL_STORE_CHECK_SECONDS,
+    )))
+
+
+@lru_cache()
+def get_fatigue_samples() -> Reservoir:
+    """Feature rows of recently analyzed samples, for background retraining."""
+    return Reservoir(get_settings().RETRAIN_RESERVOIR_SIZE)
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ...core.metrics import MODEL_LOAD_SECONDS
+from ...core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.joblib"
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+
+
+class ArtifactNotFoundError(LookupError):
+    pass
+
+
+class ArtifactIntegrityError(Exception):
+    pass
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    versions = {}
+    for module_name in ("numpy", "sklearn", "pyod", "joblib"):
+        try:
+            module = __import__(module_name)
+            versions[module_name] = getattr(module, "__version__", "unknown")
+        except ImportError:
+            continue
+    return versions
+
+
+class ModelArtifactStore:
+    """Versioned, checksummed model artifacts on local disk.
+
+    Layout::
+
+        <root>/<name>/LATEST               -> "3"
+        <root>/<name>/v3/model.joblib      uncompressed joblib pickle
+        <root>/<name>/v3/manifest.json     version, sha256, size, library versions
+
+    Artifacts are written uncompressed, so loading one is a checksum pass and
+    an unpickle. They are not memory-mapped: sklearn's tree unpickling copies
+    the node arrays out of any mapping, so each process holds its own copy.
+
+    Each ``save`` deletes the versions older than the last ``keep_versions``.
+    """
+
+    def __init__(self, root: str, keep_versions: int = 5):
+        self.root = Path(root)
+        self.keep_versions = max(1, keep_versions)
+
+    def _model_dir(self, name: str) -> Path:
+        return self.root / name
+
+    def versions(self, name: str) -> List[int]:
+        model_dir = self._model_dir(name)
+        if not model_dir.is_dir():
+            return []
+        return sorted(
+            int(child.name[1:])
+            for child in model_dir.iterdir()
+            if child.is_dir() and child.name.startswith("v") and child.name[1:].isdigit()
+        )
+
+    def latest_version(self, name: str) -> Optional[int]:
+        latest = self._model_dir(name) / LATEST_FILE
+        if not latest.exists():
+            return None
+        return int(latest.read_text().strip())
+
+    def save(self, name: str, obj: Any, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Write ``obj`` as the next version of ``name`` and make it the latest."""
+        import joblib
+
+        model_dir = self._model_dir(name)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        version = (self.versions(name) or [0])[-1] + 1
+
+        # Build the version in a temp dir and rename it into place, so a
+        # concurrent reader never sees a half-written artifact.
+        staging = Path(tempfile.mkdtemp(prefix=f".v{version}-", dir=model_dir))
+        try:
+            model_path = staging / MODEL_FILE
+            joblib.dump(obj, model_path)
+            manifest = {
+                "name": name,
+                "version": version,
+                "sha256": _sha256(model_path),
+                "size_bytes": model_path.stat().st_size,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "libraries": _library_versions(),
+                "metadata": metadata or {},
+            }
+            (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+            os.rename(staging, model_dir / f"v{version}")
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        latest_tmp = model_dir / f".{LATEST_FILE}.tmp"
+        latest_tmp.write_text(str(version))
+        os.replace(latest_tmp, model_dir / LATEST_FILE)
+        self.prune(name)
+        return version
+
+    def prune(self, name: str) -> List[int]:
+        """Delete all but the newest ``keep_versions`` versions of ``name``; returns the deleted ones."""
+        expired = self.versions(name)[:-self.keep_versions]
+        for version in expired:
+            shutil.rmtree(self._model_dir(name) / f"v{version}", ignore_errors=True)
+        return expired
+
+    def manifest(self, name: str, version: Optional[int] = None) -> Dict[str, Any]:
+        version = version if version is not None else self.latest_version(name)
+        if version is None:
+            raise ArtifactNotFoundError(f"No artifact stored for model '{name}'")
+        manifest_path = self._model_dir(name) / f"v{version}" / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise ArtifactNotFoundError(f"Model '{name}' has no version {version}")
+        return json.loads(manifest_path.read_text())
+
+    def load(self, name: str, version: Optional[int] = None, verify: bool = True) -> Any:
+        """Load an artifact (latest by default), verifying its checksum first."""
+        import joblib
+
+        manifest = self.manifest(name, version)
+        model_path = self._model_dir(name) / f"v{manifest['version']}" / MODEL_FILE
+        if verify and _sha256(model_path) != manifest["sha256"]:
+            raise ArtifactIntegrityError(
+                f"Checksum mismatch for model '{name}' version {manifest['version']}"
+            )
+        return joblib.load(model_path)
+
+
+# Models already loaded in this process, keyed by (store root, name), with
+# their version. A pickled LazyArtifact (e.g. one sent to a process-pool
+# worker) is shipped without its model and reloads it from here.
+_loaded: Dict[tuple, tuple] = {}
+
+
+class LazyArtifact:
+    """Loads a stored model on first use instead of at import time, and
+    picks up newly published versions.
+
+    At most every ``check_seconds`` a ``get`` re-reads the LATEST pointer;
+    when it names another version, that version is loaded (by the caller
+    that noticed, so one request per process pays for the load) and served
+    from then on. If it fails to load, the current model stays in service.
+
+    ``fallback`` builds a model when no artifact has been stored yet (e.g. in
+    a fresh dev checkout); production images should run the offline training
+    step so it is never needed.
+    """
+
+    def __init__(
+        self,
+        store: ModelArtifactStore,
+        name: str,
+        fallback: Optional[Callable[[], Any]] = None,
+        check_seconds: float = 30.0,
+    ):
+        self.store = store
+        self.name = name
+        self.fallback = fallback
+        self.check_seconds = check_seconds
+        self.version: Optional[int] = None
+        self._model = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_model"] = None
+        state["version"] = None
+        state["_next_check"] = 0.0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        model = self._model
+        if model is not None and time.monotonic() < self._next_check:
+            return model
+        with self._lock:
+            if self._model is None or time.monotonic() >= self._next_check:
+                self._refresh()
+            return self._model
+
+    def _refresh(self):
+        self._next_check = time.monotonic() + self.check_seconds
+        version = self.store.latest_version(self.name)
+        if self._model is not None and version == self.version:
+            return
+        key = (str(self.store.root), self.name)
+        cached = _loaded.get(key)
+        if cached is None or cached[1] != version:
+            try:
+                cached = _loaded[key] = self._load(version)
+            except Exception:
+                if self._model is None:
+                    raise
+                logger.exception("Could not load version %s of model '%s'; keeping version %s",
+                                 version, self.name, self.version)
+                return
+        self._model, self.version = cached
+
+    def _load(self, version: Optional[int]) -> tuple:
+        start = time.perf_counter()
+        try:
+            if version is None:
+                raise ArtifactNotFoundError(f"No artifact stored for model '{self.name}'")
+            loaded = self.store.load(self.name, version), version
+            MODEL_LOAD_SECONDS.labels(self.name, "artifact").observe(time.perf_counter() - start)
+            return loaded
+        except ArtifactNotFoundError:
+            if self.fallback is None:
+                raise
+            logger.warning(
+                "No stored artifact for model '%s'; training a fallback in-process. "
+                "Run `python -m app.train_models` to build it offline.", self.name
+            )
+            model = self.fallback()
+            MODEL_LOAD_SECONDS.labels(self.name, "fallback").observe(time.perf_counter() - start)
+            return model, None
+
+
+class RetrainableArtifact:
+    """A stored model that background retraining can override.
+
+    ``get`` serves the model last passed to ``swap``, until a new artifact
+    version is published; from then on the artifact is served again.
+    """
+
+    def __init__(self, artifact: LazyArtifact):
+        self.artifact = artifact
+        # (model, artifact version it was swapped in over)
+        self._retrained: Optional[tuple] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._retrained is not None or self.artifact.loaded
+
+    def get(self) -> Any:
+        stored = self.artifact.get()
+        retrained = self._retrained
+        if retrained is not None:
+            if retrained[1] == self.artifact.version:
+                return retrained[0]
+            self._retrained = None
+        return stored
+
+    def swap(self, model: Any):
+        """Serve ``model`` from now on; calls already scoring keep the previous one."""
+        self._retrained = (model, self.artifact.version)
+
+
+class ArtifactSlot:
+    """A ModelSlot (see core.retraining) backed by a RetrainableArtifact.
+
+    ``slot.model`` is the model currently served; assigning to it swaps a
+    retrained model in.
+    """
+
+    def __init__(self, artifact: RetrainableArtifact):
+        self.artifact = artifact
+
+    @property
+    def model(self) -> Any:
+        return self.artifact.get()
+
+    @model.setter
+    def model(self, model: Any):
+        self.artifact.swap(model)
+
+
+@lru_cache()
+def get_model_store() -> ModelArtifactStore:
+    settings = get_settings()
+    return ModelArtifactStore(settings.data_path(settings.MODEL_STORE_DIR), settings.MODEL_STORE_KEEP_VERSIONS)
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...core.metrics import OSINT_STREAM_EVENTS
+
+Event = Tuple[str, Dict[str, Any]]
+
+# Queued in place of further events once a subscriber falls too far behind
+OVERFLOW: Event = ("overflow", {})
+# Queued when the scan is over and no more events will follow
+END: Event = ("end", {})
+
+
+class Subscription:
+    """One listener's bounded buffer of events for a scan."""
+
+    __slots__ = ("scan_id", "max_buffer", "queue", "closed")
+
+    def __init__(self, scan_id: str, max_buffer: int):
+        self.scan_id = scan_id
+        self.max_buffer = max_buffer
+        # Bounded by _push rather than maxsize, so END always fits
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue()
+        self.closed = False
+
+    def _push(self, event: Event) -> bool:
+        """Queue an event; False if the buffer is full."""
+        if event is not END and self.queue.qsize() >= self.max_buffer:
+            return False
+        self.queue.put_nowait(event)
+        return True
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """The next event, or None if none arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ScanEventHub:
+    """Fans out progress events of the scans running in this process.
+
+    Every subscriber gets its own queue of at most ``max_buffer`` events, so
+    a slow client can't hold up the scan or make the hub buffer without
+    bound. A subscriber that falls that far behind is dropped: its queue is
+    replaced by a single OVERFLOW event, after which it should fall back to
+    fetching the stored results.
+    """
+
+    def __init__(self, max_buffer: int = 1000):
+        self.max_buffer = max_buffer
+        self._subscribers: Dict[str, List[Subscription]] = {}
+
+    def subscribe(self, scan_id: str) -> Subscription:
+        subscription = Subscription(scan_id, self.max_buffer)
+        self._subscribers.setdefault(scan_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.scan_id)
+        if subscriptions and subscription in subscriptions:
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.scan_id]
+        subscription.closed = True
+
+    def publish(self, scan_id: str, event: str, data: Dict[str, Any]):
+        for subscription in list(self._subscribers.get(scan_id, ())):
+            if subscription._push((event, data)):
+                OSINT_STREAM_EVENTS.labels("sent").inc()
+                continue
+            OSINT_STREAM_EVENTS.labels("overflow").inc()
+            self.unsubscribe(subscription)
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(OVERFLOW)
+
+    def close(self, scan_id: str):
+        """Tell every subscriber of a scan that it's over."""
+        for subscription in self._subscribers.pop(scan_id, ()):
+            subscription.closed = True
+            subscription._push(END)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
@@ -0,0 +1,396 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .events import END, OVERFLOW, ScanEventHub
+from .result_cache import ToolResultCache
+from .scanner import OSINTScanner
+from ...core.metrics import OSINT_JOBS
+from ...core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+ERROR = "error"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, ERROR, CANCELLED)
+
+
+class OSINTJobStore:
+    """Durable OSINT scan jobs in a local SQLite file (WAL mode).
+
+    Jobs move pending -> running -> completed/error/cancelled. A worker
+    takes a pending job with ``claim``, which is atomic, so several worker
+    processes can share one file without running a job twice. While a job
+    runs its owner refreshes ``heartbeat_at``; ``requeue_stale`` puts jobs
+    whose owner stopped heartbeating (e.g. a crashed process) back to
+    pending. Finished jobs get an ``expires_at`` and are evicted after it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS osint_jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " scan_id TEXT NOT NULL UNIQUE,"
+            " status TEXT NOT NULL,"
+            " request TEXT NOT NULL,"
+            " results TEXT,"
+            " owner TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " heartbeat_at REAL,"
+            " finished_at REAL,"
+            " expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_osint_jobs_status_seq ON osint_jobs (status, seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_osint_jobs_expires_at ON osint_jobs (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, scan_id: str, request: Dict[str, Any]):
+        self._conn().execute(
+            "INSERT INTO osint_jobs (scan_id, status, request, created_at) VALUES (?, ?, ?, ?)",
+            (scan_id, PENDING, json.dumps(request), time.time()),
+        )
+
+    def get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT * FROM osint_jobs WHERE scan_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (scan_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["results"] = json.loads(job["results"]) if job["results"] else {}
+        return job
+
+    def queue_position(self, scan_id: str) -> int:
+        """1-based position of a pending job among all pending jobs, oldest first."""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM osint_jobs WHERE status = ? AND seq <= "
+            "(SELECT seq FROM osint_jobs WHERE scan_id = ?)",
+            (PENDING, scan_id),
+        ).fetchone()[0]
+
+    def pending_ids(self) -> List[str]:
+        return [
+            row[0] for row in self._conn().execute(
+                "SELECT scan_id FROM osint_jobs WHERE status = ? ORDER BY seq", (PENDING,)
+            )
+        ]
+
+    def claim(self, scan_id: str, owner: str) -> bool:
+        now = time.time()
+        return self._conn().execute(
+            "UPDATE osint_jobs SET status = ?, owner = ?, started_at = ?, heartbeat_at = ? "
+            "WHERE scan_id = ? AND status = ?",
+            (RUNNING, owner, now, now, scan_id, PENDING),
+        ).rowcount == 1
+
+    def heartbeat(self, scan_ids: List[str], owner: str):
+        if scan_ids:
+            self._conn().execute(
+                f"UPDATE osint_jobs SET heartbeat_at = ? WHERE owner = ? AND status = ? "
+                f"AND scan_id IN ({','.join('?' * len(scan_ids))})",
+                (time.time(), owner, RUNNING, *scan_ids),
+            )
+
+    def finish(self, scan_id: str, owner: str, status: str, results: Dict[str, Any], ttl_seconds: float) -> bool:
+        """Record a running job's outcome; False if it was cancelled or taken over meanwhile."""
+        now = time.time()
+        return self._conn().execute(
+            "UPDATE osint_jobs SET status = ?, results = ?, finished_at = ?, expires_at = ?, owner = NULL "
+            "WHERE scan_id = ? AND owner = ? AND status = ?",
+            (status, json.dumps(results), now, now + ttl_seconds, scan_id, owner, RUNNING),
+        ).rowcount == 1
+
+    def cancel(self, scan_id: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        return self._conn().execute(
+            "UPDATE osint_jobs SET status = ?, finished_at = ?, expires_at = ?, owner = NULL "
+            "WHERE scan_id = ? AND status IN (?, ?)",
+            (CANCELLED, now, now + ttl_seconds, scan_id, PENDING, RUNNING),
+        ).rowcount == 1
+
+    def requeue(self, scan_id: str, owner: str):
+        self._conn().execute(
+            "UPDATE osint_jobs SET status = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL "
+            "WHERE scan_id = ? AND owner = ? AND status = ?",
+            (PENDING, scan_id, owner, RUNNING),
+        )
+
+    def requeue_stale(self, older_than: float) -> List[str]:
+        conn = self._conn()
+        stale = [
+            row[0] for row in conn.execute(
+                "SELECT scan_id FROM osint_jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, older_than)
+            )
+        ]
+        for scan_id in stale:
+            conn.execute(
+                "UPDATE osint_jobs SET status = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE scan_id = ? AND status = ? AND heartbeat_at < ?",
+                (PENDING, scan_id, RUNNING, older_than),
+            )
+        return stale
+
+    def delete(self, scan_id: str) -> bool:
+        return self._conn().execute("DELETE FROM osint_jobs WHERE scan_id = ?", (scan_id,)).rowcount == 1
+
+    def evict_expired(self) -> int:
+        return self._conn().execute(
+            "DELETE FROM osint_jobs WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            row[0]: row[1]
+            for row in self._conn().execute("SELECT status, COUNT(*) FROM osint_jobs GROUP BY status")
+        }
+
+
+class OSINTJobManager:
+    """Queues OSINT scans and runs at most ``max_concurrent_jobs`` at once.
+
+    Jobs are persisted in an ``OSINTJobStore`` before ``submit`` returns, so
+    pending jobs survive a restart and are picked up again by ``start``.
+    Tool-level concurrency and timeouts are enforced by the scanner. A
+    background task evicts expired results, refreshes heartbeats of the
+    jobs running here, and requeues jobs abandoned by a dead process.
+
+    Progress of the scans running here is published on ``events``;
+    ``stream`` follows one scan, falling back to polling the store for
+    scans running in another process.
+
+    Store calls are blocking SQLite I/O and run in worker threads, off the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        scanner: OSINTScanner,
+        store: OSINTJobStore,
+        max_concurrent_jobs: int = 4,
+        result_ttl_seconds: float = 24 * 3600,
+        maintenance_interval: float = 30.0,
+        events: Optional[ScanEventHub] = None,
+    ):
+        self.scanner = scanner
+        self.store = store
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.result_ttl_seconds = result_ttl_seconds
+        self.maintenance_interval = maintenance_interval
+        self.events = events or ScanEventHub()
+        # Identifies this process as the owner of the jobs it claims
+        self.owner = uuid.uuid4().hex
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: set = set()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.started:
+            return
+        self._queue = asyncio.Queue()
+        await asyncio.to_thread(self.store.requeue_stale, time.time() - 3 * self.maintenance_interval)
+        for scan_id in await asyncio.to_thread(self.store.pending_ids):
+            self._queue.put_nowait(scan_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+        self._tasks.append(asyncio.create_task(self._maintenance()))
+
+    async def stop(self):
+        """Stop the workers; scans cut short go back to pending for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.scanner.cleanup()
+
+    async def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        await self.start()
+        scan_id = f"scan_{uuid.uuid4().hex}"
+        await asyncio.to_thread(self.store.create, scan_id, request)
+        self._queue.put_nowait(scan_id)
+        return await self.get(scan_id)
+
+    async def get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, scan_id)
+
+    def _get(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(scan_id)
+        if job is None:
+            return None
+        job["queue_position"] = self.store.queue_position(scan_id) if job["status"] == PENDING else None
+        return job
+
+    async def cancel(self, scan_id: str) -> bool:
+        """Cancel a pending or running job. Only kills the scan if it runs in this process."""
+        if not await asyncio.to_thread(self.store.cancel, scan_id, self.result_ttl_seconds):
+            return False
+        OSINT_JOBS.labels(CANCELLED).inc()
+        self._publish_status(scan_id, CANCELLED)
+        task = self._running.get(scan_id)
+        if task is not None:
+            self._cancelled.add(scan_id)
+            task.cancel()
+        return True
+
+    async def delete(self, scan_id: str) -> bool:
+        await self.cancel(scan_id)
+        return await asyncio.to_thread(self.store.delete, scan_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": await asyncio.to_thread(self.store.counts),
+            "running_here": len(self._running),
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "tool_concurrency": self.scanner.tool_concurrency,
+            "tool_timeouts": self.scanner.tool_timeouts,
+            "result_cache": self.scanner.result_cache.stats() if self.scanner.result_cache else None,
+            "stream_subscribers": self.events.subscriber_count(),
+        }
+
+    def _publish_status(self, scan_id: str, status: str):
+        self.events.publish(scan_id, "status", {"scan_id": scan_id, "status": status, "queue_position": None})
+        if status in FINISHED:
+            self.events.close(scan_id)
+
+    async def stream(self, scan_id: str, poll_interval: float = 5.0) -> AsyncIterator[Optional[Tuple[str, Dict[str, Any]]]]:
+        """Progress of a scan as (event, data) pairs, ending with a "result" event.
+
+        Yields the current status first, then the scan's events as they
+        happen. None is yielded after ``poll_interval`` seconds without any,
+        as a keep-alive. Ends early with an "overflow" event if the consumer
+        falls too far behind, and without a result if the scan is deleted.
+        """
+        # Subscribe before reading the status, so no event falls in between
+        subscription = self.events.subscribe(scan_id)
+        try:
+            job = await self.get(scan_id)
+            if job is None:
+                return
+            last_status = (job["status"], job["queue_position"])
+            yield "status", {"scan_id": scan_id, "status": job["status"], "queue_position": job["queue_position"]}
+            while job["status"] not in FINISHED:
+                event = await subscription.get(poll_interval)
+                if event is OVERFLOW:
+                    yield event
+                    return
+                if event is not None and event is not END:
+                    if event[0] == "status":
+                        last_status = (event[1]["status"], event[1]["queue_position"])
+                    yield event
+                    continue
+                # Finished here, or nothing heard: check the store, which
+                # also catches scans run by another process
+                job = await self.get(scan_id)
+                if job is None:
+                    return
+                status = (job["status"], job["queue_position"])
+                if status != last_status:
+                    last_status = status
+                    yield "status", {"scan_id": scan_id, "status": job["status"], "queue_position": job["queue_position"]}
+                elif event is None:
+                    yield None
+            yield "result", job
+        finally:
+            self.events.unsubscribe(subscription)
+
+    async def _worker(self):
+        while True:
+            scan_id = await self._queue.get()
+            if not await asyncio.to_thread(self.store.claim, scan_id, self.owner):
+                continue  # cancelled, or claimed by another process
+            job = await asyncio.to_thread(self.store.get, scan_id)
+            self._publish_status(scan_id, RUNNING)
+            emit = functools.partial(self.events.publish, scan_id)
+            scan = asyncio.create_task(self.scanner.scan_user_data(job["request"], emit))
+            self._running[scan_id] = scan
+            try:
+                results = await scan
+                status = COMPLETED
+            except asyncio.CancelledError:
+                if scan_id in self._cancelled:
+                    self._cancelled.discard(scan_id)
+                    continue  # the store already says cancelled
+                # Shutting down: leave it for the next start
+                await asyncio.shield(asyncio.to_thread(self.store.requeue, scan_id, self.owner))
+                self.events.close(scan_id)
+                raise
+            except Exception as e:
+                logger.exception("OSINT scan %s failed", scan_id)
+                results = {"error": str(e)}
+                status = ERROR
+            finally:
+                self._running.pop(scan_id, None)
+
+            finished = await asyncio.to_thread(
+                self.store.finish, scan_id, self.owner, status, results, self.result_ttl_seconds
+            )
+            if finished:
+                OSINT_JOBS.labels(status).inc()
+                self._publish_status(scan_id, status)
+
+    async def _maintenance(self):
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, list(self._running), self.owner)
+                await asyncio.to_thread(self.store.evict_expired)
+                stale = await asyncio.to_thread(self.store.requeue_stale, time.time() - 3 * self.maintenance_interval)
+                for scan_id in stale:
+                    self._queue.put_nowait(scan_id)
+            except Exception:
+                logger.exception("OSINT job maintenance failed")
+
+
+def job_timestamp(job: Dict[str, Any]) -> str:
+    return datetime.fromtimestamp(job["finished_at"] or job["created_at"]).isoformat()
+
+
+@lru_cache()
+def get_osint_jobs() -> OSINTJobManager:
+    settings = get_settings()
+    scanner = OSINTScanner(
+        output_dir=settings.OSINT_OUTPUT_DIR,
+        tool_concurrency=settings.OSINT_TOOL_CONCURRENCY,
+        tool_timeouts=settings.OSINT_TOOL_TIMEOUTS,
+        result_cache=ToolResultCache(
+            ttls=settings.OSINT_RESULT_CACHE_TTLS,
+            max_entries=settings.OSINT_RESULT_CACHE_MAX_ENTRIES,
+        ),
+    )
+    return OSINTJobManager(
+        scanner,
+        OSINTJobStore(settings.data_path(settings.OSINT_JOB_DB)),
+        max_concurrent_jobs=settings.OSINT_MAX_CONCURRENT_JOBS,
+        result_ttl_seconds=settings.OSINT_RESULT_TTL_SECONDS,
+        events=ScanEventHub(max_buffer=settings.OSINT_STREAM_BUFFER),
+    )
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ...core.metrics import OSINT_CACHE_REQUESTS, OSINT_CACHE_SAVED_SECONDS
+
+ToolKey = Tuple[str, str]  # (tool, normalized target)
+
+
+def normalize_target(tool: str, target: str) -> str:
+    """Canonical form of a tool's target, so equivalent inputs share a cache entry."""
+    target = target.strip()
+    if tool == "amass":
+        return target.lower().rstrip(".")
+    if tool == "h8mail":
+        return target.lower()
+    # Usernames are case-sensitive on some sites
+    return target
+
+
+class _CachedResult:
+    __slots__ = ("result", "seconds", "expires_at")
+
+    def __init__(self, result: Dict[str, Any], seconds: float, expires_at: float):
+        self.result = result
+        self.seconds = seconds
+        self.expires_at = expires_at
+
+
+OnItem = Callable[[str], None]
+ToolRun = Callable[[str, Optional[OnItem]], Awaitable[Dict[str, Any]]]
+
+
+class _Flight:
+    __slots__ = ("task", "waiters", "seconds", "items", "listeners")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.seconds = 0.0
+        # Items found so far, replayed to waiters that join late
+        self.items: List[str] = []
+        self.listeners: List[OnItem] = []
+
+    def on_item(self, item: str):
+        self.items.append(item)
+        for listener in list(self.listeners):
+            listener(item)
+
+
+class ToolResultCache:
+    """Results of OSINT tool runs keyed by (tool, normalized target).
+
+    Successful results are kept for the tool's TTL (``ttls``, seconds; 0
+    disables caching for that tool) and the least recently used are evicted
+    beyond ``max_entries``. Errors and timeouts are never cached.
+
+    Runs are single-flight: a request for a target whose tool is already
+    running waits for that run instead of starting another subprocess. The
+    run belongs to its waiters, not to whoever started it, and is only
+    cancelled once every waiter has been cancelled.
+
+    Hits and joined runs add the tool time they avoided to
+    ``osint_cache_saved_seconds_total``. The cache is per process.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 5000):
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[ToolKey, _CachedResult]" = OrderedDict()
+        self._inflight: Dict[ToolKey, _Flight] = {}
+        self.evictions = 0
+
+    async def get_or_run(
+        self,
+        tool: str,
+        target: str,
+        run: ToolRun,
+        on_item: Optional[OnItem] = None,
+    ) -> Dict[str, Any]:
+        """The cached result for ``target``, else ``await run(normalized_target, on_item)`` (shared).
+
+        ``on_item`` receives the items of the shared run as they are found,
+        starting with those found before this caller joined.
+        """
+        target = normalize_target(tool, target)
+        key = (tool, target)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            OSINT_CACHE_REQUESTS.labels(tool, "hit").inc()
+            OSINT_CACHE_SAVED_SECONDS.labels(tool).inc(entry.seconds)
+            return entry.result
+
+        flight = self._inflight.get(key)
+        joined = flight is not None
+        if joined:
+            OSINT_CACHE_REQUESTS.labels(tool, "joined").inc()
+        else:
+            OSINT_CACHE_REQUESTS.labels(tool, "miss").inc()
+            flight = self._inflight[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, run))
+
+        flight.waiters += 1
+        if on_item is not None:
+            for item in list(flight.items):
+                on_item(item)
+            flight.listeners.append(on_item)
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants it any more; a later request starts afresh
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+            raise
+        finally:
+            if on_item is not None:
+                flight.listeners.remove(on_item)
+        flight.waiters -= 1
+        if joined:
+            OSINT_CACHE_SAVED_SECONDS.labels(tool).inc(flight.seconds)
+        return result
+
+    async def _run(self, key: ToolKey, flight: _Flight, run: ToolRun) -> Dict[str, Any]:
+        tool, target = key
+        start = time.monotonic()
+        try:
+            result = await run(target, flight.on_item)
+        finally:
+            flight.seconds = time.monotonic() - start
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        ttl = self.ttls.get(tool, 0)
+        if ttl > 0 and result.get("status") == "success":
+            self._put(key, _CachedResult(result, flight.seconds, time.monotonic() + ttl))
+        return result
+
+    def _put(self, key: ToolKey, entry: _CachedResult):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttls": self.ttls,
+            "evictions": self.evictions,
+        }
@@ -1,56 +1,169 @@
 import asyncio
 import json
+import shutil
+import signal
 import subprocess
-from typing import Dict, List, Optional, Any
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Any
 from pathlib import Path
 import tempfile
 import os
 from datetime import datetime
+from .result_cache import ToolResultCache, normalize_target
+from ...core.metrics import OSINT_TOOL_RUNS, OSINT_TOOL_SECONDS
+
+# Called with each new result item (subdomain, profile URL) while a tool runs
+OnItem = Callable[[str], None]
+# Called with (event, data) as a scan progresses
+Emit = Callable[[str, Dict[str, Any]], None]
+
+# amass can print very long graph lines
+_MAX_LINE_BYTES = 1024 * 1024
 
 class OSINTScanner:
-    def __init__(self, output_dir: Optional[str] = None):
+    """Runs the OSINT command-line tools.
+
+    Each tool has its own concurrency limit (``tool_concurrency``), shared by
+    every scan in this process, and its own timeout (``tool_timeouts``,
+    seconds). A tool that times out, or whose scan is cancelled, has its
+    process group killed. amass and sherlock output is parsed from stdout
+    line by line as it arrives; h8mail's JSON file is deleted once parsed.
+
+    With a ``result_cache``, repeated and concurrent runs of a tool against
+    the same target are served from, or attached to, a single run.
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        result_cache: Optional[ToolResultCache] = None
+    ):
+        self._owns_output_dir = output_dir is None
         self.output_dir = output_dir or tempfile.mkdtemp()
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        self.tool_concurrency = dict(tool_concurrency or {})
+        self.tool_timeouts = dict(tool_timeouts or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.result_cache = result_cache
 
-    async def run_amass(self, domain: str) -> Dict[str, Any]:
-        """Run Amass for domain enumeration."""
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            semaphore = self._semaphores[tool] = asyncio.Semaphore(self.tool_concurrency.get(tool, 1))
+        return semaphore
+
+    def _output_file(self, tool: str, extension: str) -> str:
+        # Random names: targets are user input and must not end up in paths
+        return os.path.join(self.output_dir, f"{tool}_{uuid.uuid4().hex}.{extension}")
+
+    @staticmethod
+    def _remove(path: str):
         try:
-            output_file = os.path.join(self.output_dir, f"amass_{domain}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    async def _read_output(process, on_line: Optional[Callable[[str], None]]) -> bytes:
+        """Wait for the process, feeding stdout to ``on_line`` as it arrives; returns stderr."""
+        if on_line is None:
+            _, stderr = await process.communicate()
+            return stderr
+        # Drain stderr alongside, or a chatty tool blocks on a full pipe
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            async for line in process.stdout:
+                on_line(line.decode(errors="replace").strip())
+            await process.wait()
+            return await stderr_task
+        finally:
+            stderr_task.cancel()
+
+    async def _exec(self, tool: str, *args: str, on_line: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Run a tool under its concurrency limit and timeout; returns an error message or None.
+
+        With ``on_line``, each stdout line is handed over as soon as the tool
+        prints it instead of being buffered until exit.
+        """
+        timeout = self.tool_timeouts.get(tool)
+        async with self._semaphore(tool):
+            start = time.perf_counter()
             process = await asyncio.create_subprocess_exec(
-                "amass", "enum", "-d", domain, "-o", output_file,
+                tool, *args,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                # Own process group, so killing it also kills anything the tool spawned
+                start_new_session=True,
+                limit=_MAX_LINE_BYTES
             )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                return {"status": "error", "message": stderr.decode()}
-            
-            with open(output_file, 'r') as f:
-                subdomains = f.read().splitlines()
+            outcome = "error"
+            try:
+                stderr = await asyncio.wait_for(self._read_output(process, on_line), timeout=timeout)
+                outcome = "success" if process.returncode == 0 else "error"
+                return None if process.returncode == 0 else stderr.decode()
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                return f"{tool} timed out after {timeout:g}s"
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                if process.returncode is None:
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                OSINT_TOOL_RUNS.labels(tool, outcome).inc()
+                OSINT_TOOL_SECONDS.labels(tool).observe(time.perf_counter() - start)
+
+    async def _cached(self, tool: str, target: str, run, on_item: Optional[OnItem]) -> Dict[str, Any]:
+        if self.result_cache is None:
+            return await run(normalize_target(tool, target), on_item)
+        return await self.result_cache.get_or_run(tool, target, run, on_item)
+
+    async def run_amass(self, domain: str, on_item: Optional[OnItem] = None) -> Dict[str, Any]:
+        """Run Amass for domain enumeration; ``on_item`` gets each new subdomain as found."""
+        return await self._cached("amass", domain, self._run_amass, on_item)
+
+    async def _run_amass(self, domain: str, on_item: Optional[OnItem]) -> Dict[str, Any]:
+        subdomains: Dict[str, None] = {}  # ordered set
+
+        def on_line(line: str):
+            # Plain "name" lines, or "name (FQDN) --> ..." from newer releases
+            name = line.split(maxsplit=1)[0].lower().rstrip(".") if line else ""
+            if (name == domain or name.endswith("." + domain)) and name not in subdomains:
+                subdomains[name] = None
+                if on_item is not None:
+                    on_item(name)
+
+        try:
+            error = await self._exec("amass", "enum", "-d", domain, on_line=on_line)
+            if error is not None:
+                return {"status": "error", "tool": "amass", "message": error}
             
             return {
                 "status": "success",
                 "tool": "amass",
-                "subdomains": subdomains,
+                "subdomains": list(subdomains),
                 "count": len(subdomains)
             }
         except Exception as e:
             return {"status": "error", "tool": "amass", "message": str(e)}
 
-    async def run_h8mail(self, email: str) -> Dict[str, Any]:
-        """Run h8mail for email breach checking."""
+    async def run_h8mail(self, email: str, on_item: Optional[OnItem] = None) -> Dict[str, Any]:
+        """Run h8mail for email breach checking. Its results only come as a whole."""
+        return await self._cached("h8mail", email, self._run_h8mail, on_item)
+
+    async def _run_h8mail(self, email: str, on_item: Optional[OnItem]) -> Dict[str, Any]:
+        output_file = self._output_file("h8mail", "json")
         try:
-            output_file = os.path.join(self.output_dir, f"h8mail_{email}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-            process = await asyncio.create_subprocess_exec(
-                "h8mail", "-t", email, "-j", output_file,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                return {"status": "error", "message": stderr.decode()}
+            error = await self._exec("h8mail", "-t", email, "-j", output_file)
+            if error is not None:
+                return {"status": "error", "tool": "h8mail", "message": error}
             
             with open(output_file, 'r') as f:
                 results = json.load(f)
@@ -62,48 +175,72 @@ class OSINTScanner:
             }
         except Exception as e:
             return {"status": "error", "tool": "h8mail", "message": str(e)}
+        finally:
+            self._remove(output_file)
+
+    async def run_sherlock(self, username: str, on_item: Optional[OnItem] = None) -> Dict[str, Any]:
+        """Run Sherlock for username reconnaissance; ``on_item`` gets each new profile URL as found."""
+        return await self._cached("sherlock", username, self._run_sherlock, on_item)
+
+    async def _run_sherlock(self, username: str, on_item: Optional[OnItem]) -> Dict[str, Any]:
+        profiles: Dict[str, None] = {}  # ordered set
+
+        def on_line(line: str):
+            # "[+] Site: https://site/username"
+            if line.startswith("[+]") and ": " in line:
+                url = line.split(": ", 1)[1].strip()
+                if url and url not in profiles:
+                    profiles[url] = None
+                    if on_item is not None:
+                        on_item(url)
 
-    async def run_sherlock(self, username: str) -> Dict[str, Any]:
-        """Run Sherlock for username reconnaissance."""
         try:
-            output_file = os.path.join(self.output_dir, f"sherlock_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
-            process = await asyncio.create_subprocess_exec(
-                "sherlock", username, "--output", output_file,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                return {"status": "error", "message": stderr.decode()}
-            
-            with open(output_file, 'r') as f:
-                results = f.read().splitlines()
+            error = await self._exec("sherlock", username, "--print-found", "--no-txt", on_line=on_line)
+            if error is not None:
+                return {"status": "error", "tool": "sherlock", "message": error}
             
             return {
                 "status": "success",
                 "tool": "sherlock",
-                "found_profiles": results,
-                "count": len(results)
+                "found_profiles": list(profiles),
+                "count": len(profiles)
             }
         except Exception as e:
             return {"status": "error", "tool": "sherlock", "message": str(e)}
 
-    async def scan_user_data(self, data: Dict[str, str]) -> Dict[str, Any]:
+    def cleanup(self):
+        """Remove the output directory if this scanner created it."""
+        if self._owns_output_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    async def _run_tool(self, tool: str, run, target: str, emit: Optional[Emit]) -> Dict[str, Any]:
+        on_item = None
+        if emit is not None:
+            on_item = lambda item: emit("item", {"tool": tool, "item": item})
+        result = await run(target, on_item)
+        if emit is not None:
+            emit("tool", result)
+        return result
+
+    async def scan_user_data(self, data: Dict[str, str], emit: Optional[Emit] = None) -> Dict[str, Any]:
         """
         Comprehensive OSINT scan using multiple tools.
+
+        ``emit(event, data)``, if given, receives an "item" event for each
+        result found while the tools run and a "tool" event with each tool's
+        full result as it finishes.
         """
         tasks = []
         results = {"timestamp": datetime.now().isoformat(), "results": {}}
 
         if "email" in data:
-            tasks.append(self.run_h8mail(data["email"]))
+            tasks.append(self._run_tool("h8mail", self.run_h8mail, data["email"], emit))
             
         if "username" in data:
-            tasks.append(self.run_sherlock(data["username"]))
+            tasks.append(self._run_tool("sherlock", self.run_sherlock, data["username"], emit))
             
         if "domain" in data:
-            tasks.append(self.run_amass(data["domain"]))
+            tasks.append(self._run_tool("amass", self.run_amass, data["domain"], emit))
 
         # Run all tools concurrently
         tool_results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,71 @@
+from functools import partial
+from typing import Any, List
+
+import numpy as np
+
+from ..core.retraining import RetrainingService, get_retraining_service
+from ..core.settings import get_settings
+from ..core_modules.anomaly.model import get_session_detector, get_session_samples, train_default_model
+from ..database import SessionLocal
+from .fatigue_detection.fatigue_monitor import (
+    ARTIFACT_NAME as FATIGUE_ARTIFACT,
+    FatigueMonitor,
+    get_fatigue_model,
+    get_fatigue_samples,
+)
+from .threat_detection.model_registry import (
+    POPULATION_ARTIFACT,
+    get_model_registry,
+    sample_recent_history,
+    train_population_model,
+)
+
+
+def _install_population(detector: Any):
+    get_model_registry().population = detector
+
+
+def _fit_fatigue(rows: List[np.ndarray]) -> FatigueMonitor:
+    monitor = get_fatigue_model().model.spawn()
+    monitor.fit_features(np.vstack(rows))
+    return monitor
+
+
+def _install_fatigue(monitor: FatigueMonitor):
+    get_fatigue_model().model = monitor
+
+
+def setup_retraining() -> RetrainingService:
+    """Register the threat population, fatigue and session models for retraining.
+
+    The threat population model is refitted on a reservoir sample of the
+    last RETRAIN_WINDOW_HOURS of stored activities, which are all scored
+    traffic and not only its anomalies (see activity_writer.activity_rows),
+    so it learns what normal looks like. Fatigue and session
+    samples aren't stored, so those models are refitted on a reservoir of
+    the traffic this process analyzed since their last refit.
+    """
+    settings = get_settings()
+    service = get_retraining_service()
+    service.register(
+        POPULATION_ARTIFACT,
+        load=partial(sample_recent_history, SessionLocal, settings.RETRAIN_WINDOW_HOURS, settings.RETRAIN_RESERVOIR_SIZE),
+        fit=train_population_model,
+        install=_install_population,
+        min_samples=settings.RETRAIN_MIN_SAMPLES,
+    )
+    service.register(
+        FATIGUE_ARTIFACT,
+        load=partial(get_fatigue_samples().drain, settings.RETRAIN_MIN_SAMPLES),
+        fit=_fit_fatigue,
+        install=_install_fatigue,
+        min_samples=settings.RETRAIN_MIN_SAMPLES,
+    )
+    service.register(
+        "session_anomaly",
+        load=partial(get_session_samples().drain, settings.RETRAIN_MIN_SAMPLES),
+        fit=lambda rows: train_default_model(np.array(rows, dtype=np.float64)),
+        install=get_session_detector().swap_model,
+        min_samples=settings.RETRAIN_MIN_SAMPLES,
+    )
+    return service
@@ -0,0 +1,443 @@
+"""
+Time-partitioned storage of user_activities: partitions, retention and
+hourly rollups.
+
+user_activities is split into one partition per UTC day, named
+``user_activities_pYYYYMMDD``, plus ``user_activities_default`` for rows
+no partition covers (older than the oldest one, or further ahead than
+partitions were created):
+
+* on Postgres it is a native ``PARTITION BY RANGE (timestamp)`` table;
+* on SQLite (tests and local runs) the partitions are plain tables, and
+  ``user_activities`` is a UNION ALL view over them. An INSTEAD OF INSERT
+  trigger on the view routes rows by timestamp and hands out ids from
+  ``user_activities_id_seq``. The view and trigger are rebuilt whenever
+  partitions are added or dropped.
+
+Readers and writers keep using ``user_activities`` on both. Partitions
+carry their own copy of ix_user_activities_recent_anomalies, named
+``ix_<partition>_recent_anomalies``.
+
+ActivityMaintenance runs three idempotent steps periodically:
+
+  partitions  create the partitions of the next days, moving any rows
+              they cover out of the default partition;
+  retention   drop whole partitions older than the retention window,
+              delete expired rows of the default partition and old rollups;
+  rollup      recompute user_activity_hourly for the last lookback hours.
+
+Dropping a partition is a metadata operation, so retention costs the
+same however many rows a day holds.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal_column, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from ...core.metrics import ACTIVITY_MAINTENANCE_SECONDS, ACTIVITY_PARTITIONS
+from ...core.settings import get_settings
+from ...database import engine as default_engine
+from ...models.user_activity import ANOMALY_SCORE_THRESHOLD, UserActivity, UserActivityHourly
+
+logger = logging.getLogger(__name__)
+
+TABLE = "user_activities"
+PARTITION_PREFIX = "user_activities_p"
+DEFAULT_PARTITION = "user_activities_default"
+# SQLite stand-in for the Postgres id sequence of user_activities
+SQLITE_ID_SEQUENCE = "user_activities_id_seq"
+# Serializes maintenance runs of several workers on Postgres
+_PG_LOCK_KEY = 7301024
+
+COLUMNS = (
+    "id", "user_id", "timestamp", "ip_address", "location", "browser_fingerprint",
+    "user_agent", "activity_type", "anomaly_score", "additional_data",
+)
+
+_SQLITE_COLUMNS = """(
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER REFERENCES users (id),
+    timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ip_address VARCHAR,
+    location JSON,
+    browser_fingerprint VARCHAR,
+    user_agent VARCHAR,
+    activity_type VARCHAR,
+    anomaly_score FLOAT,
+    additional_data JSON
+)"""
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> Optional[date]:
+    """The day a partition covers, or None if ``name`` isn't a daily partition."""
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def partition_bounds(day: date) -> Tuple[datetime, datetime]:
+    """[start, end) of a day's partition, as naive UTC datetimes."""
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def _merged_ranges(days: List[date]) -> List[Tuple[datetime, datetime]]:
+    """Contiguous [start, end) ranges covered by the given daily partitions."""
+    ranges: List[Tuple[datetime, datetime]] = []
+    for day in sorted(days):
+        start, end = partition_bounds(day)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _create_indexes(conn: Connection, table: str):
+    # Same definition as ix_user_activities_recent_anomalies, so that on
+    # Postgres ATTACH PARTITION adopts it instead of building another
+    conn.exec_driver_sql(
+        f"CREATE INDEX ix_{table}_recent_anomalies ON {table} (user_id, timestamp DESC, id DESC) "
+        f"WHERE anomaly_score > {ANOMALY_SCORE_THRESHOLD!r}"
+    )
+
+
+class PostgresLayout:
+    """Native range partitions of the partitioned user_activities table."""
+
+    def installed(self, conn: Connection) -> bool:
+        return conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": TABLE}
+        ).scalar() == "p"
+
+    def partitions(self, conn: Connection) -> List[date]:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": TABLE}).scalars()
+        return sorted(day for day in map(partition_day, names) if day is not None)
+
+    def bind(self, value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc)
+
+    def _create_table(self, conn: Connection, name: str):
+        conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        _create_indexes(conn, name)
+
+    def create_default(self, conn: Connection):
+        self._create_table(conn, DEFAULT_PARTITION)
+        conn.exec_driver_sql(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+    def create_partition(self, conn: Connection, day: date):
+        name = partition_name(day)
+        start, end = partition_bounds(day)
+        self._create_table(conn, name)
+        # Attaching fails while the default partition holds rows of the new range
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), {"start": self.bind(start), "end": self.bind(end)})
+        conn.exec_driver_sql(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}+00') TO ('{end.isoformat()}+00')"
+        )
+
+    def drop_partition(self, conn: Connection, day: date):
+        conn.exec_driver_sql(f"DROP TABLE {partition_name(day)}")
+
+    def partitions_changed(self, conn: Connection):
+        pass
+
+    def hour(self, column):
+        return func.date_trunc(literal_column("'hour'"), column)
+
+    @contextmanager
+    def locked(self, engine: Engine) -> Iterator[Optional[Connection]]:
+        """A connection in a transaction holding the maintenance lock, or None if another worker has it."""
+        with engine.begin() as conn:
+            acquired = conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY}).scalar()
+            yield conn if acquired else None
+
+
+class SQLiteLayout:
+    """Per-day tables behind a UNION ALL view, routed by an INSTEAD OF trigger."""
+
+    def installed(self, conn: Connection) -> bool:
+        return conn.execute(
+            text("SELECT type FROM sqlite_master WHERE name = :table"), {"table": TABLE}
+        ).scalar() == "view"
+
+    def partitions(self, conn: Connection) -> List[date]:
+        names = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix"),
+            {"prefix": PARTITION_PREFIX + "%"},
+        ).scalars()
+        return sorted(day for day in map(partition_day, names) if day is not None)
+
+    def bind(self, value: datetime) -> str:
+        # The format SQLAlchemy stores DateTime values in, so text comparisons agree
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    def _create_table(self, conn: Connection, name: str):
+        conn.exec_driver_sql(f"CREATE TABLE {name} {_SQLITE_COLUMNS}")
+        _create_indexes(conn, name)
+
+    def create_default(self, conn: Connection):
+        conn.exec_driver_sql(f"CREATE TABLE {SQLITE_ID_SEQUENCE} (last_value INTEGER NOT NULL)")
+        conn.exec_driver_sql(f"INSERT INTO {SQLITE_ID_SEQUENCE} (last_value) VALUES (0)")
+        self._create_table(conn, DEFAULT_PARTITION)
+        self.partitions_changed(conn)
+
+    def create_partition(self, conn: Connection, day: date):
+        name = partition_name(day)
+        start, end = partition_bounds(day)
+        self._create_table(conn, name)
+        params = {"start": self.bind(start), "end": self.bind(end)}
+        where = "WHERE timestamp >= :start AND timestamp < :end"
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} {where}"), params)
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} {where}"), params)
+
+    def drop_partition(self, conn: Connection, day: date):
+        conn.exec_driver_sql(f"DROP TABLE {partition_name(day)}")
+
+    def partitions_changed(self, conn: Connection):
+        """Rebuild the user_activities view and its insert trigger over the current partitions."""
+        days = self.partitions(conn)
+        tables = [DEFAULT_PARTITION] + [partition_name(day) for day in days]
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS {TABLE}")
+        conn.exec_driver_sql(f"CREATE VIEW {TABLE} AS " + " UNION ALL ".join(f"SELECT * FROM {t}" for t in tables))
+
+        # Views have no column defaults, so the trigger fills in timestamp and id
+        stamp = "COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)"
+        values = ", ".join(
+            [f"COALESCE(NEW.id, (SELECT last_value FROM {SQLITE_ID_SEQUENCE}))", "NEW.user_id", stamp]
+            + [f"NEW.{column}" for column in COLUMNS[3:]]
+        )
+
+        def in_range(start: datetime, end: datetime) -> str:
+            return f"{stamp} >= '{self.bind(start)}' AND {stamp} < '{self.bind(end)}'"
+
+        routes = [(partition_name(day), in_range(*partition_bounds(day))) for day in days]
+        covered = " OR ".join(f"({in_range(start, end)})" for start, end in _merged_ranges(days))
+        routes.append((DEFAULT_PARTITION, f"NOT ({covered})" if covered else "1"))
+        inserts = "".join(
+            f"INSERT INTO {table} ({', '.join(COLUMNS)}) SELECT {values} WHERE {condition};\n"
+            for table, condition in routes
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER {TABLE}_insert INSTEAD OF INSERT ON {TABLE}\nBEGIN\n"
+            f"UPDATE {SQLITE_ID_SEQUENCE} SET last_value = "
+            f"CASE WHEN NEW.id IS NULL THEN last_value + 1 ELSE max(last_value, NEW.id) END;\n"
+            f"{inserts}END"
+        )
+
+    def hour(self, column):
+        return func.strftime(literal_column("'%Y-%m-%d %H:00:00.000000'"), column)
+
+    @contextmanager
+    def locked(self, engine: Engine) -> Iterator[Optional[Connection]]:
+        """A connection in an IMMEDIATE transaction, which keeps other writers out until it ends."""
+        with engine.connect() as conn:
+            # pysqlite doesn't open transactions for DDL by itself
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+
+def layout_for(bind: Any):
+    """The partition layout for an Engine or Connection's database."""
+    return PostgresLayout() if bind.dialect.name == "postgresql" else SQLiteLayout()
+
+
+def create_partitions(conn: Connection, layout: Any, first_day: date, last_day: date) -> List[date]:
+    """Create the missing daily partitions from ``first_day`` to ``last_day``, inclusive."""
+    existing = set(layout.partitions(conn))
+    created = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            layout.create_partition(conn, day)
+            created.append(day)
+        day += timedelta(days=1)
+    if created:
+        layout.partitions_changed(conn)
+    return created
+
+
+def drop_partitions_before(conn: Connection, layout: Any, cutoff: datetime) -> Tuple[List[date], int]:
+    """Drop partitions that end at or before ``cutoff`` and delete the default
+    partition's rows older than it. Returns the dropped days and deleted rows."""
+    dropped = [day for day in layout.partitions(conn) if partition_bounds(day)[1] <= cutoff]
+    for day in dropped:
+        layout.drop_partition(conn, day)
+    if dropped:
+        layout.partitions_changed(conn)
+    deleted = conn.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": layout.bind(cutoff)}
+    ).rowcount
+    return dropped, deleted
+
+
+def rollup_hourly(conn: Connection, layout: Any, since: datetime) -> int:
+    """Recompute user_activity_hourly from ``since`` (an hour boundary) on; returns rows written.
+
+    Hours are replaced as a whole, so reruns are idempotent and rows that
+    arrived late for an hour in the window are picked up.
+    """
+    hour = layout.hour(UserActivity.timestamp)
+    threshold = literal_column(repr(ANOMALY_SCORE_THRESHOLD))
+    aggregates = (
+        select(
+            UserActivity.user_id,
+            hour,
+            func.count(),
+            func.sum(case((UserActivity.anomaly_score > threshold, 1), else_=0)),
+            func.max(UserActivity.anomaly_score),
+            func.avg(UserActivity.anomaly_score),
+        )
+        .where(UserActivity.user_id.isnot(None), UserActivity.timestamp >= since)
+        .group_by(UserActivity.user_id, hour)
+    )
+    conn.execute(delete(UserActivityHourly).where(UserActivityHourly.hour >= since))
+    return conn.execute(insert(UserActivityHourly).from_select(
+        ["user_id", "hour", "activity_count", "anomaly_count", "max_anomaly_score", "mean_anomaly_score"],
+        aggregates,
+    )).rowcount
+
+
+class ActivityMaintenance:
+    """Periodically runs the partitions, retention and rollup steps.
+
+    A run is one transaction; steps are idempotent, so a failed run is
+    simply redone by the next one. With several workers, Postgres runs
+    are serialized by an advisory lock and a worker that doesn't get it
+    skips its run. Databases where user_activities isn't partitioned yet
+    (before migration 0003, or built with create_all) are left alone.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval_seconds: float = 900.0,
+        retention_days: int = 90,
+        partitions_ahead_days: int = 7,
+        rollup_lookback_hours: int = 48,
+        rollup_retention_days: int = 730,
+    ):
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self.retention_days = retention_days
+        self.partitions_ahead_days = partitions_ahead_days
+        self.rollup_lookback_hours = rollup_lookback_hours
+        self.rollup_retention_days = rollup_retention_days
+        self.last_run: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await self.run()
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.run_once)
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Run every step now; returns what happened."""
+        now = now or datetime.utcnow()
+        layout = layout_for(self.engine)
+        try:
+            with layout.locked(self.engine) as conn:
+                if conn is None:
+                    outcome = {"outcome": "skipped", "reason": "another worker is running maintenance"}
+                elif not layout.installed(conn):
+                    outcome = {"outcome": "skipped", "reason": f"{TABLE} is not partitioned"}
+                else:
+                    outcome = {"outcome": "ok", **self._steps(conn, layout, now)}
+        except Exception as e:
+            logger.exception("user_activities maintenance failed")
+            outcome = {"outcome": "error", "error": str(e)}
+        self.last_run = {"finished_at": time.time(), **outcome}
+        return outcome
+
+    def _steps(self, conn: Connection, layout: Any, now: datetime) -> Dict[str, Any]:
+        start = time.perf_counter()
+        today = now.date()
+        created = create_partitions(conn, layout, today, today + timedelta(days=self.partitions_ahead_days))
+        ACTIVITY_MAINTENANCE_SECONDS.labels("partitions").observe(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        dropped, deleted = drop_partitions_before(conn, layout, now - timedelta(days=self.retention_days))
+        expired_rollups = conn.execute(delete(UserActivityHourly).where(
+            UserActivityHourly.hour < now - timedelta(days=self.rollup_retention_days)
+        )).rowcount
+        ACTIVITY_MAINTENANCE_SECONDS.labels("retention").observe(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=self.rollup_lookback_hours)
+        rollup_rows = rollup_hourly(conn, layout, since)
+        ACTIVITY_MAINTENANCE_SECONDS.labels("rollup").observe(time.perf_counter() - start)
+
+        partitions = layout.partitions(conn)
+        ACTIVITY_PARTITIONS.set(len(partitions))
+        return {
+            "partitions": {
+                "count": len(partitions),
+                "first": partitions[0].isoformat() if partitions else None,
+                "last": partitions[-1].isoformat() if partitions else None,
+                "created": [day.isoformat() for day in created],
+                "dropped": [day.isoformat() for day in dropped],
+            },
+            "expired_default_rows": deleted,
+            "expired_rollup_rows": expired_rollups,
+            "rollup": {"since": since.isoformat(), "rows": rollup_rows},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "retention_days": self.retention_days,
+            "partitions_ahead_days": self.partitions_ahead_days,
+            "rollup_lookback_hours": self.rollup_lookback_hours,
+            "rollup_retention_days": self.rollup_retention_days,
+            "last_run": self.last_run,
+        }
+
+
+@lru_cache()
+def get_activity_maintenance() -> ActivityMaintenance:
+    settings = get_settings()
+    return ActivityMaintenance(
+        default_engine,
+        interval_seconds=settings.ACTIVITY_MAINTENANCE_INTERVAL_SECONDS,
+        retention_days=settings.ACTIVITY_RETENTION_DAYS,
+        partitions_ahead_days=settings.ACTIVITY_PARTITIONS_AHEAD_DAYS,
+        rollup_lookback_hours=settings.ACTIVITY_ROLLUP_LOOKBACK_HOURS,
+        rollup_retention_days=settings.ACTIVITY_ROLLUP_RETENTION_DAYS,
+    )
@@ -0,0 +1,64 @@
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from ...core.settings import get_settings
+from ...core.write_behind import WriteBehindQueue
+from ...database import SessionLocal
+from ...models.user_activity import ANOMALY_SCORE_THRESHOLD, UserActivity
+from .anomaly_detector import result_dicts
+from .feed_cache import get_feed_cache
+
+
+def activity_rows(user_id: Any, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """user_activities rows for every scored entry of a detection result.
+
+    Normal activity is stored along with the anomalies: it is what per-user
+    and population models are retrained on, and what the hourly rollups
+    count. Readers that only want anomalies filter on anomaly_score.
+    """
+    return [
+        {
+            "user_id": user_id,
+            "timestamp": datetime.fromisoformat(result["timestamp"]),
+            "anomaly_score": result["anomaly_score"],
+            "additional_data": result,
+        }
+        for result in results
+    ]
+
+
+def activity_column_rows(user_id: Any, timestamps: np.ndarray, results: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """activity_rows for columnar detection results (see AnomalyDetector.detect_anomaly_columns)."""
+    return activity_rows(user_id, result_dicts(timestamps, results))
+
+
+def insert_activities(session_factory: sessionmaker, rows: List[Dict[str, Any]]):
+    """One multi-row INSERT into user_activities, in its own transaction."""
+    with session_factory() as db:
+        db.execute(insert(UserActivity), rows)
+        db.commit()
+
+
+def invalidate_feeds(rows: List[Dict[str, Any]]):
+    """Drop cached recent-anomaly feeds of users who just got new anomalies."""
+    feed_cache = get_feed_cache()
+    for user_id in {row["user_id"] for row in rows if row["anomaly_score"] > ANOMALY_SCORE_THRESHOLD}:
+        feed_cache.invalidate_user(user_id)
+
+
+@lru_cache()
+def get_activity_writer() -> WriteBehindQueue:
+    settings = get_settings()
+    return WriteBehindQueue(
+        "user_activities",
+        partial(insert_activities, SessionLocal),
+        max_batch_size=settings.WRITE_BEHIND_MAX_BATCH_SIZE,
+        flush_interval_ms=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+        max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+        on_flush=invalidate_feeds,
+    )
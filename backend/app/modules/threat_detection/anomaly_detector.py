@@ -1,13 +1,131 @@
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from typing import List, Dict, Any
-import pandas as pd
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime, timezone
 import json
+import time
+
+from .compiled_forest import COMPILED_MAX_ROWS, CompiledForest
+from ...core.instrumentation import StageTimer
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_timer = StageTimer("threat")
+
+# Calibrated score of the fitted contamination threshold; the same value as
+# models.user_activity.ANOMALY_SCORE_THRESHOLD, which readers of stored
+# activities filter on (not imported, to keep the database out of this module)
+ANOMALY_SCORE_THRESHOLD = 0.8
+
+# Day 0 of the Unix epoch (1970-01-01) was a Thursday; Monday is 0
+_EPOCH_WEEKDAY = 3
+
+
+# Trailing UTC offset of an ISO-8601 timestamp ("Z", "+02:00", "-0500").
+# Stripped before bulk parsing so hour/weekday stay in the sender's wall-clock
+# time, matching what datetime.fromisoformat() gave us per row.
+_TZ_SUFFIX = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+def _clock_columns(timestamps) -> Tuple[np.ndarray, np.ndarray]:
+    """Hour of day and day of week (Monday = 0) of each timestamp, as float columns.
+
+    datetime64 arrays are split with integer arithmetic. Anything else
+    (ISO-8601 strings, datetimes) is parsed in bulk with pandas, ignoring
+    any UTC offset.
+    """
+    if isinstance(timestamps, np.ndarray) and np.issubdtype(timestamps.dtype, np.datetime64):
+        minutes = timestamps.astype('datetime64[m]').astype(np.int64)
+        hours = minutes // 60
+        return (hours % 24).astype(np.float64), ((hours // 24 + _EPOCH_WEEKDAY) % 7).astype(np.float64)
+
+    import pandas as pd
+
+    stamps = pd.Series(timestamps, dtype=object)
+    stamps = stamps.astype(str).str.replace(_TZ_SUFFIX, '', regex=True)
+    parsed = pd.to_datetime(stamps, format='ISO8601')
+    return parsed.dt.hour.to_numpy(dtype=np.float64), parsed.dt.dayofweek.to_numpy(dtype=np.float64)
+
+
+def _result_columns(features: np.ndarray, anomaly_scores: np.ndarray, is_anomaly: np.ndarray) -> Dict[str, np.ndarray]:
+    """Columnar counterpart of the result dicts, minus the echoed timestamp."""
+    int_columns = features[:, :3].astype(np.int64)
+    return {
+        "anomaly_score": anomaly_scores,
+        "is_anomaly": is_anomaly,
+        "hour_of_day": int_columns[:, 0],
+        "day_of_week": int_columns[:, 1],
+        "login_frequency": int_columns[:, 2],
+        "location_change": features[:, 3].astype(bool),
+        "browser_change": features[:, 4].astype(bool),
+    }
+
+
+def result_dicts(
+    timestamps: Sequence[Any], results: Dict[str, np.ndarray], rows: Optional[np.ndarray] = None
+) -> List[Dict[str, Any]]:
+    """Result dicts for (some ``rows`` of) a columnar result, as detect_anomalies returns them.
+
+    Timestamps are echoed as ISO-8601 strings: datetime64 arrays and
+    datetimes are formatted, strings passed through.
+    """
+    if isinstance(timestamps, np.ndarray) and np.issubdtype(timestamps.dtype, np.datetime64):
+        stamps = np.datetime_as_string(timestamps if rows is None else timestamps[rows], unit='us').tolist()
+    else:
+        selected = timestamps if rows is None else [timestamps[i] for i in rows.tolist()]
+        stamps = [stamp.isoformat() if isinstance(stamp, datetime) else str(stamp) for stamp in selected]
+    columns = (
+        results[column] if rows is None else results[column][rows]
+        for column in (
+            "anomaly_score", "is_anomaly", "hour_of_day", "day_of_week",
+            "login_frequency", "location_change", "browser_change",
+        )
+    )
+    return [
+        {
+            "timestamp": stamp,
+            "anomaly_score": score,
+            "is_anomaly": flagged,
+            "features": {
+                "hour_of_day": hour,
+                "day_of_week": weekday,
+                "login_frequency": logins,
+                "location_change": location,
+                "browser_change": browser
+            }
+        }
+        for stamp, score, flagged, hour, weekday, logins, location, browser in zip(
+            stamps, *(column.tolist() for column in columns)
+        )
+    ]
+
+
+def calibrated_scores(scores: np.ndarray, offset: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Map IsolationForest ``score_samples`` output to anomaly scores in [0, 1].
+
+    The Isolation Forest paper score (``-scores``, in (0, 1]) is rescaled
+    piecewise-linearly so the threshold fitted from the contamination
+    (``-offset``) lands on ANOMALY_SCORE_THRESHOLD: rows the model flags
+    score above it, all others at or below. A score depends only on its
+    own row, never on the rest of the batch, so stored scores from any
+    endpoint are comparable and readers can filter on the threshold.
+    """
+    paper = -scores
+    threshold = -offset
+    anomaly_scores = np.where(
+        paper <= threshold,
+        ANOMALY_SCORE_THRESHOLD * paper / threshold,
+        ANOMALY_SCORE_THRESHOLD + (1 - ANOMALY_SCORE_THRESHOLD) * (paper - threshold) / max(1 - threshold, 1e-12),
+    )
+    anomaly_scores = np.clip(anomaly_scores, 0.0, 1.0)
+    return anomaly_scores, scores < offset
 
 
 class AnomalyDetector:
     def __init__(self, contamination: float = 0.1):
+        # sklearn and pandas are imported on first use, not when the API boots
+        from sklearn.ensemble import IsolationForest
+
         self.model = IsolationForest(
             contamination=contamination,
             random_state=42,
@@ -20,65 +138,115 @@ class AnomalyDetector:
             'location_change',
             'browser_change'
         ]
+        self._compiled = None
+
+    def _feature_matrix(self, activities: List[Dict[str, Any]]) -> np.ndarray:
+        """Build the (n_samples, n_features) matrix for a batch of activities.
+
+        Timestamps are parsed in bulk to datetime64 and every feature is
+        computed as a NumPy column, so the per-row Python work is limited to
+        pulling the raw values out of the activity dicts.
+        """
+        n = len(activities)
+        features = np.empty((n, len(self.feature_columns)), dtype=np.float64)
+        features[:, 0], features[:, 1] = _clock_columns([activity['timestamp'] for activity in activities])
+        features[:, 2] = np.fromiter(
+            (activity.get('login_count', 0) for activity in activities), dtype=np.float64, count=n
+        )
+        features[:, 3] = np.fromiter(
+            (bool(activity.get('location_changed', False)) for activity in activities), dtype=np.float64, count=n
+        )
+        features[:, 4] = np.fromiter(
+            (bool(activity.get('browser_changed', False)) for activity in activities), dtype=np.float64, count=n
+        )
+        return features
+
+    def column_feature_matrix(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """The feature matrix of a columnar batch (see app.core.columnar).
+
+        Takes the same fields as the activity dicts, one array each;
+        ``timestamp`` is required (datetime64, or ISO-8601 strings), the
+        others default to 0 / False.
+        """
+        if 'timestamp' not in columns:
+            raise ValueError("Missing required column: timestamp")
+        n = len(columns['timestamp'])
+        features = np.zeros((n, len(self.feature_columns)), dtype=np.float64)
+        features[:, 0], features[:, 1] = _clock_columns(columns['timestamp'])
+        for i, column in ((2, 'login_count'), (3, 'location_changed'), (4, 'browser_changed')):
+            if column in columns:
+                values = np.asarray(columns[column])
+                features[:, i] = values.astype(bool) if i > 2 else values
+        return features
 
-    def _preprocess_data(self, activities: List[Dict[str, Any]]) -> pd.DataFrame:
+    def _preprocess_data(self, activities: List[Dict[str, Any]]) -> "pd.DataFrame":
         """Preprocess user activities into features for anomaly detection."""
-        records = []
-        
-        for activity in activities:
-            timestamp = activity['timestamp']
-            if isinstance(timestamp, str):
-                timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            
-            record = {
-                'hour_of_day': timestamp.hour,
-                'day_of_week': timestamp.weekday(),
-                'login_frequency': activity.get('login_count', 0),
-                'location_change': 1 if activity.get('location_changed', False) else 0,
-                'browser_change': 1 if activity.get('browser_changed', False) else 0
-            }
-            records.append(record)
-        
-        return pd.DataFrame(records)
+        import pandas as pd
+
+        return pd.DataFrame(self._feature_matrix(activities), columns=self.feature_columns)
 
     def train(self, historical_data: List[Dict[str, Any]]):
         """Train the anomaly detection model on historical data."""
         if not historical_data:
             raise ValueError("No historical data provided for training")
-        
-        df = self._preprocess_data(historical_data)
-        self.model.fit(df[self.feature_columns])
+
+        self.model.fit(self._feature_matrix(historical_data))
+        self._compiled = CompiledForest.from_sklearn(self.model)
+
+    def _score_samples(self, features: np.ndarray) -> np.ndarray:
+        """model.score_samples, through the compiled forest for small batches."""
+        if len(features) > COMPILED_MAX_ROWS:
+            return self.model.score_samples(features)
+        # Detectors pickled before the compiled scorer existed don't carry one
+        if getattr(self, '_compiled', None) is None:
+            self._compiled = CompiledForest.from_sklearn(self.model)
+        return self._compiled.score_samples(features)
 
     def detect_anomalies(self, activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Detect anomalies in user activities."""
-        df = self._preprocess_data(activities)
-        
-        # Get anomaly scores (-1 for anomalies, 1 for normal)
-        scores = self.model.score_samples(df[self.feature_columns])
-        
-        # Convert scores to probability-like values between 0 and 1
-        normalized_scores = (scores - scores.min()) / (scores.max() - scores.min())
-        
-        results = []
-        for idx, activity in enumerate(activities):
-            anomaly_score = 1 - normalized_scores[idx]  # Invert so higher score = more anomalous
-            
-            result = {
-                "timestamp": activity["timestamp"].isoformat() if isinstance(activity["timestamp"], datetime) else activity["timestamp"],
-                "anomaly_score": float(anomaly_score),
-                "is_anomaly": bool(anomaly_score > 0.8),  # Threshold for anomaly detection
-                "features": {
-                    "hour_of_day": int(df.iloc[idx]["hour_of_day"]),
-                    "day_of_week": int(df.iloc[idx]["day_of_week"]),
-                    "login_frequency": int(df.iloc[idx]["login_frequency"]),
-                    "location_change": bool(df.iloc[idx]["location_change"]),
-                    "browser_change": bool(df.iloc[idx]["browser_change"])
-                }
-            }
-            results.append(result)
-        
+        if not activities:
+            return []
+
+        start = time.perf_counter()
+        features = self._feature_matrix(activities)
+        featurized = time.perf_counter()
+
+        anomaly_scores, is_anomaly = self._calibrated_scores(features)
+        scored = time.perf_counter()
+
+        results = result_dicts(
+            [activity["timestamp"] for activity in activities],
+            _result_columns(features, anomaly_scores, is_anomaly),
+        )
+        self._observe(len(activities), start, featurized, scored)
         return results
 
+    def _calibrated_scores(self, features: np.ndarray):
+        """Per-row anomaly scores in [0, 1] (see calibrated_scores), and flags."""
+        return calibrated_scores(self._score_samples(features), self.model.offset_)
+
+    def detect_anomaly_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """detect_anomalies for a columnar batch, with results as columns in input order."""
+        n = len(columns.get('timestamp', ()))
+        if n == 0:
+            return _result_columns(np.empty((0, len(self.feature_columns))), np.empty(0), np.empty(0, dtype=bool))
+
+        start = time.perf_counter()
+        features = self.column_feature_matrix(columns)
+        featurized = time.perf_counter()
+        anomaly_scores, is_anomaly = self._calibrated_scores(features)
+        scored = time.perf_counter()
+        results = _result_columns(features, anomaly_scores, is_anomaly)
+        self._observe(n, start, featurized, scored)
+        return results
+
+    @staticmethod
+    def _observe(rows: int, start: float, featurized: float, scored: float):
+        _timer.rows(rows)
+        _timer.observe("features", featurized - start)
+        _timer.observe("score", scored - featurized)
+        _timer.observe("results", time.perf_counter() - scored)
+
 
 # Example usage with mock data
 def generate_mock_data(n_samples: int = 100) -> List[Dict[str, Any]]:
@@ -0,0 +1,103 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, literal_column, select, tuple_
+from sqlalchemy.orm import Session
+
+from ...models.user_activity import ANOMALY_SCORE_THRESHOLD, UserActivity, UserActivityHourly
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp: datetime, activity_id: int) -> str:
+    """Opaque cursor pointing just past (timestamp, id) in newest-first order."""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{activity_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, activity_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(activity_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def recent_anomalies_query(
+    user_id: int,
+    since: datetime,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Select:
+    """Newest-first anomalies for a user, shaped to use ix_user_activities_recent_anomalies.
+
+    Pages are keyset-based: the cursor carries the last row's (timestamp, id)
+    and the next page starts strictly after it, so no page costs more than
+    ``limit`` index entries however deep the client scrolls.
+    """
+    # The threshold is inlined rather than bound: the planner can only match
+    # the partial index's WHERE clause against a literal
+    threshold = literal_column(repr(ANOMALY_SCORE_THRESHOLD))
+    query = (
+        select(UserActivity.id, UserActivity.timestamp, UserActivity.anomaly_score, UserActivity.additional_data)
+        .where(
+            UserActivity.user_id == user_id,
+            UserActivity.anomaly_score > threshold,
+            UserActivity.timestamp >= since,
+        )
+        .order_by(UserActivity.timestamp.desc(), UserActivity.id.desc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        query = query.where(tuple_(UserActivity.timestamp, UserActivity.id) < tuple_(*decode_cursor(cursor)))
+    return query
+
+
+def get_recent_anomalies(
+    db: Session,
+    user_id: int,
+    days: int = 7,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of a user's anomalies from the last ``days`` days, and the next page's cursor."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    since = datetime.utcnow() - timedelta(days=days)
+    # One extra row tells us whether there is a next page
+    rows = db.execute(recent_anomalies_query(user_id, since, limit + 1, cursor)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+    return [
+        {
+            "timestamp": row.timestamp,
+            "anomaly_score": row.anomaly_score,
+            "details": row.additional_data,
+        }
+        for row in rows
+    ], next_cursor
+
+
+def get_activity_trend(db: Session, user_id: int, hours: int = 24 * 7) -> List[Dict[str, Any]]:
+    """A user's hourly rollups for the last ``hours`` hours (the current one included), oldest first.
+
+    Reads user_activity_hourly only, never the raw activities. Hours
+    without activity have no row.
+    """
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    rows = db.execute(
+        select(
+            UserActivityHourly.hour,
+            UserActivityHourly.activity_count,
+            UserActivityHourly.anomaly_count,
+            UserActivityHourly.max_anomaly_score,
+            UserActivityHourly.mean_anomaly_score,
+        )
+        .where(UserActivityHourly.user_id == user_id, UserActivityHourly.hour >= since)
+        .order_by(UserActivityHourly.hour)
+    )
+    return [row._asdict() for row in rows]
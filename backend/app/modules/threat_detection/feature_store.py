@@ -0,0 +1,336 @@
+import ipaddress
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ...core.executor import get_inference_executor
+from ...core.metrics import FEATURE_STORE_USERS
+from ...core.settings import get_settings
+from ...models.user import User
+
+SeedLoader = Callable[[], Optional[Dict[str, Any]]]
+
+# Location fields that name a place; coordinates alone jitter too much to compare
+_PLACE_FIELDS = ("country", "region", "city")
+
+# Kinds of browser key, as bits of UserFeatures.browser_kinds
+_FINGERPRINT = 1
+_USER_AGENT = 2
+
+
+def _epoch_seconds(timestamp) -> float:
+    """Seconds since the epoch of an activity timestamp; naive ones count as UTC."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    elif isinstance(timestamp, np.datetime64):
+        return timestamp.astype("datetime64[us]").astype(np.int64) / 1e6
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _location_key(location) -> Optional[int]:
+    if isinstance(location, dict):
+        place = tuple(location.get(field) for field in _PLACE_FIELDS)
+        return hash(place) if any(place) else None
+    return hash(location) if isinstance(location, str) and location else None
+
+
+def _network_key(ip_address: Optional[str]) -> Optional[int]:
+    """The /24 (IPv4) or /48 (IPv6) an address is in, so DHCP churn isn't a move."""
+    if not ip_address or not isinstance(ip_address, str):
+        return None
+    if ":" not in ip_address:
+        return hash(ip_address.rpartition(".")[0])
+    try:
+        return hash(ipaddress.ip_network(f"{ip_address}/48", strict=False))
+    except ValueError:
+        return hash(ip_address)
+
+
+class UserFeatures:
+    """Behavioral state of one user: logins in a rolling window, last place
+    and network seen, and the most recently seen browsers.
+
+    Logins are counted in ``len(login_buckets)`` fixed buckets covering the
+    window (a ring indexed by absolute bucket number), so counting a login
+    and reading the windowed count are O(1) in the number of logins.
+    Browsers are kept as hashes of the fingerprint (or user agent), most
+    recent first.
+    """
+
+    __slots__ = ("login_buckets", "head", "logins", "location", "network", "browsers", "browser_kinds")
+
+    def __init__(self, buckets: int):
+        self.login_buckets = [0] * buckets
+        self.head: Optional[int] = None
+        self.logins = 0
+        self.location: Optional[int] = None
+        self.network: Optional[int] = None
+        self.browsers: List[int] = []
+        self.browser_kinds = 0
+
+    def advance(self, bucket: int):
+        """Move the window so it ends at ``bucket``, expiring older buckets."""
+        if self.head is not None and bucket <= self.head:
+            return
+        n = len(self.login_buckets)
+        if self.head is None or bucket - self.head >= n:
+            self.login_buckets = [0] * n
+            self.logins = 0
+        else:
+            for b in range(self.head + 1, bucket + 1):
+                self.logins -= self.login_buckets[b % n]
+                self.login_buckets[b % n] = 0
+        self.head = bucket
+
+    def add_login(self, bucket: int):
+        self.advance(bucket)
+        # Logins older than the window (out-of-order events) aren't counted
+        if bucket > self.head - len(self.login_buckets):
+            self.login_buckets[bucket % len(self.login_buckets)] += 1
+            self.logins += 1
+
+    def move_to(self, location: Optional[int], network: Optional[int]) -> Optional[bool]:
+        """Record where an activity came from; whether that is a move, or None if unknown."""
+        changed = None
+        if location is not None:
+            changed = self.location is not None and location != self.location
+            self.location = location
+        if network is not None:
+            if changed is None:
+                changed = self.network is not None and network != self.network
+            self.network = network
+        return changed
+
+    def use_browser(self, key: Optional[int], kind: int, max_browsers: int) -> Optional[bool]:
+        """Record the browser of an activity; whether it is a new one, or None if unknown."""
+        if key is None:
+            return None
+        # Only compared against browsers known by the same kind of key
+        changed = bool(self.browser_kinds & kind) and key not in self.browsers
+        if self.browsers and self.browsers[0] == key:
+            return changed
+        if key in self.browsers:
+            self.browsers.remove(key)
+        self.browsers.insert(0, key)
+        del self.browsers[max_browsers:]
+        self.browser_kinds |= kind
+        return changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "logins_in_window": self.logins,
+            "known_location": self.location is not None,
+            "known_network": self.network is not None,
+            "known_browsers": len(self.browsers),
+        }
+
+
+def _browser(fingerprint: Optional[str], user_agent: Optional[str]):
+    if fingerprint:
+        return hash((_FINGERPRINT, fingerprint)), _FINGERPRINT
+    if user_agent:
+        return hash((_USER_AGENT, user_agent)), _USER_AGENT
+    return None, 0
+
+
+class UserFeatureStore:
+    """Per-user behavioral features for the anomaly detectors, kept incrementally.
+
+    ``featurize`` folds each activity into its user's state and sets the
+    detector inputs from it, instead of taking them from the client:
+
+      login_count       logins (activities without an ``activity_type``, or
+                        of type "login") in the trailing ``login_window_seconds``,
+                        this one included, to a resolution of one bucket
+      location_changed  the ``location`` (country/region/city) differs from
+                        the last one seen; without one, the ``ip_address`` is
+                        in another network than the last one
+      browser_changed   the ``browser_fingerprint`` (else ``user_agent``) is
+                        none of the last ``max_browsers`` seen
+
+    A flag whose raw fields an activity doesn't carry keeps the client's
+    value. A user's state is seeded once, when first seen, from ``seed``
+    (their last IP and user agent on record) and then only updated in
+    memory, so scoring never re-reads history. The store holds at most
+    ``max_users`` users and drops the least recently seen beyond that.
+
+    State is per process: with several workers, each counts only the logins
+    it scored.
+    """
+
+    def __init__(
+        self,
+        login_window_seconds: float = 24 * 3600.0,
+        login_buckets: int = 24,
+        max_browsers: int = 8,
+        max_users: int = 100000,
+    ):
+        self.login_window_seconds = login_window_seconds
+        self.bucket_seconds = login_window_seconds / login_buckets
+        self.login_buckets = login_buckets
+        self.max_browsers = max_browsers
+        self.max_users = max_users
+        self._users: "OrderedDict[Any, UserFeatures]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"activities": 0, "seeded": 0, "evictions": 0}
+
+    def get(self, user_id: Any) -> Optional[UserFeatures]:
+        with self._lock:
+            return self._users.get(user_id)
+
+    def featurize(self, user_id: Any, activities: List[Dict[str, Any]], seed: Optional[SeedLoader] = None) -> List[Dict[str, Any]]:
+        """Set login_count, location_changed and browser_changed of ``activities`` in place."""
+        if not activities:
+            return activities
+        state = self._state(user_id, seed)
+        with self._lock:
+            for activity in activities:
+                login_count, location_changed, browser_changed = self._observe(
+                    state,
+                    activity["timestamp"],
+                    activity.get("activity_type"),
+                    activity.get("location"),
+                    activity.get("ip_address"),
+                    activity.get("browser_fingerprint"),
+                    activity.get("user_agent"),
+                )
+                activity["login_count"] = login_count
+                if location_changed is not None:
+                    activity["location_changed"] = location_changed
+                if browser_changed is not None:
+                    activity["browser_changed"] = browser_changed
+            self._counters["activities"] += len(activities)
+        return activities
+
+    def featurize_columns(self, user_id: Any, columns: Dict[str, np.ndarray], seed: Optional[SeedLoader] = None) -> Dict[str, np.ndarray]:
+        """``featurize`` for a columnar batch; returns the columns with the three features replaced."""
+        n = len(columns["timestamp"])
+        if n == 0:
+            return columns
+        state = self._state(user_id, seed)
+        missing = [None] * n
+
+        def values(name: str):
+            return columns[name].tolist() if name in columns else missing
+
+        login_count = np.empty(n, dtype=np.int64)
+        location_changed = np.asarray(columns.get("location_changed", np.zeros(n)), dtype=bool).copy()
+        browser_changed = np.asarray(columns.get("browser_changed", np.zeros(n)), dtype=bool).copy()
+        timestamps = columns["timestamp"]
+        rows = zip(
+            timestamps if np.issubdtype(timestamps.dtype, np.datetime64) else timestamps.tolist(),
+            values("activity_type"), values("location"), values("ip_address"),
+            values("browser_fingerprint"), values("user_agent"),
+        )
+        with self._lock:
+            for i, row in enumerate(rows):
+                logins, moved, new_browser = self._observe(state, *row)
+                login_count[i] = logins
+                if moved is not None:
+                    location_changed[i] = moved
+                if new_browser is not None:
+                    browser_changed[i] = new_browser
+            self._counters["activities"] += n
+        return {
+            **columns,
+            "login_count": login_count,
+            "location_changed": location_changed,
+            "browser_changed": browser_changed,
+        }
+
+    def _observe(self, state: UserFeatures, timestamp, activity_type, location, ip_address, fingerprint, user_agent):
+        bucket = int(_epoch_seconds(timestamp) // self.bucket_seconds)
+        if activity_type in (None, "login"):
+            state.add_login(bucket)
+        else:
+            state.advance(bucket)
+        moved = state.move_to(_location_key(location), _network_key(ip_address))
+        new_browser = state.use_browser(*_browser(fingerprint, user_agent), self.max_browsers)
+        return state.logins, moved, new_browser
+
+    def _state(self, user_id: Any, seed: Optional[SeedLoader]) -> UserFeatures:
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is not None:
+                self._users.move_to_end(user_id)
+                return state
+        # Loaded outside the lock; if two requests race, one seed is dropped
+        seeded = seed() if seed is not None else None
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is not None:
+                return state
+            state = self._users[user_id] = UserFeatures(self.login_buckets)
+            if seeded:
+                state.move_to(None, _network_key(seeded.get("ip_address")))
+                state.use_browser(*_browser(None, seeded.get("user_agent")), self.max_browsers)
+                self._counters["seeded"] += 1
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self._counters["evictions"] += 1
+            FEATURE_STORE_USERS.set(len(self._users))
+            return state
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "login_window_seconds": self.login_window_seconds,
+                "login_buckets": self.login_buckets,
+                "max_browsers": self.max_browsers,
+                **self._counters,
+            }
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+def load_feature_seed(db: Session, user_id: Any) -> Optional[Dict[str, Any]]:
+    """Last IP and user agent on record for a user, to seed their feature state."""
+    row = db.execute(select(User.last_ip, User.user_agent).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    return {"ip_address": row.last_ip, "user_agent": row.user_agent}
+
+
+@lru_cache()
+def get_feature_store() -> Optional[UserFeatureStore]:
+    """The process-wide feature store, or None when FEATURE_STORE_ENABLED is off."""
+    settings = get_settings()
+    if not settings.FEATURE_STORE_ENABLED:
+        return None
+    return UserFeatureStore(
+        login_window_seconds=settings.FEATURE_STORE_LOGIN_WINDOW_SECONDS,
+        login_buckets=settings.FEATURE_STORE_LOGIN_BUCKETS,
+        max_browsers=settings.FEATURE_STORE_MAX_BROWSERS,
+        max_users=settings.FEATURE_STORE_MAX_USERS,
+    )
+
+
+async def featurize(db: Session, user_id: Any, activities: List[Dict[str, Any]]):
+    """Replace client-supplied behavioral features with the feature store's, in place."""
+    feature_store = get_feature_store()
+    if feature_store is None or user_id is None:
+        return
+    await get_inference_executor().run(
+        "threat", feature_store.featurize, user_id, activities, partial(load_feature_seed, db, user_id), local=True
+    )
+
+
+async def featurize_columns(db: Session, user_id: Any, columns: Dict[str, Any]) -> Dict[str, Any]:
+    """featurize for a columnar batch."""
+    feature_store = get_feature_store()
+    if feature_store is None or user_id is None:
+        return columns
+    return await get_inference_executor().run(
+        "threat", feature_store.featurize_columns, user_id, columns, partial(load_feature_seed, db, user_id), local=True
+    )
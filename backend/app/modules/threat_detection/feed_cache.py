@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ...core.instrumentation import StageTimer
+from ...core.metrics import FEED_CACHE_REQUESTS
+from ...core.settings import get_settings
+
+FeedKey = Tuple[Any, int, Optional[str]]  # (user_id, limit, cursor)
+
+_timer = StageTimer("anomaly_feed", stages=("serialize",))
+
+
+def _user_key(user_id: Any) -> Any:
+    """user_id as stored (an int), however the caller got it (e.g. "42" from JSON)."""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return user_id
+
+
+class CachedFeed:
+    __slots__ = ("body", "etag", "next_cursor", "expires_at")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str], expires_at: float):
+        self.body = body
+        # Weak: equal JSON, not necessarily byte-equal after compression
+        self.etag = 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+        self.next_cursor = next_cursor
+        self.expires_at = expires_at
+
+
+class FeedCache:
+    """Read-through cache of serialized recent-anomaly feeds.
+
+    Entries are keyed by (user_id, limit, cursor) and hold the JSON body
+    already rendered, its ETag and the next-page cursor. They expire after
+    ``ttl_seconds`` and the least recently used are evicted beyond
+    ``max_entries``. ``invalidate_user`` drops every page of a user's feed;
+    the write-behind writer calls it once new anomalies for that user are in
+    the database. User ids are keyed as ints, so "42" from a JSON body and
+    42 from a route parameter are the same user.
+
+    The cache is per process, so with several workers invalidation only
+    reaches the worker that persisted the rows; the TTL bounds how stale
+    another worker's copy can be.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[FeedKey, CachedFeed]" = OrderedDict()
+        self._keys_by_user: Dict[Any, Set[FeedKey]] = {}
+        # Loads in flight per user, and a counter bumped when such a user is
+        # invalidated so the racing load isn't cached. Both only hold users
+        # with a load in flight.
+        self._loading: Dict[Any, int] = {}
+        self._generations: Dict[Any, int] = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: FeedKey) -> Optional[CachedFeed]:
+        key = (_user_key(key[0]),) + tuple(key[1:])
+        feed = self._entries.get(key)
+        if feed is None:
+            return None
+        if feed.expires_at <= time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return feed
+
+    async def get_or_load(self, key: FeedKey, loader: Callable[[], Tuple[Any, Optional[str]]]) -> CachedFeed:
+        """The cached feed for ``key``, calling ``loader() -> (items, next_cursor)`` on a miss.
+
+        ``loader`` is a blocking database query, so it runs in a worker thread.
+        """
+        feed = self.get(key)
+        if feed is not None:
+            FEED_CACHE_REQUESTS.labels("hit").inc()
+            return feed
+
+        FEED_CACHE_REQUESTS.labels("miss").inc()
+        key = (_user_key(key[0]),) + tuple(key[1:])
+        user_id = key[0]
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        generation = self._generations.get(user_id, 0)
+        try:
+            items, next_cursor = await asyncio.to_thread(loader)
+            current = self._generations.get(user_id, 0)
+        finally:
+            self._loading[user_id] -= 1
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+                self._generations.pop(user_id, None)
+        start = time.perf_counter()
+        body = JSONResponse(jsonable_encoder(items)).body
+        _timer.observe("serialize", time.perf_counter() - start)
+        feed = CachedFeed(body, next_cursor, time.monotonic() + self.ttl_seconds)
+        if current == generation:
+            self._put(key, feed)
+        return feed
+
+    def _put(self, key: FeedKey, feed: CachedFeed):
+        self._entries[key] = feed
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key: FeedKey):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def invalidate_user(self, user_id: Any):
+        user_id = _user_key(user_id)
+        if user_id in self._loading:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._discard(key)
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "users": len(self._keys_by_user),
+            "loading_users": len(self._loading),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def feed_response(request: Request, feed: CachedFeed) -> Response:
+    """200 with the cached body, or 304 if the client already has this version."""
+    headers = {"ETag": feed.etag, "Cache-Control": "private, no-cache"}
+    if feed.next_cursor:
+        headers["X-Next-Cursor"] = feed.next_cursor
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and feed.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        FEED_CACHE_REQUESTS.labels("not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed.body, media_type="application/json", headers=headers)
+
+
+@lru_cache()
+def get_feed_cache() -> FeedCache:
+    settings = get_settings()
+    return FeedCache(
+        ttl_seconds=settings.FEED_CACHE_TTL_SECONDS,
+        max_entries=settings.FEED_CACHE_MAX_ENTRIES,
+    )
@@ -0,0 +1,358 @@
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from .anomaly_detector import AnomalyDetector, generate_mock_data
+from ..model_store.artifact_store import LazyArtifact, RetrainableArtifact, get_model_store
+from ...core.metrics import MODEL_LOAD_SECONDS
+from ...core.retraining import reservoir_sample
+from ...core.settings import get_settings
+from ...models.user_activity import UserActivity
+
+logger = logging.getLogger(__name__)
+
+HistoryLoader = Callable[[], List[Dict[str, Any]]]
+
+POPULATION_ARTIFACT = "threat_population"
+
+
+class _Entry:
+    __slots__ = ("detector", "nbytes", "checked_at")
+
+    def __init__(self, detector: Optional[AnomalyDetector], nbytes: int):
+        # detector is None when the user has too little history of their own
+        # and is scored against the population model.
+        self.detector = detector
+        self.nbytes = nbytes
+        self.checked_at = time.monotonic()
+
+
+class ModelRegistry:
+    """Per-user AnomalyDetector models with LRU eviction under a memory budget.
+
+    Models are trained lazily from the user's own activity history the first
+    time they are requested. Users without enough history fall back to the
+    population model and are re-checked after ``recheck_seconds``. When the
+    resident models exceed ``max_bytes`` or ``max_models`` the least recently
+    used ones are evicted, and spilled to ``spill_dir`` (if set) so a later
+    request can reload them instead of retraining. At most ``max_spilled``
+    models are kept there, the oldest spills deleted first, and a spilled
+    model's file is deleted once it is loaded back.
+
+    Concurrent misses for the same user are single-flight: one request
+    loads or trains the model and the others wait for it.
+
+    ``population`` is replaced wholesale by background retraining and read
+    afresh on every ``get``. Given as a RetrainableArtifact, it also follows
+    newly published versions of the stored population model.
+    """
+
+    def __init__(
+        self,
+        population: Union[AnomalyDetector, RetrainableArtifact],
+        max_bytes: int = 256 * 1024 * 1024,
+        max_models: int = 10000,
+        spill_dir: Optional[str] = None,
+        max_spilled: int = 100000,
+        min_samples: int = 50,
+        recheck_seconds: float = 3600.0,
+    ):
+        self._population = population
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_spilled = max_spilled
+        self.min_samples = min_samples
+        self.recheck_seconds = recheck_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Users whose model is being loaded or trained, and the event set when it's in
+        self._loading: Dict[str, threading.Event] = {}
+        # Spill file names, oldest spill first
+        self._spilled: "OrderedDict[str, None]" = OrderedDict()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "spills": 0,
+            "spill_loads": 0,
+            "spill_deletes": 0,
+            "trained": 0,
+            "fallbacks": 0,
+        }
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            # Spills of an earlier process count against the bound too
+            for path in sorted(self.spill_dir.glob("user_*.joblib"), key=lambda p: p.stat().st_mtime):
+                self._spilled[path.name] = None
+            self._prune_spilled()
+
+    @property
+    def population(self) -> AnomalyDetector:
+        population = self._population
+        return population.get() if isinstance(population, RetrainableArtifact) else population
+
+    @population.setter
+    def population(self, detector: AnomalyDetector):
+        if isinstance(self._population, RetrainableArtifact):
+            self._population.swap(detector)
+        else:
+            self._population = detector
+
+    def get(self, user_id: Any, history_loader: HistoryLoader) -> AnomalyDetector:
+        """Return the model to score ``user_id`` with, training it if needed."""
+        if user_id is None:
+            return self.population
+
+        key = str(user_id)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and (
+                    entry.detector is not None
+                    or time.monotonic() - entry.checked_at < self.recheck_seconds
+                ):
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry.detector or self.population
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._counters["misses"] += 1
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another request is loading this user's model; use theirs
+            loading.wait()
+
+        try:
+            return self._load(key, history_loader)
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def _load(self, key: str, history_loader: HistoryLoader) -> AnomalyDetector:
+        # Load or train outside the lock so one slow user doesn't stall the rest.
+        start = time.perf_counter()
+        detector = self._load_spilled(key)
+        if detector is not None:
+            MODEL_LOAD_SECONDS.labels("threat_user", "spill").observe(time.perf_counter() - start)
+        else:
+            detector = self._train(key, history_loader)
+            MODEL_LOAD_SECONDS.labels("threat_user", "trained").observe(time.perf_counter() - start)
+
+        entry = _Entry(detector, self._estimate_nbytes(detector) if detector else 0)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            evicted = self._evict_locked()
+
+        for evicted_key, evicted_entry in evicted:
+            self._spill(evicted_key, evicted_entry)
+
+        return detector or self.population
+
+    def invalidate(self, user_id: Any):
+        """Drop a user's resident and spilled model so it is retrained on next use."""
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+        path = self._spill_path(key)
+        if path is not None:
+            self._delete_spilled(path)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "resident_models": sum(1 for e in self._entries.values() if e.detector is not None),
+                "resident_fallbacks": sum(1 for e in self._entries.values() if e.detector is None),
+                "resident_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_models": self.max_models,
+                "spilled_models": len(self._spilled),
+                "max_spilled": self.max_spilled,
+            }
+
+    def _train(self, key: str, history_loader: HistoryLoader) -> Optional[AnomalyDetector]:
+        try:
+            history = history_loader()
+        except Exception:
+            logger.exception("Could not load activity history for user %s", key)
+            history = []
+
+        if len(history) < self.min_samples:
+            with self._lock:
+                self._counters["fallbacks"] += 1
+            return None
+
+        detector = AnomalyDetector()
+        detector.train(history)
+        with self._lock:
+            self._counters["trained"] += 1
+        return detector
+
+    def _evict_locked(self) -> List[tuple]:
+        evicted = []
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_models
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self._counters["evictions"] += 1
+            evicted.append((key, entry))
+        return evicted
+
+    def _spill_path(self, key: str) -> Optional[Path]:
+        if self.spill_dir is None:
+            return None
+        # user ids come from request payloads, never use them as file names directly
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.spill_dir / f"user_{digest}.joblib"
+
+    def _spill(self, key: str, entry: _Entry):
+        path = self._spill_path(key)
+        if path is None or entry.detector is None:
+            return
+        try:
+            import joblib
+
+            joblib.dump(entry.detector, path)
+        except Exception:
+            logger.exception("Could not spill model for user %s", key)
+            return
+        with self._lock:
+            self._counters["spills"] += 1
+            self._spilled.pop(path.name, None)
+            self._spilled[path.name] = None
+        self._prune_spilled()
+
+    def _prune_spilled(self):
+        """Delete the oldest spilled models beyond ``max_spilled``."""
+        while True:
+            with self._lock:
+                if len(self._spilled) <= self.max_spilled:
+                    return
+                name, _ = self._spilled.popitem(last=False)
+                self._counters["spill_deletes"] += 1
+            (self.spill_dir / name).unlink(missing_ok=True)
+
+    def _delete_spilled(self, path: Path):
+        with self._lock:
+            self._spilled.pop(path.name, None)
+        path.unlink(missing_ok=True)
+
+    def _load_spilled(self, key: str) -> Optional[AnomalyDetector]:
+        path = self._spill_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            import joblib
+
+            detector = joblib.load(path)
+        except Exception:
+            logger.exception("Could not load spilled model for user %s", key)
+            self._delete_spilled(path)
+            return None
+        with self._lock:
+            self._counters["spill_loads"] += 1
+        # Resident again; it is spilled anew if evicted again
+        self._delete_spilled(path)
+        return detector
+
+    @staticmethod
+    def _estimate_nbytes(detector: AnomalyDetector) -> int:
+        return len(pickle.dumps(detector, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _history_entry(timestamp, additional_data) -> Dict[str, Any]:
+    features = (additional_data or {}).get("features", {})
+    return {
+        "timestamp": timestamp,
+        "login_count": features.get("login_frequency", 0),
+        "location_changed": features.get("location_change", False),
+        "browser_changed": features.get("browser_change", False),
+    }
+
+
+def load_user_history(db: Session, user_id: Any, limit: int = 5000) -> List[Dict[str, Any]]:
+    """Rebuild detector input from a user's most recent stored activities.
+
+    Every scored activity is stored (see activity_writer.activity_rows), so
+    this is the user's normal behavior with its occasional anomalies, which
+    is what the model's contamination expects to fit.
+    """
+    rows = (
+        db.query(UserActivity.timestamp, UserActivity.additional_data)
+        .filter(UserActivity.user_id == user_id, UserActivity.timestamp.isnot(None))
+        .order_by(UserActivity.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+    return [_history_entry(timestamp, additional_data) for timestamp, additional_data in rows]
+
+
+def sample_recent_history(session_factory: sessionmaker, window_hours: float, k: int) -> Tuple[List[Dict[str, Any]], int]:
+    """A uniform sample of at most ``k`` activities of all users from the last ``window_hours``.
+
+    Normal and anomalous activities alike, since every scored activity is
+    stored; the population model's contamination assumes that mix. Rows
+    are streamed from the database and reservoir-sampled, so memory stays
+    O(k) however busy the window was.
+    """
+    since = datetime.utcnow() - timedelta(hours=window_hours)
+    with session_factory() as db:
+        rows = (
+            db.query(UserActivity.timestamp, UserActivity.additional_data)
+            .filter(UserActivity.timestamp >= since)
+            .execution_options(yield_per=1000)
+        )
+        return reservoir_sample((_history_entry(*row) for row in rows), k)
+
+
+def train_population_model(history: Optional[List[Dict[str, Any]]] = None) -> AnomalyDetector:
+    """Population model every user without a model of their own is scored against.
+
+    Fitted on mock data unless given ``history`` (e.g. recent activities of
+    all users, when retraining).
+    """
+    population = AnomalyDetector()
+    population.train(history if history is not None else generate_mock_data(100))
+    return population
+
+
+@lru_cache()
+def get_model_registry() -> ModelRegistry:
+    settings = get_settings()
+    population = LazyArtifact(
+        get_model_store(), POPULATION_ARTIFACT, fallback=train_population_model,
+        check_seconds=settings.MODEL_STORE_CHECK_SECONDS,
+    )
+    return ModelRegistry(
+        population=RetrainableArtifact(population),
+        max_bytes=settings.ANOMALY_REGISTRY_MAX_BYTES,
+        max_models=settings.ANOMALY_REGISTRY_MAX_MODELS,
+        spill_dir=settings.ANOMALY_REGISTRY_SPILL_DIR,
+        max_spilled=settings.ANOMALY_REGISTRY_MAX_SPILLED,
+        min_samples=settings.ANOMALY_USER_MIN_SAMPLES,
+    )
+
+
+def get_user_detector(db: Session, user_id: Any) -> AnomalyDetector:
+    """Resolve the detector for ``user_id``, training it from the DB on a miss."""
+    limit = get_settings().ANOMALY_USER_HISTORY_LIMIT
+    return get_model_registry().get(user_id, lambda: load_user_history(db, user_id, limit=limit))
@@ -0,0 +1,34 @@
+from ..core.warmup import Warmup, get_warmup
+from ..core_modules.anomaly.model import get_session_detector
+from .fatigue_detection.fatigue_monitor import ARTIFACT_NAME as FATIGUE_ARTIFACT, generate_mock_samples, get_fatigue_model
+from .threat_detection.anomaly_detector import generate_mock_data
+from .threat_detection.model_registry import POPULATION_ARTIFACT, get_model_registry
+
+
+def _warm_population():
+    # Loads the artifact, then scores one row: imports pandas and builds the compiled forest
+    get_model_registry().population.detect_anomalies(generate_mock_data(1))
+
+
+def _warm_fatigue():
+    # Loads (or, without an artifact, fits) the model and scores one sample through it
+    monitor = get_fatigue_model().model
+    monitor.score_features(monitor.feature_matrix(generate_mock_samples(1)))
+
+
+def _warm_session_anomaly():
+    result = get_session_detector().analyze(
+        {"login_hour": 12, "typing_speed": 60.0, "click_rate": 100.0, "session_duration": 45.0}
+    )
+    # analyze() reports failures in its result instead of raising
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+
+def setup_warmup() -> Warmup:
+    """Register the models the API serves, to be loaded after startup."""
+    warmup = get_warmup()
+    warmup.register(POPULATION_ARTIFACT, _warm_population)
+    warmup.register("session_anomaly", _warm_session_anomaly)
+    warmup.register(FATIGUE_ARTIFACT, _warm_fatigue)
+    return warmup
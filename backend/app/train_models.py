@@ -0,0 +1,45 @@
+"""
+Offline training step for the models served by the API.
+
+Trains each model and writes it to the model artifact store as a new
+version, so API workers only ever load artifacts and never train at startup.
+
+Usage (from backend/):
+    python -m app.train_models
+    python -m app.train_models --store /srv/model_store --only threat_population
+"""
+import argparse
+import time
+
+from .core_modules.anomaly.model import ARTIFACT_NAME as SESSION_ARTIFACT, train_default_model
+from .modules.fatigue_detection.fatigue_monitor import ARTIFACT_NAME as FATIGUE_ARTIFACT, train_default_fatigue_model
+from .modules.model_store.artifact_store import ModelArtifactStore
+from .modules.threat_detection.model_registry import POPULATION_ARTIFACT, train_population_model
+from .core.settings import get_settings
+
+TRAINERS = {
+    POPULATION_ARTIFACT: train_population_model,
+    SESSION_ARTIFACT: train_default_model,
+    FATIGUE_ARTIFACT: train_default_fatigue_model,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    settings = get_settings()
+    parser.add_argument("--store", default=settings.data_path(settings.MODEL_STORE_DIR), help="artifact store directory")
+    parser.add_argument("--only", nargs="+", choices=sorted(TRAINERS), help="train only these models")
+    args = parser.parse_args()
+
+    store = ModelArtifactStore(args.store, settings.MODEL_STORE_KEEP_VERSIONS)
+    for name in args.only or TRAINERS:
+        start = time.perf_counter()
+        model = TRAINERS[name]()
+        elapsed = time.perf_counter() - start
+        version = store.save(name, model, metadata={"training_seconds": round(elapsed, 3)})
+        manifest = store.manifest(name, version)
+        print(f"{name}: v{version} sha256={manifest['sha256'][:12]} ({manifest['size_bytes']} bytes, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Rollups and retention of the day-partitioned user_activities table.
+
+Migrates a scratch database to head, creates a partition per day for the
+last --days days and fills them with activities ("populate"; on SQLite
+every row goes through the view's routing trigger). Then:
+  * "rollup" times one maintenance run recomputing the hourly rollups of
+    the whole period;
+  * "trend" times a user's --days trend read from user_activity_hourly
+    (get_activity_trend) against the same aggregate computed from the
+    raw rows, and checks that they agree;
+  * "retention" times dropping the older half of the partitions against
+    deleting the same rows from an unpartitioned copy of the table
+    (built with create_all in a second database).
+Prints one JSON line per check and exits non-zero if the trend disagrees.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_activity_storage
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_activity_storage --days 60 --rows-per-user-day 200
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_activity_storage --database-url postgresql://.../scratch
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import case, create_engine, delete, func, insert, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models.user_activity import ANOMALY_SCORE_THRESHOLD, UserActivity
+from app.modules.threat_detection import activity_storage
+from app.modules.threat_detection.anomaly_queries import get_activity_trend
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def migrate(url: str):
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+
+def make_rows(users: int, days: int, rows_per_user_day: int, now: datetime):
+    rng = random.Random(0)
+    return [
+        {
+            "user_id": rng.randrange(1, users + 1),
+            "timestamp": now - timedelta(seconds=rng.randrange(days * 86400)),
+            "anomaly_score": rng.random(),
+            "additional_data": {},
+        }
+        for _ in range(users * days * rows_per_user_day)
+    ]
+
+
+def populate(engine, users: int, rows):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES " + ", ".join(
+            f"({i}, 'user{i}')" for i in range(1, users + 1)
+        )))
+        for i in range(0, len(rows), 10_000):
+            conn.execute(insert(UserActivity), rows[i:i + 10_000])
+
+
+def raw_trend(engine, layout, user_id: int, since: datetime):
+    """The rollup aggregate of one user, computed from the raw rows."""
+    hour = layout.hour(UserActivity.timestamp)
+    threshold = literal_column(repr(ANOMALY_SCORE_THRESHOLD))
+    with engine.connect() as conn:
+        return conn.execute(
+            select(
+                hour,
+                func.count(),
+                func.sum(case((UserActivity.anomaly_score > threshold, 1), else_=0)),
+                func.max(UserActivity.anomaly_score),
+                func.avg(UserActivity.anomaly_score),
+            )
+            .where(UserActivity.user_id == user_id, UserActivity.timestamp >= since)
+            .group_by(hour)
+            .order_by(hour)
+        ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file; must be a scratch database")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rows-per-user-day", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20, help="trend reads to average over")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    url = args.database_url or f"sqlite:///{os.path.join(scratch, 'partitioned.db')}"
+    migrate(url)
+    engine = create_engine(url)
+    layout = activity_storage.layout_for(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        activity_storage.create_partitions(conn, layout, (now - timedelta(days=args.days)).date(), now.date())
+
+    rows = make_rows(args.users, args.days, args.rows_per_user_day, now)
+    start = time.perf_counter()
+    populate(engine, args.users, rows)
+    print(json.dumps({"check": "populate", "rows": len(rows), "seconds": round(time.perf_counter() - start, 2)}))
+
+    maintenance = activity_storage.ActivityMaintenance(
+        engine, retention_days=args.days + 1, rollup_lookback_hours=(args.days + 1) * 24
+    )
+    start = time.perf_counter()
+    outcome = maintenance.run_once(now)
+    print(json.dumps({"check": "rollup", "outcome": outcome["outcome"], "rollup_rows": outcome["rollup"]["rows"],
+                      "seconds": round(time.perf_counter() - start, 3)}))
+
+    hours = args.days * 24 + 1
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    # Untimed first reads: statement compilation and page cache
+    with Session(engine) as db:
+        get_activity_trend(db, 1, hours)
+    raw_trend(engine, layout, 1, since)
+    start = time.perf_counter()
+    with Session(engine) as db:
+        for _ in range(args.repeat):
+            trend = get_activity_trend(db, 1, hours)
+    rollup_ms = (time.perf_counter() - start) / args.repeat * 1000
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        raw = raw_trend(engine, layout, 1, since)
+    raw_ms = (time.perf_counter() - start) / args.repeat * 1000
+    agrees = len(trend) == len(raw) and all(
+        (point["activity_count"], point["anomaly_count"]) == (count, anomalies)
+        and abs(point["max_anomaly_score"] - max_score) < 1e-9
+        and abs(point["mean_anomaly_score"] - mean_score) < 1e-9
+        for point, (_, count, anomalies, max_score, mean_score) in zip(trend, raw)
+    )
+    print(json.dumps({"check": "trend", "hours": len(trend), "rollup_ms": round(rollup_ms, 2),
+                      "raw_ms": round(raw_ms, 2), "speedup": round(raw_ms / rollup_ms, 1), "agrees": agrees}))
+
+    # The same rows in a plain table, to compare dropping partitions with deleting rows
+    plain = create_engine(f"sqlite:///{os.path.join(scratch, 'plain.db')}")
+    Base.metadata.create_all(plain)
+    start = time.perf_counter()
+    populate(plain, args.users, rows)
+    print(json.dumps({"check": "populate_unpartitioned", "rows": len(rows),
+                      "seconds": round(time.perf_counter() - start, 2)}))
+    cutoff = datetime.combine((now - timedelta(days=args.days // 2)).date(), datetime.min.time())
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        dropped, deleted = activity_storage.drop_partitions_before(conn, layout, cutoff)
+    drop_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    with plain.begin() as conn:
+        plain_deleted = conn.execute(delete(UserActivity).where(UserActivity.timestamp < cutoff)).rowcount
+    delete_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({"check": "retention", "partitions_dropped": len(dropped), "rows_deleted": plain_deleted,
+                      "drop_ms": round(drop_ms, 1), "delete_ms": round(delete_ms, 1)}))
+
+    if not agrees:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Request decode cost of bulk /threat-detection/analyze payloads: JSON vs.
+the columnar formats (app.core.columnar).
+
+For each batch size, encodes the same activities as a JSON array and as
+.npz, Arrow IPC and MessagePack columns (the last two only if pyarrow /
+msgpack are installed), then times, best of --rounds:
+  * "decode_ms": body bytes to activity dicts (JSON) or to columns;
+  * "features_ms": body bytes to the detector's feature matrix, i.e.
+    decode plus AnomalyDetector._feature_matrix / column_feature_matrix.
+Also reports the payload size. Scoring is the same for every format and
+is left out. MessagePack timestamps are sent as ISO-8601 strings, as
+most clients would; they are parsed like JSON ones.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_columnar_decode
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_columnar_decode --rows 1000 100000
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+
+from app.core import columnar
+from app.modules.threat_detection.anomaly_detector import AnomalyDetector
+
+
+def make_columns(n: int, rng: np.random.Generator):
+    start = np.datetime64("2024-03-04T00:00:00")
+    return {
+        "timestamp": start + rng.integers(0, 30 * 24 * 3600, n).astype("timedelta64[s]"),
+        "login_count": rng.integers(1, 10, n),
+        "location_changed": rng.random(n) < 0.1,
+        "browser_changed": rng.random(n) < 0.05,
+    }
+
+
+def encode_payloads(columns):
+    """(media type, body) per available format."""
+    activities = [
+        {"timestamp": str(ts), "login_count": int(logins), "location_changed": bool(location), "browser_changed": bool(browser)}
+        for ts, logins, location, browser in zip(*columns.values())
+    ]
+    payloads = [("application/json", json.dumps(activities).encode())]
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    payloads.append((columnar.NPZ, buffer.getvalue()))
+    try:
+        payloads.append((columnar.ARROW, columnar.encode_columns(columnar.ARROW, columns)))
+    except columnar.UnsupportedFormatError:
+        pass
+    try:
+        import msgpack
+
+        payloads.append((columnar.MSGPACK, msgpack.packb({
+            "timestamp": [str(ts) for ts in columns["timestamp"]],
+            **{name: column.tolist() for name, column in columns.items() if name != "timestamp"},
+        })))
+    except ImportError:
+        pass
+    return payloads
+
+
+def best_of(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    detector = AnomalyDetector()
+    rng = np.random.default_rng(0)
+    for n in args.rows:
+        for fmt, body in encode_payloads(make_columns(n, rng)):
+            if fmt == "application/json":
+                decode = lambda: json.loads(body)
+                features = lambda: detector._feature_matrix(json.loads(body))
+            else:
+                decode = lambda: columnar.decode_columns(fmt, body)
+                features = lambda: detector.column_feature_matrix(columnar.decode_columns(fmt, body))
+            print(json.dumps({
+                "rows": n,
+                "format": fmt,
+                "bytes": len(body),
+                "decode_ms": round(best_of(decode, args.rounds) * 1e3, 2),
+                "features_ms": round(best_of(features, args.rounds) * 1e3, 2),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Latency benchmark for the compiled IsolationForest scorer.
+
+Times one scoring call per batch size, library vs compiled. That the
+compiled scores match the library exactly is tested in
+tests/test_compiled_forest.py.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compiled_forest
+    python -m benchmarks.bench_compiled_forest --batch-sizes 1 64 --calls 2000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from app.modules.threat_detection.compiled_forest import CompiledForest
+
+
+def _per_call_ms(fn, calls: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 512, 4_096, 65_536])
+    parser.add_argument("--calls", type=int, default=500, help="calls per batch size (scaled down for big batches)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    forest = IsolationForest(n_estimators=100, random_state=42).fit(rng.normal(size=(3_000, 5)))
+    compiled = CompiledForest.from_sklearn(forest)
+
+    for batch_size in args.batch_sizes:
+        X = rng.normal(size=(batch_size, 5))
+        calls = max(3, min(args.calls, args.calls * 64 // batch_size))
+        library_ms = _per_call_ms(lambda: forest.score_samples(X), calls)
+        compiled_ms = _per_call_ms(lambda: compiled.score_samples(X), calls)
+        print(json.dumps({
+            "batch_size": batch_size,
+            "library_ms": round(library_ms, 4),
+            "compiled_ms": round(compiled_ms, 4),
+            "speedup": round(library_ms / compiled_ms, 1),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Per-sample vs. series scoring of a fatigue curve.
+
+Scores a work session of --samples interaction samples with one
+FatigueMonitor.detect_fatigue call per sample (what clients had to do,
+one /analyze request each) and with a single detect_fatigue_series call,
+checks that both give the same scores and break flags, and reports the
+time per sample of each.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_fatigue_series
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_fatigue_series --samples 100 1000 10000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+from app.modules.fatigue_detection.fatigue_monitor import FatigueMonitor
+
+
+def session(n: int, rng: random.Random) -> List[Dict]:
+    # Typing slows down and errors and pauses pile up over the session
+    return [
+        {
+            "typing_speed": 65 - 20 * i / n + rng.uniform(-5, 5),
+            "click_rate": 30 + rng.uniform(-5, 5),
+            "error_rate": 0.02 + 0.1 * i / n,
+            "session_duration": 480 * i / n,
+            "inactivity_periods": int(8 * i / n),
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", nargs="+", type=int, default=[100, 1_000, 10_000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    monitor = FatigueMonitor()
+    monitor.train_baseline(session(500, rng))
+
+    for n in args.samples:
+        samples = session(n, rng)
+        single = [monitor.detect_fatigue(sample) for sample in samples]
+        series = monitor.detect_fatigue_series(samples)
+        same = all(
+            abs(a["fatigue_score"] - b["fatigue_score"]) < 1e-9 and a["needs_break"] == b["needs_break"]
+            for a, b in zip(single, series["samples"])
+        )
+        per_sample = best_of(lambda: [monitor.detect_fatigue(sample) for sample in samples], args.rounds)
+        batched = best_of(lambda: monitor.detect_fatigue_series(samples), args.rounds)
+        print(json.dumps({
+            "samples": n,
+            "per_sample_us": round(per_sample / n * 1e6, 2),
+            "series_us": round(batched / n * 1e6, 2),
+            "speedup": round(per_sample / batched, 1),
+            "same_results": same,
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Cost of deriving behavioral features server-side, per activity.
+
+Generates --activities login activities (time-ordered, with IPs and
+browser fingerprints) spread over --users users and --days days. Then:
+  * "store": feeds them to UserFeatureStore.featurize in batches of
+    --batch-size per user, and checks every derived feature against a
+    brute-force recomputation from all of the user's earlier activities
+    (same window buckets, same browser list);
+  * "history_query": derives the same features per activity the way it
+    would be done without the store, by querying the user's stored
+    activities (window count, last row, recent browsers) from a SQLite
+    table holding them all, indexed on (user_id, timestamp).
+Prints one JSON line per check and exits non-zero if the store disagrees.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_feature_store
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_feature_store --users 1000 --activities 200000 --batch-size 1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models.user_activity import UserActivity
+from app.modules.threat_detection.feature_store import UserFeatureStore, _browser, _epoch_seconds, _network_key
+
+
+def make_activities(users: int, n: int, days: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    stamps = sorted(start + timedelta(seconds=rng.randrange(days * 86400)) for _ in range(n))
+    return [
+        {
+            "line": i,
+            "user_id": rng.randrange(users),
+            "timestamp": stamp.isoformat(),
+            "ip_address": f"10.{rng.randrange(3)}.{rng.randrange(2)}.{rng.randrange(256)}",
+            "browser_fingerprint": f"fp{rng.randrange(12)}",
+        }
+        for i, stamp in enumerate(stamps)
+    ]
+
+
+def brute_force(activities, window_seconds: float, buckets: int, max_browsers: int):
+    """The store's features, recomputed per activity from the user's full history."""
+    bucket_seconds = window_seconds / buckets
+    history = {}
+    expected = []
+    for activity in activities:
+        seen = history.setdefault(activity["user_id"], [])
+        bucket = int(_epoch_seconds(activity["timestamp"]) // bucket_seconds)
+        logins = 1 + sum(1 for earlier in seen if earlier[0] > bucket - buckets)
+        network = _network_key(activity["ip_address"])
+        moved = bool(seen) and seen[-1][1] != network
+        browser = _browser(activity["browser_fingerprint"], None)[0]
+        recent = []
+        for earlier in reversed(seen):
+            if earlier[2] not in recent:
+                recent.append(earlier[2])
+        new_browser = bool(seen) and browser not in recent[:max_browsers]
+        seen.append((bucket, network, browser))
+        expected.append((logins, moved, new_browser))
+    return expected
+
+
+def time_store(activities, batch_size: int, window_seconds: float, buckets: int, max_browsers: int):
+    store = UserFeatureStore(login_window_seconds=window_seconds, login_buckets=buckets, max_browsers=max_browsers)
+    # Consecutive activities of the same user form a batch, as one request would
+    batches, pending = [], {}
+    for activity in activities:
+        batch = pending.setdefault(activity["user_id"], [])
+        batch.append(dict(activity))
+        if len(batch) == batch_size:
+            batches.append((activity["user_id"], pending.pop(activity["user_id"])))
+    batches.extend(pending.items())
+    batches.sort(key=lambda item: item[1][0]["timestamp"])
+
+    start = time.perf_counter()
+    for user_id, batch in batches:
+        store.featurize(user_id, batch)
+    elapsed = time.perf_counter() - start
+    derived = {}
+    for _, batch in batches:
+        for activity in batch:
+            derived[activity["line"]] = (
+                activity["login_count"], activity["location_changed"], activity["browser_changed"]
+            )
+    return elapsed, derived
+
+
+def time_history_query(activities, window_seconds: float, max_browsers: int, sample: int):
+    """Seconds per activity to derive the features from stored history instead."""
+    scratch = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(scratch, 'history.db')}")
+    Base.metadata.create_all(engine)
+    rows = [
+        {
+            "user_id": activity["user_id"],
+            "timestamp": datetime.fromisoformat(activity["timestamp"]),
+            "ip_address": activity["ip_address"],
+            "browser_fingerprint": activity["browser_fingerprint"],
+            "additional_data": {},
+        }
+        for activity in activities
+    ]
+    with engine.begin() as conn:
+        for i in range(0, len(rows), 10_000):
+            conn.execute(insert(UserActivity), rows[i:i + 10_000])
+        conn.execute(text("CREATE INDEX ix_bench_user_time ON user_activities (user_id, timestamp)"))
+
+    rng = random.Random(1)
+    probes = [rows[rng.randrange(len(rows))] for _ in range(sample)]
+    start = time.perf_counter()
+    with Session(engine) as db:
+        for row in probes:
+            since = row["timestamp"] - timedelta(seconds=window_seconds)
+            db.execute(select(func.count()).select_from(UserActivity).where(
+                UserActivity.user_id == row["user_id"],
+                UserActivity.timestamp > since,
+                UserActivity.timestamp <= row["timestamp"],
+            )).scalar()
+            db.execute(select(UserActivity.ip_address, UserActivity.location).where(
+                UserActivity.user_id == row["user_id"], UserActivity.timestamp < row["timestamp"],
+            ).order_by(UserActivity.timestamp.desc()).limit(1)).first()
+            db.execute(select(UserActivity.browser_fingerprint).where(
+                UserActivity.user_id == row["user_id"], UserActivity.timestamp < row["timestamp"],
+            ).order_by(UserActivity.timestamp.desc()).limit(max_browsers * 4)).all()
+    return (time.perf_counter() - start) / sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--activities", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--window-seconds", type=float, default=24 * 3600.0)
+    parser.add_argument("--buckets", type=int, default=24)
+    parser.add_argument("--max-browsers", type=int, default=8)
+    parser.add_argument("--query-sample", type=int, default=2000, help="activities to time history queries for")
+    args = parser.parse_args()
+
+    activities = make_activities(args.users, args.activities, args.days)
+    elapsed, derived = time_store(activities, args.batch_size, args.window_seconds, args.buckets, args.max_browsers)
+    expected = brute_force(activities, args.window_seconds, args.buckets, args.max_browsers)
+    mismatches = sum(
+        derived[activity["line"]] != features
+        for activity, features in zip(activities, expected)
+    )
+    store_us = elapsed / len(activities) * 1e6
+    print(json.dumps({"check": "store", "activities": len(activities), "batch_size": args.batch_size,
+                      "us_per_activity": round(store_us, 2), "mismatches": mismatches}))
+
+    query_us = time_history_query(activities, args.window_seconds, args.max_browsers, args.query_sample) * 1e6
+    print(json.dumps({"check": "history_query", "activities": args.query_sample,
+                      "us_per_activity": round(query_us, 1), "speedup": round(query_us / store_us, 1)}))
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-request overhead and cross-worker correctness of the rate limiter.
+
+For each storage (per-process memory://, shared sqlite://):
+  * "hit" rows time one sliding-window acquire, as the limiter does once
+    per decorated request, from one process and from --workers processes
+    at once (aggregate hits/sec);
+  * "exact" rows have --workers processes race for a 1000/minute limit on
+    one key and check that exactly 1000 hits were granted in total (memory://
+    is expected to grant 1000 per worker);
+  * "request" rows time a minimal decorated route end to end through the
+    ASGI stack, with and without the limiter, to show the added latency.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_rate_limiter
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_rate_limiter --storages sqlite:////dev/shm/rl.db --workers 8
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.middleware import rate_limit_storage  # noqa: F401  (registers sqlite://)
+
+
+def _hit_loop(uri: str, n: int, key: str, limit: str, result_queue):
+    strategy = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse(limit)
+    granted = 0
+    start = time.perf_counter()
+    for i in range(n):
+        granted += strategy.hit(item, key if key else f"client-{i % 1000}")
+    result_queue.put((granted, time.perf_counter() - start))
+
+
+def run_processes(uri: str, workers: int, n: int, key: str, limit: str):
+    result_queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_hit_loop, args=(uri, n, key, limit, result_queue))
+        for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    results = [result_queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return sum(granted for granted, _ in results), time.perf_counter() - start
+
+
+async def request_latency_us(uri: str, requests: int, limited: bool) -> float:
+    app = FastAPI()
+    limiter = Limiter(key_func=get_remote_address, strategy="sliding-window-counter", storage_uri=uri)
+    app.state.limiter = limiter
+
+    async def ping(request: Request):
+        return {"ok": True}
+
+    app.get("/ping")(limiter.limit("1000000/minute")(ping) if limited else ping)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(200):
+            await client.get("/ping")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/ping")
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    scratch = tempfile.mkdtemp()
+    parser.add_argument("--storages", nargs="+",
+                        default=["memory://", f"sqlite:///{os.path.join(scratch, 'ratelimit.db')}"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--hits", type=int, default=20_000, help="hits per process")
+    parser.add_argument("--requests", type=int, default=3_000)
+    args = parser.parse_args()
+    ok = True
+
+    for uri in args.storages:
+        _, elapsed = run_processes(uri, 1, args.hits, "", "1000000/minute")
+        print(json.dumps({"storage": uri, "check": "hit", "processes": 1,
+                          "us_per_hit": round(elapsed / args.hits * 1e6, 1),
+                          "hits_per_s": round(args.hits / elapsed)}))
+
+        _, elapsed = run_processes(uri, args.workers, args.hits, "", "1000000/minute")
+        total = args.hits * args.workers
+        print(json.dumps({"storage": uri, "check": "hit", "processes": args.workers,
+                          "hits_per_s": round(total / elapsed)}))
+
+        granted, _ = run_processes(uri, args.workers, 2_000, f"race-{uuid.uuid4()}", "1000/minute")
+        shared = not uri.startswith("memory://")
+        expected = 1000 if shared else 1000 * args.workers
+        print(json.dumps({"storage": uri, "check": "exact", "processes": args.workers,
+                          "granted": granted, "expected": expected}))
+        ok &= granted == expected
+
+        bare = asyncio.run(request_latency_us(uri, args.requests, limited=False))
+        limited = asyncio.run(request_latency_us(uri, args.requests, limited=True))
+        print(json.dumps({"storage": uri, "check": "request", "bare_us": round(bare, 1),
+                          "limited_us": round(limited, 1), "overhead_us": round(limited - bare, 1)}))
+
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
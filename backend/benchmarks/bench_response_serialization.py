@@ -0,0 +1,137 @@
+"""
+Response serialization cost of /threat-detection/analyze-shaped results.
+
+For each result count, times one request end to end through the ASGI
+stack for each path:
+  * "validated": response_model=List[Dict[str, Any]] and Starlette's
+    JSONResponse, i.e. the endpoint before FastJSONResponse;
+  * "orjson_default": the same route with FastJSONResponse as the app's
+    default response class (validation and jsonable_encoder still run);
+  * "fast": the endpoint returns FastJSONResponse(results) itself, as
+    /analyze now does;
+  * "fast_gzip" / "fast_br": the fast path behind CompressionMiddleware,
+    with Accept-Encoding gzip / br (br only with brotli installed).
+Each row reports microseconds per request (including the client's
+decompression for the compressed paths) and response bytes on the wire.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_response_serialization
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_response_serialization --sizes 1000 100000 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.core.responses import FastJSONResponse
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware
+
+
+def make_results(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Result dicts as AnomalyDetector.detect_anomalies builds them."""
+    rng = np.random.default_rng(seed)
+    scores = rng.random(n)
+    base = np.datetime64("2024-01-01T00:00:00") + rng.integers(0, 30 * 86400, n).astype("timedelta64[s]")
+    stamps = np.datetime_as_string(base, unit="s").tolist()
+    return [
+        {
+            "timestamp": stamp,
+            "anomaly_score": score,
+            "is_anomaly": score > 0.8,
+            "features": {
+                "hour_of_day": hour,
+                "day_of_week": weekday,
+                "login_frequency": logins,
+                "location_change": location,
+                "browser_change": browser,
+            },
+        }
+        for stamp, score, hour, weekday, logins, location, browser in zip(
+            stamps,
+            scores.tolist(),
+            rng.integers(0, 24, n).tolist(),
+            rng.integers(0, 7, n).tolist(),
+            rng.integers(0, 50, n).tolist(),
+            (rng.random(n) < 0.1).tolist(),
+            (rng.random(n) < 0.05).tolist(),
+        )
+    ]
+
+
+def build_app(path: str, results: List[Dict[str, Any]], min_size: int, gzip_level: int) -> FastAPI:
+    if path == "validated":
+        app = FastAPI()
+
+        @app.get("/analyze", response_model=List[Dict[str, Any]])
+        async def validated():
+            return results
+    elif path == "orjson_default":
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/analyze", response_model=List[Dict[str, Any]])
+        async def orjson_default():
+            return results
+    else:
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/analyze", response_model=List[Dict[str, Any]])
+        async def fast():
+            return FastJSONResponse(results)
+
+        if path != "fast":
+            app.add_middleware(CompressionMiddleware, minimum_size=min_size, gzip_level=gzip_level)
+    return app
+
+
+async def time_requests(app: FastAPI, requests: int, accept_encoding: Optional[str]):
+    headers = {"accept-encoding": accept_encoding or "identity"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        response = await client.get("/analyze", headers=headers)
+        response.raise_for_status()
+        wire_bytes = len(response.content) if not response.headers.get("content-encoding") \
+            else int(response.headers["content-length"])
+        decoded = response.json()
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/analyze", headers=headers)
+        elapsed = time.perf_counter() - start
+    return elapsed / requests * 1e6, wire_bytes, decoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1_000, 10_000, 50_000])
+    parser.add_argument("--requests", type=int, default=0,
+                        help="requests per path and size (default: scaled to the size)")
+    parser.add_argument("--min-size", type=int, default=1024, help="CompressionMiddleware minimum_size")
+    parser.add_argument("--gzip-level", type=int, default=1)
+    args = parser.parse_args()
+
+    paths = [("validated", None), ("orjson_default", None), ("fast", None), ("fast_gzip", "gzip")]
+    if compression.brotli is not None:
+        paths.append(("fast_br", "br"))
+
+    for n in args.sizes:
+        results = make_results(n)
+        requests = args.requests or max(5, min(500, 200_000 // n))
+        baseline_us = None
+        expected = None
+        for path, accept_encoding in paths:
+            app = build_app(path, results, args.min_size, args.gzip_level)
+            us, wire_bytes, decoded = asyncio.run(time_requests(app, requests, accept_encoding))
+            if expected is None:
+                baseline_us, expected = us, decoded
+            row = {"results": n, "path": path, "us_per_request": round(us, 1),
+                   "speedup": round(baseline_us / us, 2), "bytes": wire_bytes,
+                   "same_body": decoded == expected}
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cold-start benchmark: time from interpreter start to the first answered
+/threat-detection/analyze request, measured in fresh subprocesses.
+
+Run it against this checkout and against an older one to compare, e.g.:
+
+    git worktree add /tmp/ds-before <old-commit>
+    python -m benchmarks.bench_startup --src /tmp/ds-before/backend --label before
+    python -m benchmarks.bench_startup --label after
+
+For the current tree the model artifacts are built first with the offline
+training step (python -m app.train_models) into a temporary store, as a
+deployment would; that time is reported separately and not counted.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.v1.endpoints import threat_detection
+t_import = time.perf_counter()
+
+from app.database import Base, engine
+import app.models.user, app.models.user_activity
+Base.metadata.create_all(engine)
+
+app = FastAPI()
+app.include_router(threat_detection.router, prefix="/threat-detection")
+client = TestClient(app)
+t1 = time.perf_counter()
+response = client.post("/threat-detection/analyze", json=[
+    {"timestamp": "2024-01-01T03:00:00Z", "login_count": 3},
+    {"timestamp": "2024-01-01T12:00:00Z", "login_count": 4},
+])
+t_first = time.perf_counter()
+response.raise_for_status()
+print(json.dumps({"import_s": t_import - t0, "first_request_s": t_first - t1}))
+"""
+
+
+def run_once(src: Path, env: dict) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=src, env=env, check=True, capture_output=True, text=True
+    )
+    total = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["time_to_first_request_s"] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--src", type=Path, default=BACKEND_DIR, help="backend directory to benchmark")
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(args.src),
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "MODEL_STORE_DIR": str(workdir / "model_store"),
+    }
+
+    report = {"label": args.label, "src": str(args.src)}
+    if (args.src / "app" / "train_models.py").exists():
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "app.train_models"], cwd=args.src, env=env, check=True, capture_output=True)
+        report["offline_training_s"] = round(time.perf_counter() - start, 3)
+
+    runs = [run_once(args.src, env) for _ in range(args.runs)]
+    for key in ("import_s", "first_request_s", "time_to_first_request_s"):
+        report[key] = round(statistics.median(r[key] for r in runs), 4)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
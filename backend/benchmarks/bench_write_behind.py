@@ -0,0 +1,135 @@
+"""
+Benchmark for persisting anomaly results: inline commit vs write-behind.
+
+"inline" is what /threat-detection/analyze did before: add one ORM object
+per anomalous result and commit inside the request. "write_behind" queues
+the rows on a WriteBehindQueue and lets it bulk insert them. For each mode
+this reports the time a request spends persisting (p50/p99) and the rows/sec
+that reach the database, including the final drain for write-behind.
+
+A local SQLite file stands in for Postgres; --rtt-ms adds a simulated
+network round trip to every statement so the numbers resemble a remote
+database.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_write_behind
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_write_behind --requests 2000 --rtt-ms 0
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_write_behind --database-url postgresql://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.write_behind import WriteBehindQueue
+from app.database import Base
+from app.models.user import User  # noqa: F401  (user_activities has a FK to users)
+from app.models.user_activity import UserActivity
+from app.modules.threat_detection.activity_writer import activity_rows, insert_activities
+
+
+def make_results(n: int, request_id: int) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=request_id)
+    return [
+        {
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+            "anomaly_score": 0.9,
+            "is_anomaly": True,
+            "features": {"hour_of_day": 3, "day_of_week": 1, "login_frequency": 9,
+                         "location_change": True, "browser_change": False},
+        }
+        for i in range(n)
+    ]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+def run_inline(session_factory: sessionmaker, requests: int, rows_per_request: int) -> Dict[str, Any]:
+    latencies = []
+    start = time.perf_counter()
+    for request_id in range(requests):
+        results = make_results(rows_per_request, request_id)
+        t0 = time.perf_counter()
+        with session_factory() as db:
+            for result in results:
+                db.add(UserActivity(
+                    user_id=1,
+                    timestamp=datetime.fromisoformat(result["timestamp"]),
+                    anomaly_score=result["anomaly_score"],
+                    additional_data=result,
+                ))
+            db.commit()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {"mode": "inline", **_percentiles(latencies),
+            "rows_per_s": round(requests * rows_per_request / elapsed)}
+
+
+async def run_write_behind(session_factory: sessionmaker, requests: int, rows_per_request: int,
+                           batch_size: int, interval_ms: float) -> Dict[str, Any]:
+    queue = WriteBehindQueue(
+        "bench", partial(insert_activities, session_factory),
+        max_batch_size=batch_size, flush_interval_ms=interval_ms,
+    )
+    latencies = []
+    start = time.perf_counter()
+    for request_id in range(requests):
+        results = make_results(rows_per_request, request_id)
+        t0 = time.perf_counter()
+        await queue.put(activity_rows(1, results))
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(0)  # let the flusher run between requests, as a server would
+    await queue.close()
+    elapsed = time.perf_counter() - start
+    return {"mode": "write_behind", **_percentiles(latencies),
+            "rows_per_s": round(requests * rows_per_request / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--rows-per-request", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated round trip per statement")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--interval-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    if args.rtt_ms > 0:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _round_trip(*_):
+            time.sleep(args.rtt_ms / 1000)
+    session_factory = sessionmaker(bind=engine)
+
+    rows = []
+    rows.append(run_inline(session_factory, args.requests, args.rows_per_request))
+    rows.append(asyncio.run(run_write_behind(
+        session_factory, args.requests, args.rows_per_request, args.batch_size, args.interval_ms
+    )))
+
+    with session_factory() as db:
+        stored = db.scalar(select(func.count()).select_from(UserActivity))
+    expected = 2 * args.requests * args.rows_per_request
+    assert stored == expected, f"expected {expected} rows, found {stored}"
+
+    for row in rows:
+        print(json.dumps({"rtt_ms": args.rtt_ms, "rows_per_request": args.rows_per_request, **row}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Import-time check for API worker boot.
+
+Imports app.main in fresh interpreters under ``python -X importtime`` and
+checks that:
+  * the median cumulative import time of app.main is within --budget-ms;
+  * none of the libraries the API loads lazily (sklearn, pandas, pyod,
+    numba, scipy, joblib, sentry_sdk) was imported; those belong to the
+    background warmup (see /ready), not to boot.
+Exits non-zero if either check fails. Prints the slowest imports under
+app.main as well, to show where the time goes when the budget is blown.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.check_import_time
+    DATABASE_URL=sqlite:// python -m benchmarks.check_import_time --budget-ms 1000 --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+LAZY_MODULES = ("sklearn", "pandas", "pyod", "numba", "scipy", "joblib", "sentry_sdk")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, depth, cumulative microseconds) per line of -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(cumulative)))
+    return imports
+
+
+def import_once(env: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    )
+    return parse_importtime(out.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="check_import_time_"))
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "DATABASE_URL": f"sqlite:///{workdir / 'app.db'}",
+        "MODEL_STORE_DIR": str(workdir / "model_store"),
+        "OSINT_JOB_DB": str(workdir / "osint_jobs.db"),
+    }
+    # Untimed first run: fills the OS page cache and writes .pyc files
+    import_once(env)
+    runs = [import_once(env) for _ in range(args.runs)]
+
+    totals = [next(us for name, _, us in run if name == "app.main") for run in runs]
+    import_ms = statistics.median(totals) / 1000
+    imported = {name for run in runs for name, _, _ in run}
+    violations = sorted(module for module in LAZY_MODULES if module in imported)
+
+    # Slowest imports of the median run, skipping app.main itself
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    slowest = sorted((entry for entry in median_run if entry[0] != "app.main"), key=lambda entry: -entry[2])
+    report = {
+        "import_ms": round(import_ms, 1),
+        "budget_ms": args.budget_ms,
+        "runs_ms": [round(us / 1000, 1) for us in totals],
+        "lazy_modules_imported": violations,
+        "slowest": [{"module": name, "depth": depth, "cumulative_ms": round(us / 1000, 1)}
+                    for name, depth, us in slowest[:args.top]],
+    }
+    print(json.dumps(report, indent=2))
+
+    if import_ms > args.budget_ms or violations:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Load test: boots app.main:app under uvicorn against local stand-ins and
+drives its endpoints at fixed concurrency, reporting throughput and
+latency percentiles as JSON lines (one per scenario/concurrency/payload).
+
+Stand-ins for the production dependencies:
+  * a scratch SQLite database, migrated with Alembic and seeded with
+    --users users of --rows-per-user activities each (some anomalous);
+  * model artifacts built offline (python -m app.train_models) into a
+    scratch store, as a deployment would;
+  * stub amass, h8mail and sherlock scripts first on PATH, which print
+    canned results after --tool-delay seconds.
+Rate limiting, background retraining and user_activities maintenance
+are turned off for the run.
+
+Scenarios:
+  threat_analyze    POST /api/v1/threat-detection/analyze, --payload-sizes activities per request
+  fatigue_analyze   POST /api/v1/fatigue-detection/analyze, after training a baseline once per
+                    worker (requests are spread over workers by the kernel, so with
+                    --workers > 1 some may still land on an untrained one and count as errors)
+  session_analyze   POST /api/anomaly/analyze
+  recent_anomalies  GET  /api/v1/threat-detection/recent-anomalies/{user_id}
+  osint_scan        POST /api/v1/osint/scan-user-data with a new target each time, then poll
+                    /scan-results/{id} every --poll-interval; latency is submit to completion
+  osint_poll        GET  /api/v1/osint/scan-results/{id} of one finished scan
+
+Each row holds "requests", "errors" (transport errors, 4xx/5xx and failed scans),
+"throughput_rps" and p50/p95/p99/max latency in ms of the successful
+requests. Every run is closed-loop: --concurrency clients each send their
+next request as soon as the previous one is answered.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:// python -m benchmarks.load_test
+    DATABASE_URL=sqlite:// python -m benchmarks.load_test --scenarios threat_analyze --concurrency 1 16 64 --payload-sizes 1 100 1000
+    DATABASE_URL=sqlite:// python -m benchmarks.load_test --output baseline.jsonl --label baseline
+    DATABASE_URL=sqlite:// python -m benchmarks.load_test --url http://127.0.0.1:8000   # an already running server, no stand-ins
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = ["threat_analyze", "fatigue_analyze", "session_analyze", "recent_anomalies", "osint_scan", "osint_poll"]
+
+# Same arguments and output formats the scanner parses from the real tools
+STUB_TOOLS = {
+    "amass": """#!/bin/sh
+# amass enum -d <domain>
+sleep "$STUB_TOOL_DELAY"
+echo "www.$3"
+echo "mail.$3"
+echo "api.$3 (FQDN) --> a_record --> 192.0.2.1 (IPAddress)"
+""",
+    "sherlock": """#!/bin/sh
+# sherlock <username> --print-found --no-txt
+echo "[*] Checking username $1 on:"
+sleep "$STUB_TOOL_DELAY"
+echo "[+] GitHub: https://github.com/$1"
+echo "[+] Reddit: https://www.reddit.com/user/$1"
+""",
+    "h8mail": """#!/bin/sh
+# h8mail -t <email> -j <output file>
+sleep "$STUB_TOOL_DELAY"
+echo '{"targets": [{"target": "'"$2"'", "pwn_num": 0, "data": []}]}' > "$4"
+""",
+}
+
+
+def write_stub_tools(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, script in STUB_TOOLS.items():
+        path = directory / name
+        path.write_text(script)
+        path.chmod(0o755)
+
+
+def migrate(url: str):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+
+def populate(url: str, users: int, rows_per_user: int, anomaly_rate: float):
+    from sqlalchemy import create_engine, insert, text
+
+    from app.models.user_activity import UserActivity
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES " + ", ".join(
+            f"({i}, 'user{i}')" for i in range(1, users + 1)
+        )))
+        for user_id in range(1, users + 1):
+            conn.execute(insert(UserActivity), [
+                {
+                    "user_id": user_id,
+                    "timestamp": now - timedelta(minutes=rng.randrange(60 * 24 * 14)),
+                    "anomaly_score": 0.81 + rng.random() * 0.19 if rng.random() < anomaly_rate else rng.random() * 0.8,
+                    "additional_data": {"features": {
+                        "login_frequency": rng.randint(1, 9),
+                        "location_change": rng.random() < 0.1,
+                        "browser_change": rng.random() < 0.05,
+                    }},
+                }
+                for _ in range(rows_per_user)
+            ])
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir: Path, args) -> subprocess.Popen:
+    """Prepare the stand-ins in ``workdir`` and start uvicorn on them."""
+    database_url = f"sqlite:///{workdir / 'loadtest.db'}"
+    migrate(database_url)
+    populate(database_url, args.users, args.rows_per_user, args.anomaly_rate)
+    write_stub_tools(workdir / "bin")
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "PATH": f"{workdir / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+        "STUB_TOOL_DELAY": str(args.tool_delay),
+        "DATABASE_URL": database_url,
+        "MODEL_STORE_DIR": str(workdir / "model_store"),
+        "OSINT_JOB_DB": str(workdir / "osint_jobs.db"),
+        "OSINT_OUTPUT_DIR": str(workdir / "osint_output"),
+        "SESSION_STORE_PATH": str(workdir / "sessions.db"),
+        "RATE_LIMIT_ENABLED": "false",
+        "RETRAIN_ENABLED": "false",
+        "ACTIVITY_MAINTENANCE_ENABLED": "false",
+    }
+    subprocess.run([sys.executable, "-m", "app.train_models"], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+def activity(user_id: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "timestamp": (datetime.utcnow() - timedelta(minutes=rng.randrange(600))).isoformat(),
+        "login_count": rng.randint(1, 9),
+        "location_changed": rng.random() < 0.1,
+        "browser_changed": rng.random() < 0.05,
+    }
+
+
+def interaction(user_id: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "typing_speed": rng.uniform(20, 80),
+        "click_rate": rng.uniform(5, 40),
+        "error_rate": rng.uniform(0, 0.2),
+        "session_duration": rng.uniform(5, 240),
+        "inactivity_periods": rng.randint(0, 10),
+    }
+
+
+async def wait_for_scan(client: httpx.AsyncClient, scan_id: str, poll_interval: float) -> httpx.Response:
+    while True:
+        response = await client.get(f"/api/v1/osint/scan-results/{scan_id}")
+        if response.status_code != 200 or response.json()["status"] not in ("pending", "running"):
+            return response
+        await asyncio.sleep(poll_interval)
+
+
+def make_request(scenario: str, payload: int, args, state: Dict[str, Any]) -> Callable[[httpx.AsyncClient, int], Awaitable[bool]]:
+    """An async ``request(client, i)`` issuing the scenario's i-th request; True if it succeeded."""
+    rng = random.Random(0)
+
+    if scenario == "threat_analyze":
+        async def send(client, i):
+            user_id = rng.randint(1, args.users)
+            return await client.post("/api/v1/threat-detection/analyze",
+                                     json=[activity(user_id, rng) for _ in range(payload)])
+    elif scenario == "fatigue_analyze":
+        async def send(client, i):
+            return await client.post("/api/v1/fatigue-detection/analyze",
+                                     json=interaction(rng.randint(1, args.users), rng))
+    elif scenario == "session_analyze":
+        async def send(client, i):
+            return await client.post("/api/anomaly/analyze", json={
+                "user_id": str(rng.randint(1, args.users)),
+                "device_id": f"device-{rng.randint(1, 3)}",
+                "typing_speed": rng.uniform(20, 80),
+                "click_rate": rng.uniform(5, 40),
+                "session_duration": rng.uniform(60, 3600),
+                "timestamp": datetime.utcnow().isoformat(),
+            })
+    elif scenario == "recent_anomalies":
+        async def send(client, i):
+            return await client.get(f"/api/v1/threat-detection/recent-anomalies/{rng.randint(1, args.users)}")
+    elif scenario == "osint_scan":
+        async def send(client, i):
+            # A new target each time, so the tools actually run instead of hitting the result cache
+            target = f"lt{state['run']}x{i}"
+            response = await client.post("/api/v1/osint/scan-user-data", json={
+                "email": f"{target}@example.com", "username": target, "domain": f"{target}.example.com",
+            })
+            if response.status_code != 200:
+                return response
+            return await wait_for_scan(client, response.json()["scan_id"], args.poll_interval)
+    elif scenario == "osint_poll":
+        async def send(client, i):
+            return await client.get(f"/api/v1/osint/scan-results/{state['scan_id']}")
+    else:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    async def request(client, i):
+        response = await send(client, i)
+        if response.status_code >= 400:
+            return False
+        # A scan that ended in an error or was cancelled failed too
+        return scenario != "osint_scan" or response.json()["status"] == "completed"
+    return request
+
+
+async def prepare(client: httpx.AsyncClient, scenario: str, args, state: Dict[str, Any]):
+    if scenario == "fatigue_analyze" and "fatigue_trained" not in state:
+        # The fatigue model only scores once a baseline has been trained (per worker process)
+        rng = random.Random(1)
+        for _ in range(args.workers):
+            response = await client.post("/api/v1/fatigue-detection/train-baseline/1",
+                                         json=[interaction(1, rng) for _ in range(200)])
+            response.raise_for_status()
+        state["fatigue_trained"] = True
+    if scenario == "osint_poll" and "scan_id" not in state:
+        response = await client.post("/api/v1/osint/scan-user-data", json={"username": "loadtest-poll"})
+        response.raise_for_status()
+        state["scan_id"] = response.json()["scan_id"]
+        await wait_for_scan(client, state["scan_id"], args.poll_interval)
+
+
+async def run_load(client: httpx.AsyncClient, send, concurrency: int, total: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await send(client, i)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    row: Dict[str, Any] = {"requests": total, "errors": errors, "throughput_rps": round(len(latencies) / elapsed, 1)}
+    if latencies:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        row.update({
+            "p50_ms": round(cuts[49] * 1e3, 2),
+            "p95_ms": round(cuts[94] * 1e3, 2),
+            "p99_ms": round(cuts[98] * 1e3, 2),
+            "max_ms": round(max(latencies) * 1e3, 2),
+        })
+    return row
+
+
+async def run_suite(base_url: str, server: Optional[subprocess.Popen], args, out) -> bool:
+    ok = True
+    state: Dict[str, Any] = {"run": int(time.time())}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await wait_until_ready(client, server)
+        for scenario in args.scenarios:
+            await prepare(client, scenario, args, state)
+            payloads = args.payload_sizes if scenario == "threat_analyze" else [1]
+            for payload in payloads:
+                for concurrency in args.concurrency:
+                    send = make_request(scenario, payload, args, state)
+                    total = args.osint_requests if scenario == "osint_scan" else args.requests
+                    state["run"] += 1
+                    # Warm-up: model loads, per-user training, connection setup
+                    await run_load(client, send, concurrency, min(args.warmup, total))
+                    state["run"] += 1
+                    row = {"label": args.label, "scenario": scenario, "concurrency": concurrency, "payload": payload,
+                           **await run_load(client, send, concurrency, total)}
+                    ok &= row["errors"] == 0
+                    line = json.dumps(row)
+                    print(line, flush=True)
+                    if out is not None:
+                        out.write(line + "\n")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--payload-sizes", nargs="+", type=int, default=[1, 100],
+                        help="activities per threat_analyze request")
+    parser.add_argument("--requests", type=int, default=500, help="requests per run")
+    parser.add_argument("--osint-requests", type=int, default=20, help="scans per osint_scan run")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests before each run")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="OSINT result poll interval (s)")
+    parser.add_argument("--tool-delay", type=float, default=0.2, help="run time of each stub OSINT tool (s)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows-per-user", type=int, default=100)
+    parser.add_argument("--anomaly-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--url", default=None, help="load an already running server instead of starting one")
+    parser.add_argument("--label", default="current", help="copied into every row, to tell runs apart")
+    parser.add_argument("--output", type=Path, default=None, help="also append the rows to this file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        args.port = args.port or free_port()
+        server = start_server(Path(tempfile.mkdtemp(prefix="load_test_")), args)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    out = args.output.open("a") if args.output is not None else None
+    try:
+        ok = asyncio.run(run_suite(base_url, server, args, out))
+    finally:
+        if out is not None:
+            out.close()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
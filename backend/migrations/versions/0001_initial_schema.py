@@ -0,0 +1,61 @@
+"""initial schema: users and user_activities
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Databases whose tables were created before migrations existed can be
+marked as already at this revision with ``alembic stamp 0001``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String()),
+        sa.Column("username", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_superuser", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("last_login", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_ip", sa.String(), nullable=True),
+        sa.Column("user_agent", sa.String(), nullable=True),
+        sa.Column("login_count", sa.Integer()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "user_activities",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("ip_address", sa.String()),
+        sa.Column("location", sa.JSON()),
+        sa.Column("browser_fingerprint", sa.String()),
+        sa.Column("user_agent", sa.String()),
+        sa.Column("activity_type", sa.String()),
+        sa.Column("anomaly_score", sa.Float(), nullable=True),
+        sa.Column("additional_data", sa.JSON()),
+    )
+    op.create_index("ix_user_activities_id", "user_activities", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_activities_id", table_name="user_activities")
+    op.drop_table("user_activities")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
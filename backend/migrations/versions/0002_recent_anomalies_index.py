@@ -0,0 +1,50 @@
+"""partial index for recent anomalies per user
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:01
+
+Serves WHERE user_id = ? AND anomaly_score > 0.8 AND timestamp >= ?
+ORDER BY timestamp DESC, id DESC. Only anomalous rows are indexed, so the
+index stays a small fraction of the table. On Postgres it is built
+CONCURRENTLY so writes to user_activities aren't blocked.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_user_activities_recent_anomalies"
+# Must stay equal to app.models.user_activity.ANOMALY_SCORE_THRESHOLD
+PREDICATE = sa.text("anomaly_score > 0.8")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                INDEX_NAME,
+                "user_activities",
+                ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+                postgresql_where=PREDICATE,
+                postgresql_concurrently=True,
+            )
+    else:
+        op.create_index(
+            INDEX_NAME,
+            "user_activities",
+            ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            sqlite_where=PREDICATE,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(INDEX_NAME, table_name="user_activities", postgresql_concurrently=True)
+    else:
+        op.drop_index(INDEX_NAME, table_name="user_activities")
@@ -0,0 +1,264 @@
+"""daily partitions for user_activities, and hourly rollups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:02
+
+Rebuilds user_activities as one partition per UTC day (see
+app/modules/threat_detection/activity_storage.py for the layout on
+Postgres and SQLite; its DDL is copied here as it was at this revision)
+and creates user_activity_hourly. Existing rows are copied over: days
+within RETENTION_DAYS get their own partitions, older rows land in the
+default partition and go at the next retention run. Rows without a
+timestamp are stamped with the migration time. The copy rewrites the
+whole table, so run it in a quiet period.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Tuple
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Everything below is frozen as of this revision: later changes to
+# app.modules.threat_detection.activity_storage or the settings must not
+# change what this migration does.
+OLD_TABLE = "user_activities_unpartitioned"
+PARTITION_PREFIX = "user_activities_p"
+DEFAULT_PARTITION = "user_activities_default"
+SQLITE_ID_SEQUENCE = "user_activities_id_seq"
+COLUMNS = (
+    "id", "user_id", "timestamp", "ip_address", "location", "browser_fingerprint",
+    "user_agent", "activity_type", "anomaly_score", "additional_data",
+)
+COLUMN_LIST = ", ".join(COLUMNS)
+# Defaults of ACTIVITY_RETENTION_DAYS and ACTIVITY_PARTITIONS_AHEAD_DAYS;
+# maintenance brings the partitions in line with the configured values
+RETENTION_DAYS = 90
+PARTITIONS_AHEAD_DAYS = 7
+# Must stay equal to app.models.user_activity.ANOMALY_SCORE_THRESHOLD
+PREDICATE = sa.text("anomaly_score > 0.8")
+
+SQLITE_COLUMNS = """(
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER REFERENCES users (id),
+    timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ip_address VARCHAR,
+    location JSON,
+    browser_fingerprint VARCHAR,
+    user_agent VARCHAR,
+    activity_type VARCHAR,
+    anomaly_score FLOAT,
+    additional_data JSON
+)"""
+
+
+def _partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _partition_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def _bind(postgres: bool, value: datetime):
+    # On SQLite, the format SQLAlchemy stores DateTime values in, so text comparisons agree
+    return value.replace(tzinfo=timezone.utc) if postgres else value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _create_partition_table(bind, postgres: bool, name: str):
+    if postgres:
+        bind.exec_driver_sql(f"CREATE TABLE {name} (LIKE user_activities INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    else:
+        bind.exec_driver_sql(f"CREATE TABLE {name} {SQLITE_COLUMNS}")
+    bind.exec_driver_sql(
+        f"CREATE INDEX ix_{name}_recent_anomalies ON {name} (user_id, timestamp DESC, id DESC) "
+        f"WHERE anomaly_score > 0.8"
+    )
+
+
+def _create_default_partition(bind, postgres: bool):
+    if postgres:
+        _create_partition_table(bind, postgres, DEFAULT_PARTITION)
+        bind.exec_driver_sql(f"ALTER TABLE user_activities ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    else:
+        bind.exec_driver_sql(f"CREATE TABLE {SQLITE_ID_SEQUENCE} (last_value INTEGER NOT NULL)")
+        bind.exec_driver_sql(f"INSERT INTO {SQLITE_ID_SEQUENCE} (last_value) VALUES (0)")
+        _create_partition_table(bind, postgres, DEFAULT_PARTITION)
+
+
+def _create_partition(bind, postgres: bool, day: date):
+    name = _partition_name(day)
+    start, end = _partition_bounds(day)
+    _create_partition_table(bind, postgres, name)
+    params = {"start": _bind(postgres, start), "end": _bind(postgres, end)}
+    if postgres:
+        # Attaching fails while the default partition holds rows of the new range
+        bind.execute(sa.text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), params)
+        bind.exec_driver_sql(
+            f"ALTER TABLE user_activities ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}+00') TO ('{end.isoformat()}+00')"
+        )
+    else:
+        where = "WHERE timestamp >= :start AND timestamp < :end"
+        bind.execute(sa.text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} {where}"), params)
+        bind.execute(sa.text(f"DELETE FROM {DEFAULT_PARTITION} {where}"), params)
+
+
+def _create_sqlite_view(bind, days: List[date]):
+    """The user_activities view over the partitions, and its routing insert trigger."""
+    tables = [DEFAULT_PARTITION] + [_partition_name(day) for day in days]
+    bind.exec_driver_sql(
+        "CREATE VIEW user_activities AS " + " UNION ALL ".join(f"SELECT * FROM {t}" for t in tables)
+    )
+
+    # Views have no column defaults, so the trigger fills in timestamp and id
+    stamp = "COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)"
+    values = ", ".join(
+        [f"COALESCE(NEW.id, (SELECT last_value FROM {SQLITE_ID_SEQUENCE}))", "NEW.user_id", stamp]
+        + [f"NEW.{column}" for column in COLUMNS[3:]]
+    )
+
+    def in_range(start: datetime, end: datetime) -> str:
+        return f"{stamp} >= '{_bind(False, start)}' AND {stamp} < '{_bind(False, end)}'"
+
+    # The days are consecutive, so together they cover one range
+    routes = [(_partition_name(day), in_range(*_partition_bounds(day))) for day in days]
+    covered = in_range(_partition_bounds(days[0])[0], _partition_bounds(days[-1])[1])
+    routes.append((DEFAULT_PARTITION, f"NOT ({covered})"))
+    inserts = "".join(
+        f"INSERT INTO {table} ({COLUMN_LIST}) SELECT {values} WHERE {condition};\n"
+        for table, condition in routes
+    )
+    bind.exec_driver_sql(
+        f"CREATE TRIGGER user_activities_insert INSTEAD OF INSERT ON user_activities\nBEGIN\n"
+        f"UPDATE {SQLITE_ID_SEQUENCE} SET last_value = "
+        f"CASE WHEN NEW.id IS NULL THEN last_value + 1 ELSE max(last_value, NEW.id) END;\n"
+        f"{inserts}END"
+    )
+
+
+def _activity_columns():
+    return [
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("ip_address", sa.String()),
+        sa.Column("location", sa.JSON()),
+        sa.Column("browser_fingerprint", sa.String()),
+        sa.Column("user_agent", sa.String()),
+        sa.Column("activity_type", sa.String()),
+        sa.Column("anomaly_score", sa.Float(), nullable=True),
+        sa.Column("additional_data", sa.JSON()),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    postgres = bind.dialect.name == "postgresql"
+
+    op.rename_table("user_activities", OLD_TABLE)
+    if postgres:
+        # Frees the names the partitioned table's own constraint and index take
+        op.execute(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT user_activities_pkey TO {OLD_TABLE}_pkey")
+        op.execute(f"ALTER INDEX ix_user_activities_recent_anomalies RENAME TO ix_{OLD_TABLE}_recent_anomalies")
+        # Ids continue from the existing sequence
+        op.create_table(
+            "user_activities",
+            sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('user_activities_id_seq')")),
+            sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            *_activity_columns(),
+            sa.PrimaryKeyConstraint("id", "timestamp"),
+            postgresql_partition_by="RANGE (timestamp)",
+        )
+        op.execute("ALTER SEQUENCE user_activities_id_seq OWNED BY user_activities.id")
+        op.create_index(
+            "ix_user_activities_recent_anomalies",
+            "user_activities",
+            ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_where=PREDICATE,
+        )
+
+    _create_default_partition(bind, postgres)
+    today = datetime.utcnow().date()
+    oldest = bind.execute(
+        sa.text(f"SELECT min(timestamp) FROM {OLD_TABLE} WHERE timestamp >= :cutoff"),
+        {"cutoff": _bind(postgres, datetime.utcnow() - timedelta(days=RETENTION_DAYS))},
+    ).scalar()
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+    first_day = min(oldest.date(), today) if oldest is not None else today
+    days = [first_day + timedelta(days=i) for i in range((today - first_day).days + PARTITIONS_AHEAD_DAYS + 1)]
+    for day in days:
+        _create_partition(bind, postgres, day)
+    if not postgres:
+        _create_sqlite_view(bind, days)
+
+    now = "now()" if postgres else "CURRENT_TIMESTAMP"
+    op.execute(
+        f"INSERT INTO user_activities ({COLUMN_LIST}) "
+        f"SELECT {COLUMN_LIST.replace('timestamp', f'COALESCE(timestamp, {now})')} FROM {OLD_TABLE}"
+    )
+    # (On SQLite the insert trigger advances the id sequence past the copied ids)
+    op.drop_table(OLD_TABLE)
+
+    op.create_table(
+        "user_activity_hourly",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("hour", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("activity_count", sa.Integer(), nullable=False),
+        sa.Column("anomaly_count", sa.Integer(), nullable=False),
+        sa.Column("max_anomaly_score", sa.Float(), nullable=True),
+        sa.Column("mean_anomaly_score", sa.Float(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    postgres = bind.dialect.name == "postgresql"
+
+    op.drop_table("user_activity_hourly")
+
+    op.create_table(
+        OLD_TABLE,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        *_activity_columns(),
+    )
+    op.execute(f"INSERT INTO {OLD_TABLE} ({COLUMN_LIST}) SELECT {COLUMN_LIST} FROM user_activities")
+    if postgres:
+        # Drops every partition, and the sequence it owns
+        op.execute("DROP TABLE user_activities")
+        op.execute(f"SELECT setval(pg_get_serial_sequence('{OLD_TABLE}', 'id'), coalesce(max(id), 0) + 1, false) "
+                   f"FROM {OLD_TABLE}")
+    else:
+        # Partitions maintenance created since are dropped along with the migration's own
+        partitions = bind.execute(
+            sa.text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix"),
+            {"prefix": PARTITION_PREFIX + "%"},
+        ).scalars().all()
+        op.execute("DROP VIEW user_activities")
+        for name in partitions:
+            op.execute(f"DROP TABLE {name}")
+        op.execute(f"DROP TABLE {DEFAULT_PARTITION}")
+        op.execute(f"DROP TABLE {SQLITE_ID_SEQUENCE}")
+    op.rename_table(OLD_TABLE, "user_activities")
+    if postgres:
+        op.execute(f"ALTER TABLE user_activities RENAME CONSTRAINT {OLD_TABLE}_pkey TO user_activities_pkey")
+        op.execute(f"ALTER SEQUENCE {OLD_TABLE}_id_seq RENAME TO user_activities_id_seq")
+
+    op.create_index("ix_user_activities_id", "user_activities", ["id"])
+    op.create_index(
+        "ix_user_activities_recent_anomalies",
+        "user_activities",
+        ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+        postgresql_where=PREDICATE,
+        sqlite_where=PREDICATE,
+    )
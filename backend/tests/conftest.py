@@ -0,0 +1,52 @@
+"""
+Shared fixtures. Settings and the database engine are read when app modules
+are first imported, so the test environment is set up here, before any of
+them are: a scratch SQLite database migrated to head, a scratch model store,
+and no background retraining or storage maintenance.
+"""
+import os
+import tempfile
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="digitalshepard-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(SCRATCH_DIR, 'test.db')}")
+os.environ.setdefault("DATA_DIR", SCRATCH_DIR)
+os.environ.setdefault("MODEL_STORE_DIR", os.path.join(SCRATCH_DIR, "model_store"))
+os.environ.setdefault("RETRAIN_ENABLED", "false")
+os.environ.setdefault("ACTIVITY_MAINTENANCE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import pytest  # noqa: E402
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def alembic_config(url: str) -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    return config
+
+
+def migrate(url: str):
+    command.upgrade(alembic_config(url), "head")
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    """The app's database, migrated to head."""
+    url = os.environ["DATABASE_URL"]
+    migrate(url)
+    return url
+
+
+@pytest.fixture(scope="session")
+def client(database_url):
+    """A TestClient on the app, with its lifespan (and model warmup) run."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.modules.threat_detection.activity_writer import activity_rows, invalidate_feeds
+from app.modules.threat_detection.feed_cache import get_feed_cache
+
+
+def _result(timestamp: str, score: float) -> dict:
+    return {"timestamp": timestamp, "anomaly_score": score, "is_anomaly": score > 0.8, "features": {}}
+
+
+def test_activity_rows_keep_normal_activity():
+    results = [_result("2026-01-01T10:00:00", 0.2), _result("2026-01-01T11:00:00", 0.95)]
+
+    rows = activity_rows(3, results)
+
+    assert [row["anomaly_score"] for row in rows] == [0.2, 0.95]
+    assert all(row["user_id"] == 3 for row in rows)
+
+
+def test_invalidate_feeds_only_for_users_with_new_anomalies():
+    feed_cache = get_feed_cache()
+
+    async def load_feeds():
+        for user_id in (1, 2):
+            await feed_cache.get_or_load((user_id, 10, None), lambda: ([], None))
+
+    asyncio.run(load_feeds())
+
+    invalidate_feeds(activity_rows(1, [_result("2026-01-01T10:00:00", 0.2)])
+                     + activity_rows(2, [_result("2026-01-01T10:00:00", 0.9)]))
+
+    assert feed_cache.get((1, 10, None)) is not None
+    assert feed_cache.get((2, 10, None)) is None
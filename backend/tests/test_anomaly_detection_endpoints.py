@@ -0,0 +1,12 @@
+from datetime import datetime
+
+
+def test_v1_analyze_uses_the_feature_store(client):
+    # A client-supplied login count is replaced by what the feature store counted
+    response = client.post(
+        "/api/v1/anomaly-detection/analyze",
+        json={"user_id": 9025, "timestamp": datetime.utcnow().isoformat(), "login_count": 500},
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["features"]["login_frequency"] == 1
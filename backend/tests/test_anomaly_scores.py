@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.modules.threat_detection.anomaly_detector import AnomalyDetector, generate_mock_data, result_dicts
+
+
+def _detector():
+    detector = AnomalyDetector()
+    detector.train(generate_mock_data(200))
+    return detector
+
+
+def test_scores_do_not_depend_on_the_batch():
+    detector = _detector()
+    activities = generate_mock_data(50)
+
+    batch = [result["anomaly_score"] for result in detector.detect_anomalies(activities)]
+    single = [detector.detect_anomalies([activity])[0]["anomaly_score"] for activity in activities]
+
+    assert np.allclose(batch, single)
+
+
+def test_flags_are_scores_above_the_threshold():
+    detector = _detector()
+    activities = generate_mock_data(200)
+    activities[0] = {**activities[0], "login_count": 500, "location_changed": True, "browser_changed": True}
+
+    results = detector.detect_anomalies(activities)
+    scores = np.array([result["anomaly_score"] for result in results])
+    flags = np.array([result["is_anomaly"] for result in results])
+
+    assert ((scores >= 0) & (scores <= 1)).all()
+    assert (flags == (scores > 0.8)).all()
+    assert results[0]["is_anomaly"]
+
+
+def test_columnar_and_dict_results_agree():
+    detector = _detector()
+    activities = [{**activity, "timestamp": activity["timestamp"].isoformat()} for activity in generate_mock_data(50)]
+    columns = {
+        "timestamp": np.array([activity["timestamp"] for activity in activities]),
+        **{
+            field: np.array([activity[field] for activity in activities])
+            for field in ("login_count", "location_changed", "browser_changed")
+        },
+    }
+
+    assert result_dicts(columns["timestamp"], detector.detect_anomaly_columns(columns)) == (
+        detector.detect_anomalies(activities)
+    )
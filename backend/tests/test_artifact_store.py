@@ -0,0 +1,80 @@
+import pytest
+
+from app.core.settings import get_settings
+from app.modules.model_store.artifact_store import (
+    ArtifactIntegrityError,
+    LazyArtifact,
+    MODEL_FILE,
+    ModelArtifactStore,
+    RetrainableArtifact,
+    get_model_store,
+)
+
+
+def test_lazy_artifact_picks_up_a_new_version(tmp_path):
+    store = ModelArtifactStore(str(tmp_path))
+    store.save("model", {"weights": 1})
+    artifact = LazyArtifact(store, "model", check_seconds=0)
+    assert artifact.get() == {"weights": 1}
+
+    store.save("model", {"weights": 2})
+
+    assert artifact.get() == {"weights": 2}
+    assert artifact.version == 2
+
+
+def test_lazy_artifact_checks_at_most_every_check_seconds(tmp_path):
+    store = ModelArtifactStore(str(tmp_path))
+    store.save("model", {"weights": 1})
+    artifact = LazyArtifact(store, "model", check_seconds=3600)
+    artifact.get()
+
+    store.save("model", {"weights": 2})
+
+    assert artifact.get() == {"weights": 1}
+
+
+def test_lazy_artifact_keeps_serving_when_a_new_version_is_corrupt(tmp_path):
+    store = ModelArtifactStore(str(tmp_path))
+    store.save("model", {"weights": 1})
+    artifact = LazyArtifact(store, "model", check_seconds=0)
+    artifact.get()
+    store.save("model", {"weights": 2})
+    (tmp_path / "model" / "v2" / MODEL_FILE).write_bytes(b"corrupt")
+
+    assert artifact.get() == {"weights": 1}
+    with pytest.raises(ArtifactIntegrityError):
+        store.load("model", 2)
+
+
+def test_retrained_model_is_served_until_a_new_artifact_is_published(tmp_path):
+    store = ModelArtifactStore(str(tmp_path))
+    artifact = RetrainableArtifact(LazyArtifact(store, "model", fallback=lambda: {"weights": 0}, check_seconds=0))
+    assert artifact.get() == {"weights": 0}
+
+    artifact.swap({"weights": "retrained"})
+    assert artifact.get() == {"weights": "retrained"}
+
+    store.save("model", {"weights": 1})
+    assert artifact.get() == {"weights": 1}
+
+
+def test_save_keeps_only_the_last_versions(tmp_path):
+    store = ModelArtifactStore(str(tmp_path), keep_versions=2)
+    for i in range(4):
+        store.save("model", {"i": i})
+
+    assert store.versions("model") == [3, 4]
+    assert store.load("model") == {"i": 3}
+
+
+def test_default_store_lives_under_the_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("MODEL_STORE_DIR", raising=False)
+    get_settings.cache_clear()
+    get_model_store.cache_clear()
+    try:
+        assert get_model_store().root == tmp_path / "model_store"
+    finally:
+        get_settings.cache_clear()
+        get_model_store.cache_clear()
@@ -0,0 +1,38 @@
+import asyncio
+
+from app.core.batching import MicroBatcher
+
+
+class _DirectExecutor:
+    async def run(self, name, fn, *args, local=False):
+        return fn(*args)
+
+
+class _Target:
+    def __init__(self, drop: int = 0):
+        self.drop = drop
+
+    def score(self, items):
+        return [item * 2 for item in items][:len(items) - self.drop]
+
+
+def _submit_all(target, items):
+    batcher = MicroBatcher("test", "score", max_batch_size=len(items), executor=_DirectExecutor())
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(target, item) for item in items), return_exceptions=True), 1.0
+        )
+
+    return asyncio.run(main())
+
+
+def test_each_caller_gets_its_result():
+    assert _submit_all(_Target(), [1, 2, 3]) == [2, 4, 6]
+
+
+def test_short_result_fails_the_leftover_callers():
+    results = _submit_all(_Target(drop=1), [1, 2, 3])
+
+    assert results[:2] == [2, 4]
+    assert isinstance(results[2], RuntimeError)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from pyod.models.iforest import IForest
+from sklearn.ensemble import IsolationForest
+
+from app.modules.threat_detection.compiled_forest import CompiledForest
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    train = rng.normal(size=(3_000, 5))
+    # Wider than the training data so plenty of rows fall outside every split
+    probe = rng.normal(scale=3.0, size=(5_000, 5))
+    return train, probe
+
+
+@pytest.mark.parametrize("max_samples", ["auto", 50, 1_000])
+@pytest.mark.parametrize("max_features", [1.0, 0.6])
+def test_matches_sklearn_exactly(data, max_features, max_samples):
+    train, probe = data
+    forest = IsolationForest(random_state=42, max_features=max_features, max_samples=max_samples).fit(train)
+    compiled = CompiledForest.from_sklearn(forest)
+
+    assert np.array_equal(forest.score_samples(probe), compiled.score_samples(probe))
+    assert np.array_equal(forest.decision_function(probe), compiled.decision_function(probe))
+
+
+def test_matches_pyod_exactly(data):
+    train, probe = data
+    model = IForest(n_estimators=100, contamination=0.1, random_state=42).fit(train[:, :4])
+    compiled = CompiledForest.from_pyod(model)
+
+    assert np.array_equal(model.decision_function(probe[:, :4]), -compiled.decision_function(probe[:, :4]))
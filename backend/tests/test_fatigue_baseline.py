@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.modules.fatigue_detection.baseline import MIN_SAMPLES_FOR_STD, BaselineStore
+from app.modules.fatigue_detection.fatigue_monitor import FatigueMonitor, get_fatigue_model
+
+
+def _sample(typing_speed: float, click_rate: float = 30.0) -> dict:
+    return {
+        "typing_speed": typing_speed,
+        "click_rate": click_rate,
+        "error_rate": 0.02,
+        "session_duration": 60.0,
+        "inactivity_periods": 1,
+    }
+
+
+def test_streaming_stats_match_numpy():
+    speeds = np.random.default_rng(0).normal(60, 8, 500)
+    store = BaselineStore()
+    for speed in speeds:
+        store.update(1, _sample(speed))
+
+    stats = store.get(1).typing_speed
+    assert stats.count == 500
+    assert np.isclose(stats.mean, speeds.mean())
+    assert np.isclose(stats.std, speeds.std(ddof=1))
+
+
+def test_typing_decline_allows_for_a_users_usual_spread():
+    store = BaselineStore()
+    for speed in [30.0, 90.0] * MIN_SAMPLES_FOR_STD:  # mean 60, std ~30.8
+        store.update(1, _sample(speed))
+    for _ in range(2 * MIN_SAMPLES_FOR_STD):  # mean 60, std 0
+        store.update(2, _sample(60.0))
+    monitor = FatigueMonitor()
+
+    # 40 wpm is under 70% of 60 for both users, but within two std devs for user 1
+    assert not monitor.build_result(_sample(40.0), 0.1, store.get(1))["indicators"]["typing_speed_decline"]
+    assert monitor.build_result(_sample(40.0), 0.1, store.get(2))["indicators"]["typing_speed_decline"]
+
+
+def test_train_baseline_keeps_the_shared_model(client):
+    shared = get_fatigue_model().model
+    history = [{"user_id": 5, **_sample(70.0 + i % 5)} for i in range(20)]
+
+    response = client.post("/api/v1/fatigue-detection/train-baseline/5", json=history)
+
+    assert response.status_code == 200
+    assert get_fatigue_model().model is shared
+    baseline = client.get("/api/v1/fatigue-detection/baseline/5").json()
+    assert baseline["typing_speed"]["count"] == 20
+    assert np.isclose(baseline["typing_speed"]["mean"], 72.0)
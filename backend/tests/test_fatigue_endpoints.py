@@ -0,0 +1,70 @@
+import time
+
+
+def _wait_ready(client):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response.json()
+        assert response.json()["status"] != "failed", response.json()
+        time.sleep(0.05)
+    raise AssertionError("models never became ready")
+
+
+def _interaction(**overrides):
+    return {
+        "typing_speed": 58.0,
+        "click_rate": 40.0,
+        "error_rate": 0.03,
+        "session_duration": 90.0,
+        "inactivity_periods": 2,
+        **overrides,
+    }
+
+
+def test_ready_means_the_fatigue_model_can_score(client):
+    status = _wait_ready(client)
+    assert status["steps"]["fatigue"]["status"] == "ready"
+
+    response = client.post("/api/v1/fatigue-detection/analyze", json={"user_id": 20, **_interaction()})
+
+    assert response.status_code == 200, response.text
+    assert isinstance(response.json()["fatigue_score"], float)
+
+
+def test_series_scores_each_sample_and_feeds_retraining(client):
+    from app.modules.fatigue_detection.fatigue_monitor import get_fatigue_samples
+
+    _wait_ready(client)
+    reservoir = get_fatigue_samples()
+    reservoir.drain(0)
+    samples = [
+        {**_interaction(typing_speed=60.0 - 3 * i, error_rate=0.02 + 0.02 * i, session_duration=30.0 * (i + 1)),
+         "timestamp": f"2026-03-02T{9 + i:02d}:00:00"}
+        for i in range(8)
+    ]
+
+    response = client.post("/api/v1/fatigue-detection/analyze/series", json={"user_id": 21, "samples": samples})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body["samples"]) == len(samples)
+    assert body["trend"]["unit"] == "hour"
+    assert body["samples"][-1]["indicators"]["high_error_rate"]
+    rows, seen = reservoir.drain(0)
+    assert seen == len(samples) and len(rows) == len(samples)
+
+
+def test_series_trend_mixes_naive_and_aware_timestamps(client):
+    _wait_ready(client)
+    samples = [
+        {**_interaction(), "timestamp": "2026-03-02T09:00:00"},
+        {**_interaction(), "timestamp": "2026-03-02T12:00:00+02:00"},
+        {**_interaction(), "timestamp": "2026-03-02T11:00:00Z"},
+    ]
+
+    response = client.post("/api/v1/fatigue-detection/analyze/series", json={"user_id": 22, "samples": samples})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["trend"]["unit"] == "hour"
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.modules.threat_detection.feed_cache import FeedCache
+
+
+class _Loader:
+    """Feed loader that counts its calls, i.e. the cache misses."""
+
+    def __init__(self, items=(), on_load=None):
+        self.items = list(items)
+        self.on_load = on_load
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.on_load is not None:
+            self.on_load()
+        return self.items, None
+
+
+def test_invalidation_by_string_user_id_reaches_int_keys():
+    cache = FeedCache()
+    loader = _Loader([{"a": 1}])
+
+    async def main():
+        await cache.get_or_load((42, 10, None), loader)
+        await cache.get_or_load((42, 10, None), loader)
+        cache.invalidate_user("42")
+        await cache.get_or_load((42, 10, None), loader)
+
+    asyncio.run(main())
+
+    assert loader.calls == 2
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = FeedCache()
+    racing = _Loader(on_load=lambda: cache.invalidate_user(7))
+    loader = _Loader()
+
+    async def main():
+        await cache.get_or_load((7, 10, None), racing)
+        await cache.get_or_load((7, 10, None), loader)
+
+    asyncio.run(main())
+
+    assert loader.calls == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_per_user_state_does_not_outlive_the_entries():
+    cache = FeedCache(max_entries=5)
+
+    async def main():
+        for user_id in range(100):
+            await cache.get_or_load((user_id, 10, None), _Loader())
+            if user_id % 2:
+                cache.invalidate_user(user_id)
+
+    asyncio.run(main())
+
+    stats = cache.stats()
+    assert stats["entries"] == stats["users"] <= 5
+    assert stats["loading_users"] == 0
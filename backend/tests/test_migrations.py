@@ -0,0 +1,36 @@
+import os
+from datetime import datetime, timedelta
+
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from .conftest import alembic_config
+
+
+def test_partitioning_keeps_rows_through_upgrade_and_downgrade(tmp_path):
+    url = f"sqlite:///{os.path.join(tmp_path, 'migrate.db')}"
+    config = alembic_config(url)
+    command.upgrade(config, "0002")
+    engine = create_engine(url)
+    now = datetime.utcnow()
+    stamps = [now - timedelta(days=400), now - timedelta(days=2), now]
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES (1, 'user1')"))
+        for i, stamp in enumerate(stamps, start=1):
+            conn.execute(
+                text("INSERT INTO user_activities (id, user_id, timestamp, anomaly_score) VALUES (:id, 1, :ts, 0.9)"),
+                {"id": i, "ts": stamp.strftime("%Y-%m-%d %H:%M:%S.%f")},
+            )
+
+    command.upgrade(config, "head")
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT count(*) FROM user_activities")).scalar() == 3
+        # Too old for a partition of its own
+        assert conn.execute(text("SELECT id FROM user_activities_default")).scalars().all() == [1]
+        conn.execute(text("INSERT INTO user_activities (user_id, anomaly_score) VALUES (1, 0.1)"))
+        assert conn.execute(text("SELECT max(id) FROM user_activities")).scalar() == 4
+
+    command.downgrade(config, "0002")
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT id FROM user_activities ORDER BY id")).scalars().all() == [1, 2, 3, 4]
+    engine.dispose()
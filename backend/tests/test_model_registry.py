@@ -0,0 +1,64 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.modules.threat_detection.anomaly_detector import AnomalyDetector
+from app.modules.threat_detection.model_registry import ModelRegistry
+
+
+def _history(n: int = 60):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"timestamp": start + timedelta(hours=i), "login_count": i % 5, "location_changed": False, "browser_changed": False}
+        for i in range(n)
+    ]
+
+
+def _population():
+    population = AnomalyDetector()
+    population.train(_history())
+    return population
+
+
+def test_concurrent_misses_train_once():
+    registry = ModelRegistry(_population(), min_samples=10)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return _history()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(7, loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({id(detector) for detector in results}) == 1
+    assert registry.stats()["trained"] == 1
+
+
+def test_spill_directory_is_bounded(tmp_path):
+    registry = ModelRegistry(_population(), max_models=1, spill_dir=str(tmp_path), max_spilled=2, min_samples=10)
+
+    for user_id in range(6):
+        registry.get(user_id, _history)
+
+    assert len(list(tmp_path.glob("user_*.joblib"))) == 2
+    stats = registry.stats()
+    assert stats["spills"] == 5 and stats["spill_deletes"] == 3 and stats["spilled_models"] == 2
+
+
+def test_reloaded_spill_is_removed_from_disk(tmp_path):
+    registry = ModelRegistry(_population(), max_models=1, spill_dir=str(tmp_path), min_samples=10)
+    registry.get(1, _history)
+    registry.get(2, _history)  # spills user 1
+
+    registry.get(1, lambda: [])  # reloaded from the spill, not retrained
+
+    assert registry.stats()["spill_loads"] == 1
+    # user 2 was spilled in turn; user 1's file is gone
+    assert len(list(tmp_path.glob("user_*.joblib"))) == 1
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.core.ndjson_stream import NDJSONPipeline
+
+
+async def _echo(objects):
+    return objects
+
+
+def test_lines_come_back_in_order_with_errors_in_place():
+    pipeline = NDJSONPipeline("test_order", _echo, chunk_size=2)
+
+    async def body():
+        yield b'{"a": 1}\n[1]\n{"a"'
+        yield b': 2}\nnot json\n'
+
+    async def main():
+        return b"".join([chunk async for chunk in pipeline.run(body())])
+
+    lines = asyncio.run(main()).splitlines()
+
+    assert lines[0] == b'{"line":1,"a":1}'
+    assert lines[1] == b'{"line":2,"error":"expected a JSON object"}'
+    assert lines[2] == b'{"line":3,"a":2}'
+    assert lines[3].startswith(b'{"line":4,"error":"invalid JSON')
+
+
+def test_reader_stops_when_the_response_side_goes_away():
+    pipeline = NDJSONPipeline("test_cancel", _echo, chunk_size=1, max_pending_chunks=1)
+
+    async def body():
+        while True:
+            yield b'{"a": 1}\n' * 10
+
+    async def main():
+        stream = pipeline.run(body())
+        await stream.__anext__()
+        # The reader is now waiting on a full queue
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return [task for task in asyncio.all_tasks() if not task.done() and task is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from app.core.settings import get_settings
+from app.modules.osint.jobs import COMPLETED, OSINTJobManager, OSINTJobStore, get_osint_jobs
+
+
+class _Scanner:
+    tool_concurrency = {}
+    tool_timeouts = {}
+    result_cache = None
+
+    async def scan_user_data(self, request, emit):
+        return {"target": request["target"]}
+
+    def cleanup(self):
+        pass
+
+
+class _RecordingStore(OSINTJobStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def claim(self, scan_id, owner):
+        self.threads.add(threading.get_ident())
+        return super().claim(scan_id, owner)
+
+    def heartbeat(self, scan_ids, owner):
+        self.threads.add(threading.get_ident())
+        return super().heartbeat(scan_ids, owner)
+
+
+def test_jobs_run_with_store_io_off_the_event_loop(tmp_path):
+    store = _RecordingStore(str(tmp_path / "jobs.db"))
+    manager = OSINTJobManager(_Scanner(), store, max_concurrent_jobs=1, maintenance_interval=0.01)
+
+    async def main():
+        job = await manager.submit({"target": "example.com"})
+        for _ in range(200):
+            job = await manager.get(job["scan_id"])
+            if job["status"] == COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # let maintenance heartbeat at least once
+        await manager.stop()
+        return job, threading.get_ident()
+
+    job, loop_thread = asyncio.run(main())
+
+    assert job["status"] == COMPLETED
+    assert job["results"] == {"target": "example.com"}
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_job_db_lives_under_the_data_dir():
+    settings = get_settings()
+    assert get_osint_jobs().store.path == settings.data_path(settings.OSINT_JOB_DB)
+    assert get_osint_jobs().store.path.startswith(settings.DATA_DIR)
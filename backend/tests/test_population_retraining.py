@@ -0,0 +1,52 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.modules.threat_detection.activity_writer import activity_rows, insert_activities
+from app.modules.threat_detection.model_registry import sample_recent_history, train_population_model
+
+from .conftest import migrate
+
+
+def _traffic(n: int, seed: int):
+    """Mostly ordinary logins, with a few bursts from new places and browsers."""
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    return [
+        {
+            "timestamp": now - timedelta(minutes=int(rng.integers(1, 600))),
+            "login_count": int(rng.integers(30, 60)) if i % 20 == 0 else int(rng.integers(1, 5)),
+            "location_changed": i % 20 == 0,
+            "browser_changed": i % 20 == 0,
+        }
+        for i in range(n)
+    ]
+
+
+def test_population_retrained_on_stored_traffic_still_flags_outliers(tmp_path):
+    url = f"sqlite:///{os.path.join(tmp_path, 'retrain.db')}"
+    migrate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES (1, 'user1')"))
+    session_factory = sessionmaker(bind=engine)
+
+    # Score traffic with the default population model and store it, as the API does
+    scorer = train_population_model()
+    insert_activities(session_factory, activity_rows(1, scorer.detect_anomalies(_traffic(2_000, seed=0))))
+
+    history, seen = sample_recent_history(session_factory, window_hours=24, k=1_000)
+    assert seen == 2_000
+    retrained = train_population_model(history)
+
+    # Mid-window, so the hour of day alone doesn't make the normal login stand out
+    midway = datetime.utcnow() - timedelta(hours=5)
+    normal = {"timestamp": midway, "login_count": 2, "location_changed": False, "browser_changed": False}
+    outlier = {"timestamp": midway, "login_count": 50, "location_changed": True, "browser_changed": True}
+    normal_result, outlier_result = retrained.detect_anomalies([normal, outlier])
+    assert outlier_result["anomaly_score"] > normal_result["anomaly_score"]
+    assert outlier_result["is_anomaly"] and not normal_result["is_anomaly"]
+    engine.dispose()
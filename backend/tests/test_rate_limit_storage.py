@@ -0,0 +1,39 @@
+import sqlite3
+import time
+
+from prometheus_client import REGISTRY
+
+from app.middleware.rate_limit_storage import SQLiteStorage
+
+
+def _busy() -> float:
+    return REGISTRY.get_sample_value("rate_limit_storage_busy_total") or 0.0
+
+
+def test_sliding_window_enforces_the_limit(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path / 'ratelimit.db'}")
+
+    assert [storage.acquire_sliding_window_entry("ip", 3, 60) for _ in range(4)] == [True, True, True, False]
+
+
+def test_locked_store_fails_open_without_stalling(tmp_path):
+    path = tmp_path / "ratelimit.db"
+    storage = SQLiteStorage(f"sqlite:///{path}")
+    busy = _busy()
+
+    # Another worker holding the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.perf_counter()
+        allowed = [storage.acquire_sliding_window_entry("ip", 1, 60) for _ in range(3)]
+        elapsed = time.perf_counter() - start
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert allowed == [True, True, True]
+    assert elapsed < 0.5
+    assert _busy() - busy == 3
+    # Hits let through while locked weren't counted
+    assert storage.get_sliding_window("ip", 60)[2] == 0
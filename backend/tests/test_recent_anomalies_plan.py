@@ -0,0 +1,89 @@
+"""
+The recent-anomalies query is planned on ix_user_activities_recent_anomalies
+(on each day partition's copy of it), and keyset pagination over it
+returns every anomaly once, newest first.
+"""
+import os
+import random
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user_activity import UserActivity
+from app.modules.threat_detection.anomaly_queries import get_recent_anomalies, recent_anomalies_query
+
+from .conftest import migrate
+
+INDEX_NAME = "ix_user_activities_recent_anomalies"
+# user_activities is partitioned by day; every partition has its own copy of the index
+PARTITION_INDEX = re.compile(r"ix_user_activities_\w+_recent_anomalies")
+PAGE_SIZE = 10
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    url = f"sqlite:///{os.path.join(tmp_path_factory.mktemp('plan'), 'plan.db')}"
+    migrate(url)
+    engine = create_engine(url)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES " + ", ".join(
+            f"({i}, 'user{i}')" for i in range(1, 21)
+        )))
+        for user_id in range(1, 21):
+            conn.execute(insert(UserActivity), [
+                {
+                    "user_id": user_id,
+                    "timestamp": now - timedelta(minutes=rng.randrange(60 * 24 * 14)),
+                    "anomaly_score": 0.81 + rng.random() * 0.19 if rng.random() < 0.05 else rng.random() * 0.8,
+                    "additional_data": {},
+                }
+                for _ in range(2_000)
+            ])
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+def _plan(engine, stmt) -> str:
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = compiled.params
+    if compiled.positiontup is not None:
+        params = tuple(params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return "\n".join(" ".join(str(col) for col in row) for row in rows)
+
+
+def test_first_and_cursor_pages_use_the_index(engine):
+    since = datetime.utcnow() - timedelta(days=7)
+    with sessionmaker(bind=engine)() as db:
+        _, cursor = get_recent_anomalies(db, 1, limit=PAGE_SIZE)
+    assert cursor is not None
+
+    for cursor_arg in (None, cursor):
+        plan = _plan(engine, recent_anomalies_query(1, since, PAGE_SIZE + 1, cursor_arg))
+        assert INDEX_NAME in plan or PARTITION_INDEX.search(plan), plan
+
+
+def test_pagination_returns_every_anomaly_once_newest_first(engine):
+    since = datetime.utcnow() - timedelta(days=7)
+    with sessionmaker(bind=engine)() as db:
+        expected = db.execute(
+            select(UserActivity.timestamp)
+            .where(UserActivity.user_id == 1, UserActivity.anomaly_score > 0.8, UserActivity.timestamp >= since)
+            .order_by(UserActivity.timestamp.desc(), UserActivity.id.desc())
+        ).scalars().all()
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = get_recent_anomalies(db, 1, limit=PAGE_SIZE, cursor=cursor)
+            seen.extend(page)
+            if cursor is None:
+                break
+
+    assert [row["timestamp"] for row in seen] == expected
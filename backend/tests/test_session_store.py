@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.settings import get_settings
+from app.middleware.session import SessionTimeoutMiddleware
+from app.middleware.session_store import SessionStore, SQLiteSessionStore, create_session_store
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore(60)
+
+
+def test_sqlite_store_lives_under_the_data_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_STORE", "sqlite")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    try:
+        store = create_session_store(60)
+        assert store.path == str(tmp_path / "sessions.db")
+    finally:
+        get_settings.cache_clear()
+
+
+class _RecordingStore(SQLiteSessionStore):
+    def get(self, session_id):
+        self.threads.add(threading.get_ident())
+        return super().get(session_id)
+
+
+def test_sqlite_calls_run_off_the_event_loop(tmp_path):
+    store = _RecordingStore(60, str(tmp_path / "sessions.db"))
+    store.threads = set()
+    store.set("token", time.time())
+    app = FastAPI()
+    app.add_middleware(SessionTimeoutMiddleware, store=store)
+
+    @app.get("/ping")
+    async def ping():
+        return {"loop_thread": threading.get_ident()}
+
+    with TestClient(app) as client:
+        response = client.get("/ping", headers={"Authorization": "token"})
+
+    assert response.status_code == 200
+    assert response.json()["loop_thread"] not in store.threads
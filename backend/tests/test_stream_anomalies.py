@@ -0,0 +1,66 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+USER_ID = 9016
+
+
+def _stream_lines():
+    start = datetime.utcnow() - timedelta(hours=6)
+    # A few ordinary logins from one network and browser...
+    normal = [
+        {
+            "user_id": USER_ID,
+            "timestamp": (start + timedelta(hours=i)).isoformat(),
+            "ip_address": "10.0.0.1",
+            "browser_fingerprint": "fp0",
+        }
+        for i in range(3)
+    ]
+    # ...then a burst from shifting networks and browsers, far outside
+    # anything the population model was trained on
+    burst = [
+        {
+            "user_id": USER_ID,
+            "timestamp": (start + timedelta(hours=4, seconds=30 * i)).isoformat(),
+            "ip_address": f"10.{i % 7 + 1}.{i}.1",
+            "browser_fingerprint": f"fp{i + 1}",
+        }
+        for i in range(30)
+    ]
+    return normal + burst
+
+
+def test_streamed_anomalies_are_listed_by_recent_anomalies(client, database_url):
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username) VALUES (:id, 'streamer')"), {"id": USER_ID})
+    engine.dispose()
+
+    body = "".join(json.dumps(line) + "\n" for line in _stream_lines())
+    response = client.post(
+        "/api/v1/threat-detection/analyze/stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines() if line]
+    flagged = [result for result in results if result["is_anomaly"]]
+    assert not any(result["is_anomaly"] for result in results[:3])
+    assert flagged, "the burst should contain anomalies"
+    assert all(result["anomaly_score"] > 0.8 for result in flagged)
+    assert all(result["anomaly_score"] <= 0.8 for result in results if not result["is_anomaly"])
+
+    # Rows reach the database through the write-behind queue
+    anomalies = []
+    deadline = time.monotonic() + 5
+    while len(anomalies) < len(flagged) and time.monotonic() < deadline:
+        time.sleep(0.1)
+        page = client.get(f"/api/v1/threat-detection/recent-anomalies/{USER_ID}", params={"limit": 100})
+        assert page.status_code == 200
+        anomalies = page.json()
+
+    assert len(anomalies) == len(flagged)
+    assert sorted(a["anomaly_score"] for a in anomalies) == sorted(r["anomaly_score"] for r in flagged)
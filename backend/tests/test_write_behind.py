@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+
+from app.core.write_behind import WriteBehindQueue
+
+
+def _rows(name: str, outcome: str) -> float:
+    return REGISTRY.get_sample_value("write_behind_rows_total", {"queue": name, "outcome": outcome}) or 0.0
+
+
+def test_put_after_close_drops_and_counts():
+    written = []
+    queue = WriteBehindQueue("test_closed", written.extend, flush_interval_ms=1)
+
+    async def main():
+        await queue.put([1, 2])
+        await queue.close()
+        await queue.put([3])
+
+    asyncio.run(main())
+
+    assert written == [1, 2]
+    assert _rows("test_closed", "dropped") == 1
+
+
+def test_no_backoff_after_the_last_attempt():
+    def fail(rows):
+        raise OSError("database down")
+
+    queue = WriteBehindQueue("test_retries", fail, flush_interval_ms=1, retries=1)
+
+    async def main():
+        await queue.put([1])
+        await queue.close()
+
+    start = time.perf_counter()
+    asyncio.run(main())
+
+    # One 0.1s backoff between the two attempts, none after the last
+    assert time.perf_counter() - start < 0.18
+    assert _rows("test_retries", "dropped") == 1
+
+
+def test_close_drops_rows_of_producers_waiting_for_room():
+    written = []
+
+    def slow_flush(rows):
+        time.sleep(0.05)
+        written.extend(rows)
+
+    queue = WriteBehindQueue("test_waiting", slow_flush, max_batch_size=1, flush_interval_ms=1, max_pending=1)
+
+    async def main():
+        producer = asyncio.create_task(queue.put([1, 2, 3, 4]))
+        await asyncio.sleep(0.01)  # the producer is now waiting on the full queue
+        await queue.close()
+        await producer
+
+    asyncio.run(main())
+
+    assert written == [1, 2]
+    assert _rows("test_waiting", "dropped") == 2
+    assert REGISTRY.get_sample_value("write_behind_pending_rows", {"queue": "test_waiting"}) == 0